@@ -0,0 +1,172 @@
+# ==========================================================
+# 日本語の文単位への組み直し（翻訳前の前処理）
+# PDF の抽出テキストは表示幅で折り返された「物理行」なので、文の途中で切れている。
+# 折り返された行をつなぎ直して段落にし、。！？ で文に分けてから翻訳する。
+# 訳文は「1段落 = 1行」で組み立て直し、段落の区切り（空行）は元のまま残す。
+# ==========================================================
+
+import re
+from collections.abc import Collection
+
+SENTENCE_END = "。！？!?"
+CLOSING_BRACKETS = "」』）)］]】〕"
+
+# 行頭がこれに当たる行は新しい段落（箇条書き・番号付き見出しなど）
+LIST_MARKER = re.compile(
+    r"^(?:[・●○■□◆◇▪•※＊*\-–—]"
+    r"|[（(]?[0-9０-９]{1,3}[.．)）](?![0-9０-９])"
+    r"|[（(][0-9０-９a-zA-Zａ-ｚ一二三四五六七八九十]{1,3}[)）]"
+    r"|[①-⑳]"
+    r"|第[0-9０-９一二三四五六七八九十百]+[章節条項])"
+)
+JAPANESE_CHAR = re.compile(r"[\u3005\u3040-\u30ff\u3400-\u9fff\uff66-\uff9f]")
+DIGITS = re.compile(r"[0-9０-９]+")
+
+FULL_LINE_RATIO = 0.8      # 行幅の目安に対してこれ以上の長さなら「折り返された行」とみなす
+MAX_SEGMENT_CHARS = 200    # これより長い文は 、 の位置で分ける（翻訳時の切り捨てを避ける）
+
+
+def band_key(line: str) -> str:
+    """ヘッダー・フッター判定用に、ページ番号などの数字を # にそろえた行"""
+    return DIGITS.sub("#", line.strip())
+
+
+def _typical_width(lines: list[str]) -> int:
+    """日本語を含む行の長さの上位 10% 付近を、そのページの行幅の目安にする"""
+    lengths = sorted(len(line.strip()) for line in lines if JAPANESE_CHAR.search(line))
+    if not lengths:
+        return 0
+    return lengths[min(len(lengths) - 1, int(len(lengths) * 0.9))]
+
+
+def _continues(prev: str, next_raw: str, width: int) -> bool:
+    """prev 行の次の行 next_raw が、同じ段落の続き（折り返し）かどうか"""
+    prev = prev.strip()
+    nxt = next_raw.strip()
+    if not prev or not nxt:
+        return False
+    if next_raw.startswith("　") or LIST_MARKER.match(nxt):
+        return False  # 全角スペースの字下げ・箇条書きは新しい段落
+    if not JAPANESE_CHAR.search(prev):
+        return False  # 表の数値行・英数字だけの行はそのまま
+    if prev.endswith(("、", "，", ",")):
+        return True
+    if prev.rstrip(CLOSING_BRACKETS).endswith(tuple(SENTENCE_END)):
+        return False  # 文末で終わる行は段落の終わりとみなす（入力欄に打った改行も保つ）
+    # 行幅いっぱいまで埋まっている行は折り返し。短い行は段落・見出しの終わり
+    return len(prev) >= width * FULL_LINE_RATIO
+
+
+def _join(left: str, right: str) -> str:
+    # 英数字どうしが行をまたぐ場合だけ空白を入れる（日本語は詰めてつなぐ）
+    if left[-1:].isascii() and left[-1:].isalnum() and right[:1].isascii() and right[:1].isalnum():
+        return f"{left} {right}"
+    return left + right
+
+
+def split_sentences(paragraph: str) -> list[str]:
+    """段落を 。！？（直後の閉じ括弧を含む）で文に分ける"""
+    sentences: list[str] = []
+    start = 0
+    i = 0
+    n = len(paragraph)
+    while i < n:
+        if paragraph[i] in SENTENCE_END:
+            j = i + 1
+            while j < n and (paragraph[j] in SENTENCE_END or paragraph[j] in CLOSING_BRACKETS):
+                j += 1
+            sentences.append(paragraph[start:j].strip())
+            start = i = j
+        else:
+            i += 1
+    sentences.append(paragraph[start:].strip())
+
+    result: list[str] = []
+    for sentence in sentences:
+        while len(sentence) > MAX_SEGMENT_CHARS:
+            cut = sentence.rfind("、", 0, MAX_SEGMENT_CHARS) + 1
+            if cut < MAX_SEGMENT_CHARS // 2:
+                cut = MAX_SEGMENT_CHARS
+            result.append(sentence[:cut])
+            sentence = sentence[cut:].strip()
+        if sentence:
+            result.append(sentence)
+    return result
+
+
+def join_wrapped_lines(lines: list[str], fixed_lines: Collection[str] = ()) -> list[str]:
+    """
+    折り返された物理行をつなぎ、段落のリストにする（空行は空文字のまま残す）。
+    band_key が fixed_lines に含まれる行（ページ共通のヘッダー・フッター）は前後とつながない。
+    """
+    width = _typical_width(lines)
+    paragraphs: list[str] = []
+    prev_raw: str | None = None
+    for raw in lines:
+        if fixed_lines and band_key(raw) in fixed_lines:
+            paragraphs.append(raw.strip())
+            prev_raw = None
+            continue
+        if prev_raw is not None and paragraphs and _continues(prev_raw, raw, width):
+            paragraphs[-1] = _join(paragraphs[-1], raw.strip())
+        else:
+            paragraphs.append(raw.strip())
+        prev_raw = raw
+    return paragraphs
+
+
+class SegmentedText:
+    """
+    翻訳する単位（segments）と、訳文を組み立て直すための段落構造を持つ。
+    join_sentences=False の場合は従来どおり物理行をそのまま1単位にする。
+    fixed_lines（band_key の集合）に当たる行は、つながず分けずにそのまま1単位にする
+    （全ページ共通のヘッダー・フッターを毎ページ同じ文にして、重複をまとめやすくする）。
+    """
+
+    def __init__(self, text: str, join_sentences: bool = True,
+                 fixed_lines: Collection[str] = ()) -> None:
+        lines = text.splitlines()
+        if join_sentences:
+            self.paragraphs = [
+                [p] if p and fixed_lines and band_key(p) in fixed_lines
+                else split_sentences(p) if p else []
+                for p in join_wrapped_lines(lines, fixed_lines)
+            ]
+        else:
+            self.paragraphs = [[line] if line.strip() else [] for line in lines]
+
+    @property
+    def segments(self) -> list[str]:
+        return [segment for paragraph in self.paragraphs for segment in paragraph]
+
+    def rebuild(self, translations: list[str]) -> str:
+        """
+        segments と同じ順序の訳文から、段落ごとに1行のテキストを作る。
+        訳文が segments より少なければ、そこまでの分だけを組み立てる（逐次表示用）。
+        """
+        lines: list[str] = []
+        pos = 0
+        for paragraph in self.paragraphs:
+            if pos >= len(translations) and paragraph:
+                break
+            part = translations[pos:pos + len(paragraph)]
+            lines.append(" ".join(t for t in part if t.strip()))
+            pos += len(paragraph)
+        return "\n".join(lines)
+
+    def rebuild_bilingual(self, translations: dict[str, list[str]]) -> str:
+        """
+        翻訳先ごとの訳文（{言語コード: segments と同じ順序の訳文}）から対訳テキストを作る。
+        段落ごとに「[vi] …」「[en] …」のように翻訳先の数だけ行を並べる。
+        """
+        lines: list[str] = []
+        pos = 0
+        for paragraph in self.paragraphs:
+            if not paragraph:
+                lines.append("")
+                continue
+            for lang, outputs in translations.items():
+                part = outputs[pos:pos + len(paragraph)]
+                lines.append(f"[{lang}] " + " ".join(t for t in part if t.strip()))
+            pos += len(paragraph)
+        return "\n".join(lines)
@@ -4,9 +4,19 @@
 # ==========================================================
 
 import os
+import sys
+from collections.abc import Iterator
+from concurrent.futures import Future
+
 import streamlit as st
-import torch
-from transformers import AutoTokenizer, AutoModelForSeq2SeqLM
+
+import perf_trace
+from ja_segment import SegmentedText
+from model_runtime import resolve_model_dir
+from translation_backends import TranslationBackend, load_backend_async
+from translation_cache import TranslationCache
+from translation_engine import PROFILE_LABELS, decoding_params
+from translation_server import MicroBatcher
 
 # ----------------------------------------------------------
 # 起動設定
@@ -14,13 +24,17 @@ from transformers import AutoTokenizer, AutoModelForSeq2SeqLM
 st.set_page_config(page_title="JA Translator (Offline)", layout="centered")
 
 # ----------------------------------------------------------
-# ローカルモデルパス（固定）
+# ローカルモデルパス
+# 環境変数 TRANSLATOR_MODEL_DIR、なければこのフォルダの models/facebook/m2m100_418M
 # ----------------------------------------------------------
-MODEL_DIR = r".\models\facebook\m2m100_418M"  # ← ローカルモデルの絶対／相対パス
+MODEL_DIR = str(resolve_model_dir())
 SRC_LANG = "ja"
 
+# 翻訳サーバー（translation_server.py）を使う場合はモデルを読み込まない
+SERVER_URL = os.environ.get("TRANSLATOR_SERVER_URL")
+
 # モデルフォルダ存在チェック
-if not os.path.exists(MODEL_DIR):
+if not SERVER_URL and not os.path.exists(MODEL_DIR):
     st.error(f"モデルディレクトリが見つかりません: {MODEL_DIR}")
     st.stop()
 
@@ -42,26 +56,82 @@ target_lang = st.sidebar.selectbox(
 )
 TGT_LANG = "vi" if "ベトナム" in target_lang else "en"
 
+# デコード設定（入力欄での試し訳が中心なので、既定は貪欲法の速度優先）
+profile = st.sidebar.selectbox(
+    "翻訳の品質",
+    list(PROFILE_LABELS),
+    index=0,
+    format_func=PROFILE_LABELS.get,
+    help="速度優先は貪欲法、品質優先はビーム探索で訳します。短い文は自動的に貪欲法になります。",
+)
+
+# 処理時間の計測（抽出 / トークン化 / 生成 / デコード）。全セッション共通の集計
+measure_perf = st.sidebar.checkbox("処理時間を計測", value=perf_trace.enabled())
+if measure_perf != perf_trace.enabled():
+    if measure_perf:
+        perf_trace.reset()
+        perf_trace.enable()
+    else:
+        perf_trace.disable()
+
 # ----------------------------------------------------------
-# モデルの読み込み（ローカル限定・キャッシュ付き）
+# モデルの読み込み（ローカル限定・バックグラウンド・全セッションで共有）
+# 画面はすぐに表示し、最初の翻訳時に読み込みが終わっていなければ待つ
 # ----------------------------------------------------------
-@st.cache_resource(show_spinner=True)
-def load_model_local(model_dir: str):
-    tokenizer = AutoTokenizer.from_pretrained(model_dir, local_files_only=True)
-    torch_dtype = torch.float16 if torch.cuda.is_available() else torch.float32
-    model = AutoModelForSeq2SeqLM.from_pretrained(
-        model_dir,
-        local_files_only=True,
-        torch_dtype=torch_dtype,
-        low_cpu_mem_usage=True
-    )
-    model.eval()
-    if torch.cuda.is_available():
-        model.to("cuda")
-    return tokenizer, model
+# 推論バックエンドは環境変数 TRANSLATOR_BACKEND（torch / onnx）、
+# CPU の精度モードは TRANSLATOR_PRECISION（fp32 / bf16 / int8）で選択
+# TRANSLATOR_SERVER_URL があれば翻訳サーバーへの接続だけを行う
+@st.cache_resource(show_spinner=False)
+def start_backend_loading(model_dir: str) -> "Future[TranslationBackend]":
+    return load_backend_async(model_dir)
 
 
-tokenizer, model = load_model_local(MODEL_DIR)
+backend_future = start_backend_loading(MODEL_DIR)
+
+
+# ----------------------------------------------------------
+# 翻訳の窓口（全セッションで共有）
+# 各セッションの依頼は1本の翻訳スレッドに集め、同時に届いたものはまとめて翻訳する
+# 翻訳メモリもここで持つ。翻訳サーバーを使う場合はサーバー側で同じことを行う
+# 翻訳メモリを開けなくても（ファイルのロック・破損など）翻訳自体は続行できるよう、キャッシュなしで動かす
+# ----------------------------------------------------------
+@st.cache_resource(show_spinner=False)
+def start_batcher(model_dir: str, variant: str, _backend: TranslationBackend) -> MicroBatcher:
+    try:
+        cache = TranslationCache(model_dir, variant=variant)
+    except Exception as e:
+        print(f"翻訳メモリを開けませんでした（キャッシュなしで続行）: {e}", file=sys.stderr)
+        cache = None
+    return MicroBatcher(_backend, cache=cache)
+
+
+def get_translator(backend: TranslationBackend):
+    if backend.remote:
+        return backend
+    return start_batcher(MODEL_DIR, backend.cache_variant, backend)
+
+
+# ----------------------------------------------------------
+# 長い入力は文単位に分け、少しずつ翻訳して逐次表示する
+# 最初は1文だけ訳してすぐに表示し、残りはまとめてバッチで翻訳する
+# （モデルの最大長を超えた部分が切り捨てられることもなくなる）
+# ----------------------------------------------------------
+STREAM_FIRST_SEGMENTS = 1
+STREAM_BATCH_SEGMENTS = 8
+
+
+def translate_streaming(translator, layout: SegmentedText, tgt_lang_code: str,
+                        **params) -> Iterator[tuple[int, str]]:
+    """(翻訳済みの文数, ここまでの訳文) を順に返す"""
+    segments = layout.segments
+    translations: list[str] = []
+    size = STREAM_FIRST_SEGMENTS
+    while len(translations) < len(segments):
+        chunk = segments[len(translations):len(translations) + size]
+        translations.extend(translator.translate_lines(chunk, tgt_lang_code, **params))
+        yield len(translations), layout.rebuild(translations)
+        size = STREAM_BATCH_SEGMENTS
+
 
 # ----------------------------------------------------------
 # UI
@@ -74,36 +144,105 @@ ja_text = st.text_area(
     height=180,
     placeholder="例: この製品は炭素鋼SS400を使用しています。"
 )
-max_new_tokens = st.slider("最大出力トークン数", 32, 512, 256, step=32)
+max_new_tokens = st.slider("最大出力トークン数（1文あたり）", 32, 512, 256, step=32)
 
 if st.button("翻訳する"):
     if ja_text.strip():
-        with st.spinner("翻訳中..."):
-            # 翻訳処理
-            tokenizer.src_lang = SRC_LANG
-            enc = tokenizer([ja_text.strip()], return_tensors="pt", padding=True, truncation=True)
-            if torch.cuda.is_available():
-                enc = {k: v.to("cuda") for k, v in enc.items()}
-
-            forced_bos_id = tokenizer.get_lang_id(TGT_LANG)
-            with torch.inference_mode():
-                gen = model.generate(
-                    **enc,
-                    max_new_tokens=max_new_tokens,
-                    forced_bos_token_id=forced_bos_id
-                )
-            result = tokenizer.batch_decode(gen, skip_special_tokens=True)[0]
+        if not backend_future.done():
+            with st.spinner("翻訳モデルを読み込み中です..."):
+                backend_future.exception()
+        try:
+            translator = get_translator(backend_future.result())
+        except Exception as e:
+            st.error(f"翻訳モデルの読み込みに失敗しました: {e}")
+            st.stop()
 
         st.subheader(f"{target_lang} の翻訳結果")
-        st.text_area("出力", value=result, height=180)
+        status = st.empty()
+        output = st.empty()
+
+        # 翻訳処理（翻訳メモリにあればモデルは通さない）
+        layout = SegmentedText(ja_text.strip())
+        total = len(layout.segments)
+        result = ""
+        status.caption(f"翻訳中… 0 / {total} 文")
+        for done, result in translate_streaming(
+            translator, layout, TGT_LANG,
+            max_new_tokens=max_new_tokens,
+            **decoding_params(profile),
+        ):
+            status.caption(f"翻訳中… {done} / {total} 文")
+            output.code(result, language=None, wrap_lines=True)
+
+        status.empty()
+        # 最後はコピー・編集しやすいテキスト欄に置き換える
+        output.text_area("出力", value=result, height=180)
     else:
         st.warning("翻訳するテキストを入力してください。")
 
+# モデル・翻訳メモリの状況（サイドバー）
+perf_stats = perf_trace.snapshot() if measure_perf else {}
+pipeline_stats = perf_trace.pipeline_snapshot() if measure_perf else {}
+if not backend_future.done():
+    st.sidebar.caption("翻訳モデル: 読み込み中…")
+elif backend_future.exception() is not None:
+    st.sidebar.error(f"翻訳モデルの読み込みに失敗しました: {backend_future.exception()}")
+else:
+    ready_backend = backend_future.result()
+    if ready_backend.remote:
+        try:
+            server_status = ready_backend.status()
+        except Exception as e:
+            st.sidebar.error(f"翻訳サーバーに接続できません: {e}")
+            server_status = {}
+        cache_stats = server_status.get("cache")
+        # 翻訳はサーバー側で行うため、計測結果もサーバーのもの（サーバー側で TRANSLATOR_PERF=1）
+        perf_stats = (server_status.get("perf") or {}) if measure_perf else {}
+        pipeline_stats = (server_status.get("pipeline") or {}) if measure_perf else {}
+        st.sidebar.caption(
+            f"翻訳サーバー: {ready_backend.url}（{server_status.get('backend')} / {ready_backend.precision}・"
+            f"依頼 {server_status.get('requests', 0)} 件を {server_status.get('batches', 0)} 回で翻訳）"
+        )
+    else:
+        batcher = get_translator(ready_backend)
+        cache_stats = batcher.cache.stats() if batcher.cache is not None else None
+        st.sidebar.caption(
+            f"翻訳モデル: 準備完了（{ready_backend.name} / {ready_backend.precision}・"
+            f"{ready_backend.load_seconds:.1f} 秒）"
+        )
+    if cache_stats:
+        st.sidebar.caption(
+            f"翻訳メモリ: {cache_stats['entries']} 件保存 / "
+            f"ヒット {cache_stats['hits']} ・ミス {cache_stats['misses']}"
+        )
+
+if measure_perf:
+    with st.expander("処理時間の内訳", expanded=bool(perf_stats)):
+        if perf_stats:
+            st.caption(perf_trace.summary_text(perf_stats, pipeline_stats))
+            utilisation = pipeline_stats.get("utilisation", {})
+            st.table([
+                {
+                    "段階": perf_trace.STAGE_LABELS.get(name, name),
+                    "回数": s["count"],
+                    "合計 ms": s["total_ms"],
+                    "平均 ms": s["mean_ms"],
+                    "p50 ms": s["p50_ms"],
+                    "p95 ms": s["p95_ms"],
+                    "最大 ms": s["max_ms"],
+                    "tok/s": s.get("tokens_per_sec"),
+                    "稼働率": f"{utilisation[name]:.0%}" if name in utilisation else None,
+                }
+                for name, s in perf_stats.items()
+            ])
+        else:
+            st.caption("まだ計測結果がありません。翻訳すると表示されます。")
+
 # ----------------------------------------------------------
 # 注意書き
 # ----------------------------------------------------------
 st.markdown("---")
 st.caption("""
 💡 このアプリはローカル保存済みモデルのみを使用します（完全オフライン動作）。
-モデルフォルダ: .\\models\\facebook\\m2m100_418M
+モデルフォルダ: models/facebook/m2m100_418M（環境変数 TRANSLATOR_MODEL_DIR で変更可）
 """)
@@ -0,0 +1,197 @@
+# ==========================================================
+# 最適化済みのモデル成果物（tools/download_model.py で作成、ネットワーク不要）
+# <モデル>/optimized/ に次のものを書き出し、manifest.json に元のモデルの指紋と各ファイルのサイズ・SHA-256 を記録する
+#   fp16/ ・ bf16/ : その精度で保存し直した safetensors（変換なしで mmap で読める。元が .bin のみなら fp32/ も作る）
+#   model_int8.pt  : 動的量子化済みのモデル（model_runtime の int8 と同じもの）
+#   tokenizer.pkl  : 構築済みのトークナイザー（語彙ファイルの解析を省く）
+# 起動時は manifest を見て、今の環境（CUDA / 精度）に合う成果物があればそれを読む。
+# 起動を遅くしないよう、読み込み時に確かめるのは元のモデルの指紋・ライブラリの版・ファイルのサイズだけ
+# （SHA-256 の照合は tools/download_model.py --verify で行う）
+# ==========================================================
+
+import hashlib
+import json
+import os
+import pickle
+import sys
+import time
+from collections.abc import Callable, Sequence
+from pathlib import Path
+
+from translation_cache import model_fingerprint
+
+MANIFEST_NAME = "manifest.json"
+MANIFEST_FORMAT = 1
+TOKENIZER_NAME = "tokenizer.pkl"
+
+# safetensors で保存し直す精度（名前 → torch の dtype 名）
+WEIGHT_VARIANTS = {"fp32": "float32", "fp16": "float16", "bf16": "bfloat16"}
+ARTIFACTS = ("fp32", "fp16", "bf16", "int8", "tokenizer")
+DEFAULT_ARTIFACTS = ("fp16", "bf16", "int8", "tokenizer")
+
+
+def optimized_dir(model_dir: str | os.PathLike) -> Path:
+    from model_runtime import QUANTIZED_DIR_NAME
+
+    return Path(model_dir) / QUANTIZED_DIR_NAME
+
+
+def manifest_path(model_dir: str | os.PathLike) -> Path:
+    return optimized_dir(model_dir) / MANIFEST_NAME
+
+
+def _library_versions() -> dict[str, str]:
+    import torch
+    import transformers
+
+    return {"torch": torch.__version__, "transformers": transformers.__version__}
+
+
+def _sha256(path: Path) -> str:
+    h = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(1 << 20), b""):
+            h.update(chunk)
+    return h.hexdigest()
+
+
+def _describe(root: Path, path: Path) -> dict:
+    """成果物（ファイルまたはフォルダ）の manifest 用の記述"""
+    files = sorted(p for p in path.rglob("*") if p.is_file()) if path.is_dir() else [path]
+    return {
+        "path": path.relative_to(root).as_posix(),
+        "files": {
+            p.relative_to(root).as_posix(): {"size": p.stat().st_size, "sha256": _sha256(p)}
+            for p in files
+        },
+        **_library_versions(),
+    }
+
+
+# ----------------------------------------------------------
+# 読み込み時の参照
+# ----------------------------------------------------------
+def load_manifest(model_dir: str | os.PathLike) -> dict | None:
+    """同じモデルから作った manifest があれば返す（モデルを差し替えていれば None）"""
+    try:
+        manifest = json.loads(manifest_path(model_dir).read_text(encoding="utf-8"))
+    except (OSError, ValueError):
+        return None
+    if manifest.get("format") != MANIFEST_FORMAT or manifest.get("source") != model_fingerprint(model_dir):
+        return None
+    return manifest
+
+
+def find_artifact(model_dir: str | os.PathLike, name: str,
+                  manifest: dict | None = None) -> Path | None:
+    """
+    name の成果物のパス。manifest にない・ファイルが欠けている・サイズが違う、
+    または作成時と torch / transformers の版が違う（pickle を読めない恐れがある）場合は None
+    """
+    if manifest is None:
+        manifest = load_manifest(model_dir)
+    if manifest is None or name not in manifest.get("artifacts", {}):
+        return None
+    entry = manifest["artifacts"][name]
+    versions = _library_versions()
+    if any(entry.get(lib) != version for lib, version in versions.items()):
+        return None
+    root = optimized_dir(model_dir)
+    for relative, info in entry["files"].items():
+        try:
+            if (root / relative).stat().st_size != info["size"]:
+                return None
+        except OSError:
+            return None
+    return root / entry["path"]
+
+
+def load_prepared_tokenizer(model_dir: str | os.PathLike):
+    """構築済みのトークナイザー（なければ None）"""
+    path = find_artifact(model_dir, "tokenizer")
+    if path is None:
+        return None
+    try:
+        with open(path, "rb") as f:
+            return pickle.load(f)
+    except Exception as e:
+        print(f"構築済みのトークナイザーを読み込めませんでした（元のファイルから読みます）: {e}", file=sys.stderr)
+        return None
+
+
+# ----------------------------------------------------------
+# 作成と検証（tools/download_model.py から使う）
+# ----------------------------------------------------------
+def prepare_artifacts(model_dir: str | os.PathLike, names: Sequence[str] = DEFAULT_ARTIFACTS,
+                      log: Callable[[str], None] = print) -> dict:
+    """
+    names の成果物を作り、manifest を書き出して返す（同じモデルの既存の成果物の記録は残す）。
+    元の重みが safetensors でなければ fp32 も作る（.bin の読み込みは遅く、mmap もできないため）
+    """
+    import torch
+    from transformers import AutoModelForSeq2SeqLM
+
+    from model_runtime import _load_quantized, load_tokenizer, quantized_model_path
+
+    root = Path(model_dir)
+    if not (root / "config.json").exists():
+        raise FileNotFoundError(f"モデルが見つかりません: {root}")
+    out = optimized_dir(root)
+    out.mkdir(parents=True, exist_ok=True)
+
+    names = list(dict.fromkeys(names))
+    if not any(root.glob("*.safetensors")) and "fp32" not in names:
+        names.insert(0, "fp32")
+    manifest = load_manifest(root) or {}
+    artifacts = dict(manifest.get("artifacts", {}))
+
+    for name in names:
+        if name not in ARTIFACTS:
+            raise ValueError(f"不明な成果物です: {name}（{', '.join(ARTIFACTS)} のいずれか）")
+        started = time.perf_counter()
+        if name in WEIGHT_VARIANTS:
+            model = AutoModelForSeq2SeqLM.from_pretrained(
+                root, torch_dtype=getattr(torch, WEIGHT_VARIANTS[name]),
+                local_files_only=True, low_cpu_mem_usage=True,
+            )
+            model.save_pretrained(out / name, safe_serialization=True)
+            del model
+            path = out / name
+        elif name == "int8":
+            quantized_model_path(root).unlink(missing_ok=True)  # 作り直す
+            _load_quantized(root)
+            path = quantized_model_path(root)
+        else:
+            tokenizer = load_tokenizer(root, prepared=False)
+            path = out / TOKENIZER_NAME
+            with open(path, "wb") as f:
+                pickle.dump(tokenizer, f, protocol=pickle.HIGHEST_PROTOCOL)
+        artifacts[name] = _describe(out, path)
+        size = sum(info["size"] for info in artifacts[name]["files"].values())
+        log(f"{name}: {artifacts[name]['path']}（{size / 2 ** 20:.1f} MB, {time.perf_counter() - started:.1f} 秒）")
+
+    manifest = {
+        "format": MANIFEST_FORMAT,
+        "source": model_fingerprint(root),
+        "created": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "artifacts": artifacts,
+    }
+    manifest_path(root).write_text(json.dumps(manifest, ensure_ascii=False, indent=2), encoding="utf-8")
+    return manifest
+
+
+def verify_artifacts(model_dir: str | os.PathLike) -> list[str]:
+    """manifest の全ファイルの SHA-256 を照合し、問題の一覧を返す（空なら正常）"""
+    manifest = load_manifest(model_dir)
+    if manifest is None:
+        return ["manifest がないか、元のモデルが変わっています（作り直してください）。"]
+    root = optimized_dir(model_dir)
+    problems = []
+    for name, entry in manifest["artifacts"].items():
+        for relative, info in entry["files"].items():
+            path = root / relative
+            if not path.is_file():
+                problems.append(f"{name}: {relative} がありません")
+            elif _sha256(path) != info["sha256"]:
+                problems.append(f"{name}: {relative} のチェックサムが一致しません")
+    return problems
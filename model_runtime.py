@@ -0,0 +1,207 @@
+# ==========================================================
+# 翻訳モデルの読み込み（ローカル専用）
+# PyQt6 版・Streamlit 版・コマンドライン版で共通
+# torch / transformers は重いため、実際に読み込むときに import する
+# （画面の表示を先に行い、モデルはバックグラウンドで読み込めるようにするため）
+# ==========================================================
+
+import json
+import os
+import sys
+from pathlib import Path
+
+from translation_cache import model_fingerprint
+
+SRC_LANG = "ja"  # 入力は日本語
+
+# ----------------------------------------------------------
+# モデルの場所
+# 環境変数 TRANSLATOR_MODEL_DIR → このリポジトリの models/facebook/m2m100_418M の順に探す
+# ----------------------------------------------------------
+DEFAULT_MODEL_DIR = Path(__file__).resolve().parent / "models" / "facebook" / "m2m100_418M"
+
+
+def resolve_model_dir(model_dir: str | os.PathLike | None = None) -> Path:
+    """OS に依存しない形でモデルディレクトリを決める（相対パスはカレント→リポジトリの順に解決）"""
+    if model_dir is None:
+        model_dir = os.environ.get("TRANSLATOR_MODEL_DIR") or DEFAULT_MODEL_DIR
+    path = Path(model_dir).expanduser()
+    if not path.is_absolute() and not path.exists():
+        in_repo = Path(__file__).resolve().parent / path
+        if in_repo.exists():
+            path = in_repo
+    return path
+
+# ----------------------------------------------------------
+# CPU 推論の精度モード
+#   fp32 : 従来どおり（既定）
+#   bf16 : bfloat16（CPU が対応している場合のみ。非対応なら fp32）
+#   int8 : Linear 層の動的量子化（変換済みモデルを保存して2回目以降は再利用）
+# 環境変数 TRANSLATOR_PRECISION で指定する。CUDA 使用時は常に fp16
+# ----------------------------------------------------------
+PRECISIONS = ("fp32", "bf16", "int8")
+DEFAULT_PRECISION = "fp32"
+
+QUANTIZED_DIR_NAME = "optimized"
+QUANTIZED_MODEL_NAME = "model_int8.pt"
+
+
+def cpu_supports_bf16() -> bool:
+    """CPU に bf16 の演算命令（AVX512-BF16 / AMX）があるか"""
+    try:
+        flags = Path("/proc/cpuinfo").read_text()
+    except OSError:
+        return False
+    return "avx512_bf16" in flags or "amx_bf16" in flags
+
+
+def resolve_precision(precision: str | None = None) -> str:
+    """指定（なければ環境変数）から実際に使う精度モードを決める"""
+    import torch
+
+    if precision is None:
+        precision = os.environ.get("TRANSLATOR_PRECISION", DEFAULT_PRECISION)
+    precision = precision.lower()
+    if precision not in PRECISIONS:
+        raise ValueError(f"不明な精度モードです: {precision}（{', '.join(PRECISIONS)} のいずれか）")
+    if torch.cuda.is_available():
+        return "fp16"
+    if precision == "bf16" and not cpu_supports_bf16():
+        print("この CPU は bf16 に対応していないため fp32 で読み込みます。", file=sys.stderr)
+        return "fp32"
+    return precision
+
+
+def quantized_model_path(model_dir: str | os.PathLike) -> Path:
+    return Path(model_dir) / QUANTIZED_DIR_NAME / QUANTIZED_MODEL_NAME
+
+
+def _load_quantized(model_dir: str | os.PathLike):
+    """int8 量子化済みモデルを読み込む。なければ（元の重みが変わっていれば）変換して保存する"""
+    import torch
+    from transformers import AutoModelForSeq2SeqLM
+
+    path = quantized_model_path(model_dir)
+    info_path = path.with_suffix(".json")
+    source = model_fingerprint(model_dir)
+
+    if path.exists() and info_path.exists():
+        try:
+            info = json.loads(info_path.read_text(encoding="utf-8"))
+            if info.get("source") == source and info.get("torch") == torch.__version__:
+                return torch.load(path, weights_only=False)
+        except Exception as e:
+            print(f"量子化済みモデルを読み込めませんでした（再変換します）: {e}", file=sys.stderr)
+
+    model = AutoModelForSeq2SeqLM.from_pretrained(model_dir, low_cpu_mem_usage=True)
+    model.eval()
+    model = torch.ao.quantization.quantize_dynamic(model, {torch.nn.Linear}, dtype=torch.qint8)
+
+    try:
+        path.parent.mkdir(parents=True, exist_ok=True)
+        torch.save(model, path)
+        info_path.write_text(
+            json.dumps({"source": source, "torch": torch.__version__}, indent=2), encoding="utf-8"
+        )
+    except OSError as e:
+        print(f"量子化済みモデルを保存できませんでした: {e}", file=sys.stderr)
+    return model
+
+
+# ----------------------------------------------------------
+# CPU の演算スレッド数
+# 環境変数 TRANSLATOR_THREADS で指定（未指定なら torch の既定 = 全コア）。
+# コア数の多いマシンでは、1プロセスのスレッドを増やすより複製を並べるほうが速い
+# （TRANSLATOR_BACKEND=replicas、translation_replicas.py を参照）
+# ----------------------------------------------------------
+def apply_cpu_threads(threads: int | None = None) -> None:
+    import torch
+
+    if threads is None:
+        value = os.environ.get("TRANSLATOR_THREADS")
+        if not value:
+            return
+        threads = int(value)
+    torch.set_num_threads(max(threads, 1))
+
+
+def load_tokenizer(model_dir: str | os.PathLike, prepared: bool = True):
+    """
+    日本語を入力とするトークナイザーを読み込む。
+    prepared なら構築済みのもの（tools/download_model.py で作成）があればそれを使う
+    """
+    from transformers import AutoTokenizer
+
+    from model_artifacts import load_prepared_tokenizer
+
+    tokenizer = load_prepared_tokenizer(model_dir) if prepared else None
+    if tokenizer is None:
+        tokenizer = AutoTokenizer.from_pretrained(model_dir, local_files_only=True)
+    tokenizer.src_lang = SRC_LANG
+    return tokenizer
+
+
+def weights_source(model_dir: str | os.PathLike, precision: str) -> Path:
+    """
+    precision の重みを読む場所。tools/download_model.py で作った同じ精度の safetensors
+    （optimized/fp16 など、manifest.json に記録されたもの）があればそれ、なければ元のモデル
+    """
+    from model_artifacts import find_artifact
+
+    variant = precision if precision in ("fp16", "bf16") else "fp32"
+    return find_artifact(model_dir, variant) or Path(model_dir)
+
+
+def load_model(model_dir: str | os.PathLike, precision: str | None = None, vocab: str | None = None):
+    """
+    tokenizer, model, device を返す（CUDA があれば GPU・fp16 を使う）。
+    precision は resolve_precision() の結果（省略時は環境変数から決定）。
+    vocab が "pruned"（省略時は環境変数 TRANSLATOR_VOCAB）なら出力語彙をベトナム語・英語に絞る（vocab_pruning.py）。
+    safetensors 形式の重みがあればそれを使う（mmap で読むため起動が速く、メモリも共有される）。
+    最適化済みの成果物（weights_source）があれば、精度の変換をせずにそれを読む。
+    """
+    import torch
+    from transformers import AutoModelForSeq2SeqLM
+
+    from vocab_pruning import apply_vocab, resolve_vocab
+
+    os.environ["HF_HUB_OFFLINE"] = "1"
+    os.environ["TRANSFORMERS_OFFLINE"] = "1"
+
+    if not Path(model_dir).exists():
+        raise FileNotFoundError(f"モデルディレクトリが見つかりません: {model_dir}")
+
+    if precision is None:
+        precision = resolve_precision()
+    vocab = resolve_vocab(vocab)
+
+    tokenizer = load_tokenizer(model_dir)
+
+    source = weights_source(model_dir, precision)
+    load_kwargs = {"local_files_only": True, "low_cpu_mem_usage": True}
+    if any(source.glob("*.safetensors")):
+        load_kwargs["use_safetensors"] = True
+
+    if precision == "fp16":
+        device = torch.device("cuda")
+        model = AutoModelForSeq2SeqLM.from_pretrained(
+            source, torch_dtype=torch.float16, **load_kwargs
+        )
+        model.to(device)
+    elif precision == "int8":
+        # 動的量子化は CPU 専用
+        device = torch.device("cpu")
+        model = _load_quantized(model_dir)
+    else:
+        device = torch.device("cpu")
+        torch_dtype = torch.bfloat16 if precision == "bf16" else torch.float32
+        model = AutoModelForSeq2SeqLM.from_pretrained(
+            source, torch_dtype=torch_dtype, **load_kwargs
+        )
+
+    model.eval()
+    if vocab == "pruned":
+        apply_vocab(model, tokenizer, model_dir)
+    if device.type == "cpu":
+        apply_cpu_threads()
+    return tokenizer, model, device
@@ -0,0 +1,639 @@
+# ==========================================================
+# PDF テキスト抽出（GUI 非依存）
+# 抽出エンジンは環境変数 TRANSLATOR_EXTRACTOR（コマンドライン版は --extractor）で選ぶ
+#   pdfium（既定）: pypdfium2（PDFium、ネイティブ実装）。pdfminer のレイアウト解析より1桁速い
+#   pdfplumber    : 従来どおり。pdfium で空・文字化けになったページもこちらで抽出し直す
+# ==========================================================
+
+import multiprocessing as mp
+import os
+import threading
+import time
+import unicodedata
+from collections import OrderedDict, deque
+from collections.abc import Callable, Iterable, Iterator
+from concurrent.futures import Future, ProcessPoolExecutor, ThreadPoolExecutor
+from pathlib import Path
+
+import pdfplumber
+import pypdfium2 as pdfium
+import pypdfium2.raw as pdfium_c
+from pdfminer.pdfpage import PDFPage
+from pdfminer.pdftypes import dict_value, int_value, list_value
+from pdfplumber.page import Page
+
+import perf_trace
+from ja_segment import band_key
+
+EXTRACTORS = ("pdfium", "pdfplumber")
+DEFAULT_EXTRACTOR = "pdfium"
+
+PAGE_CACHE_SIZE = 128  # 抽出済みテキストを保持するページ数（LRU）
+RECYCLE_PAGES = 200    # このページ数を抽出するごとに PDF を開き直す（pdfminer が溜めるオブジェクトを捨てる）
+
+# 並列抽出の設定
+EXTRACT_WORKERS = min(os.cpu_count() or 1, 8)
+EXTRACT_CHUNK_PAGES = 4     # 1タスクで抽出するページ数（小さいほど進捗が細かい）
+EXTRACT_AHEAD_CHUNKS = 2    # 1ワーカーあたり、読み出し側より先に抽出しておくチャンク数
+PARALLEL_MIN_PAGES = 16     # これ未満のページ数ではプロセスを起動せず逐次抽出する
+EXTRACT_TIMEOUT = 300       # 1チャンクの抽出を待つ上限（秒）。超えたらプールが止まったとみなしてエラーにする
+
+# ヘッダー・フッターの検出（ページの上下の帯に、数字以外同じ行が繰り返し現れるか）
+BAND_RATIO = 0.1           # ページの高さに対する上下の帯の幅
+BAND_SAMPLE_PAGES = 8      # 検出に使うページ数（文書全体から均等に選ぶ）
+BAND_MIN_RATIO = 0.5       # 選んだページのうち、この割合以上に現れる行をヘッダー・フッターとみなす
+
+# pdfium の文字を行にまとめる設定（pdfplumber の extract_text の既定値と同じ）
+LINE_TOLERANCE = 3.0       # 文字の中心の高さの差がこれ以内なら同じ行（pt）
+SPACE_TOLERANCE = 3.0      # 文字の間がこれより空いていれば空白を入れる（pt）
+BROKEN_CHAR_RATIO = 0.1    # 置換文字・私用領域などの割合がこれを超えるページは文字化けとみなす
+
+EMPTY_PAGE_TEXT = "[このページには翻訳対象のテキストがありません。]"
+
+
+def page_header(page_number: int, total: int) -> str:
+    """全ページ保存ファイルのページ区切り（1始まり）"""
+    return f"===== ページ {page_number} / {total} =====\n"
+
+
+def extraction_error_text(error: Exception) -> str:
+    return f"[このページのテキスト抽出に失敗しました: {error}]"
+
+
+def resolve_extractor(name: str | None = None) -> str:
+    """抽出エンジン名（省略時は環境変数 TRANSLATOR_EXTRACTOR、なければ pdfium）"""
+    name = name or os.environ.get("TRANSLATOR_EXTRACTOR") or DEFAULT_EXTRACTOR
+    if name not in EXTRACTORS:
+        raise ValueError(f"不明な抽出エンジンです: {name}（{' / '.join(EXTRACTORS)}）")
+    return name
+
+
+# ----------------------------------------------------------
+# ページを1つずつ開く PDF ハンドル
+# pdfplumber の pdf.pages は初回アクセスで全ページの Page を作るため、
+# 数千ページのカタログでは開くだけで数秒・数十 MB かかる。
+# ページツリーの /Count をたどって必要なページだけを作り、テキストを取ったらすぐ閉じる。
+# また pdfminer は一度読んだオブジェクト（各ページの内容ストリームなど）を文書側に溜め続けるので、
+# RECYCLE_PAGES ページごとに開き直して、文書全体を抽出してもメモリがほぼ一定になるようにする
+# ----------------------------------------------------------
+def _page_tree_count(pdf: "pdfplumber.PDF") -> int | None:
+    try:
+        return int_value(dict_value(pdf.doc.catalog["Pages"])["Count"])
+    except Exception:
+        return None
+
+
+def _lookup_page(pdf: "pdfplumber.PDF", index: int) -> PDFPage | None:
+    """ページツリーを /Count で絞り込みながら下り、index 番目のページだけを作る（見つからなければ None）"""
+    try:
+        node = dict_value(pdf.doc.catalog["Pages"])
+        inherited: dict = {}
+        for _ in range(64):  # ツリーの深さの上限（循環参照の保険）
+            inherited.update((k, node[k]) for k in PDFPage.INHERITABLE_ATTRS if k in node)
+            child = None
+            for kid_ref in list_value(node["Kids"]):
+                kid = dict_value(kid_ref)
+                if "Kids" in kid:
+                    count = int_value(kid.get("Count", 0))
+                    if index < count:
+                        child = kid
+                        break
+                    index -= count
+                elif index == 0:
+                    attrs = {**inherited, **kid}
+                    return PDFPage(pdf.doc, getattr(kid_ref, "objid", None), attrs, None)
+                else:
+                    index -= 1
+            if child is None:
+                return None
+            node = child
+    except Exception:
+        return None
+    return None
+
+
+class PdfHandle:
+    """pdfplumber の PDF を開き、ページを必要なときに1つずつ作る（スレッドセーフではない）"""
+
+    def __init__(self, path: str | os.PathLike, recycle_pages: int = RECYCLE_PAGES) -> None:
+        self.path = Path(path)
+        self.recycle_pages = recycle_pages
+        self._pdf = pdfplumber.open(self.path)
+        count = _page_tree_count(self._pdf)
+        # /Count が壊れている PDF は、全ページをたどって数える（従来どおり）
+        self.page_count = count if count is not None else len(self._pdf.pages)
+        self._used = 0
+
+    def page(self, index: int) -> Page:
+        """0始まりの index のページ。使い終わったら close() すること"""
+        if index < 0 or index >= self.page_count:
+            raise IndexError("ページ番号が範囲外です。")
+        if self._used >= self.recycle_pages:
+            self._pdf.close()
+            self._pdf = pdfplumber.open(self.path)
+            self._used = 0
+        self._used += 1
+        page_obj = _lookup_page(self._pdf, index)
+        if page_obj is None:
+            return self._pdf.pages[index]
+        return Page(self._pdf, page_obj, page_number=index + 1)
+
+    def extract_text(self, index: int) -> str:
+        page = self.page(index)
+        try:
+            return page.extract_text() or ""
+        finally:
+            # レイアウト解析のキャッシュを解放（テキストだけ残す）
+            page.close()
+
+    def band_lines(self, index: int) -> list[str]:
+        """ページの上下の帯（BAND_RATIO）に収まる行"""
+        page = self.page(index)
+        try:
+            top_limit = page.height * BAND_RATIO
+            bottom_limit = page.height * (1 - BAND_RATIO)
+            return [
+                line["text"]
+                for line in page.extract_text_lines()
+                if line["bottom"] <= top_limit or line["top"] >= bottom_limit
+            ]
+        finally:
+            page.close()
+
+    def close(self) -> None:
+        self._pdf.close()
+
+
+# ----------------------------------------------------------
+# pypdfium2 による抽出
+# 文字ごとの位置から行を組み立て、pdfplumber の extract_text と同じ形（1行 = 1物理行）にそろえる
+# （PDFium の get_text_range は行の区切りを省くことがあり、表や図面では別の行がつながってしまう）
+# ----------------------------------------------------------
+_PDFIUM_LOCK = threading.Lock()  # PDFium はスレッドセーフではないので、プロセス内の呼び出しは直列化する
+
+
+def looks_broken(text: str) -> bool:
+    """空、または置換文字・私用領域・制御文字が多い（ToUnicode のないフォントなど）テキスト"""
+    chars = [ch for ch in text if not ch.isspace()]
+    if not chars:
+        return True
+    bad = sum(ch == "\ufffd" or unicodedata.category(ch) in ("Cc", "Co", "Cn", "Cs") for ch in chars)
+    return bad > BROKEN_CHAR_RATIO * len(chars)
+
+
+def _pdfium_lines(textpage: "pdfium.PdfTextPage") -> list[tuple[float, float, str]]:
+    """(行の下端, 行の上端, 行のテキスト) をページの上から順に返す（高さは PDF の座標で下が 0）"""
+    chars: list[tuple[float, float, float, float, str]] = []  # (中心の高さ, 高さ, 左, 右, 文字)
+    for i in range(textpage.count_chars()):
+        ch = chr(pdfium_c.FPDFText_GetUnicode(textpage.raw, i))
+        if ch in "\r\n\x00":
+            continue  # PDFium が補った改行は使わず、位置から行を組み立てる
+        left, bottom, right, top = textpage.get_charbox(i, loose=True)
+        if right <= left and top <= bottom:
+            # 大きさのない文字（PDFium が補った空白など）は直前の文字の後ろに置く
+            if not chars:
+                continue
+            center, height, _, left = chars[-1][:4]
+            right = left
+        else:
+            center, height = (bottom + top) / 2, top - bottom
+        chars.append((center, height, left, right, ch))
+
+    lines: list[tuple[float, float, list]] = []
+    for center, height, left, right, ch in sorted(chars, key=lambda c: -c[0]):
+        if lines and abs(lines[-1][0] - center) <= max(LINE_TOLERANCE, min(height, lines[-1][1]) / 2):
+            lines[-1][2].append((left, right, ch))
+        else:
+            lines.append((center, height, [(left, right, ch)]))
+
+    result: list[tuple[float, float, str]] = []
+    for center, height, line_chars in lines:
+        parts: list[str] = []
+        prev_right = None
+        for left, right, ch in sorted(line_chars, key=lambda c: c[0]):
+            if (prev_right is not None and left - prev_right > SPACE_TOLERANCE
+                    and not parts[-1].isspace() and not ch.isspace()):
+                parts.append(" ")
+            parts.append(ch)
+            prev_right = right
+        text = "".join(parts).strip()
+        if text:
+            result.append((center - height / 2, center + height / 2, text))
+    return result
+
+
+class PdfiumHandle:
+    """
+    pypdfium2 で PDF を開き、ページのテキストを取り出す（PdfHandle と同じ使い方）。
+    空・文字化けしたページは pdfplumber で抽出し直す（fallback_pages にその数が残る）
+    """
+
+    def __init__(self, path: str | os.PathLike) -> None:
+        self.path = Path(path)
+        with _PDFIUM_LOCK:
+            self._doc = pdfium.PdfDocument(str(self.path))
+            self.page_count = len(self._doc)
+        self._fallback: PdfHandle | None = None
+        self.fallback_pages = 0
+
+    def _page_lines(self, index: int) -> tuple[list[tuple[float, float, str]], float, float]:
+        """(行, ページ下端の高さ, ページ上端の高さ)"""
+        if index < 0 or index >= self.page_count:
+            raise IndexError("ページ番号が範囲外です。")
+        with _PDFIUM_LOCK:
+            page = self._doc[index]
+            try:
+                textpage = page.get_textpage()
+                try:
+                    lines = _pdfium_lines(textpage)
+                finally:
+                    textpage.close()
+                _, bottom, _, top = page.get_bbox()
+            finally:
+                page.close()
+        return lines, bottom, top
+
+    def extract_text(self, index: int) -> str:
+        text = "\n".join(line for _, _, line in self._page_lines(index)[0])
+        if not looks_broken(text):
+            return text
+        # 空・文字化けしたページは pdfplumber でやり直す（それでも空なら PDFium の結果を使う）
+        if self._fallback is None:
+            self._fallback = PdfHandle(self.path)
+        self.fallback_pages += 1
+        return self._fallback.extract_text(index) or text
+
+    def band_lines(self, index: int) -> list[str]:
+        lines, bottom, top = self._page_lines(index)
+        band = (top - bottom) * BAND_RATIO
+        return [
+            text for line_bottom, line_top, text in lines
+            if line_bottom >= top - band or line_top <= bottom + band
+        ]
+
+    def close(self) -> None:
+        with _PDFIUM_LOCK:
+            self._doc.close()
+        if self._fallback is not None:
+            self._fallback.close()
+
+
+def open_handle(path: str | os.PathLike, extractor: str | None = None) -> PdfHandle | PdfiumHandle:
+    """抽出エンジンに応じたハンドルを開く"""
+    if resolve_extractor(extractor) == "pdfium":
+        return PdfiumHandle(path)
+    return PdfHandle(path)
+
+
+def extract_document_pages(path: str | os.PathLike, extractor: str | None = None) -> list[str]:
+    """PDF の全ページのテキストをページ順に返す（プロセスプールからも呼べるようモジュール関数にしておく）"""
+    pdf = open_handle(path, extractor)
+    try:
+        return [pdf.extract_text(index) for index in range(pdf.page_count)]
+    finally:
+        pdf.close()
+
+
+# ----------------------------------------------------------
+# ヘッダー・フッター（ページ共通の帯）の検出
+# 見つけた行の band_key の集合を返す。SegmentedText の fixed_lines に渡すと、
+# その行は本文とつながず毎ページ同じ1文になるので、文書内で1回だけ訳せばよくなる
+# ----------------------------------------------------------
+def _band_sample(page_count: int) -> list[int]:
+    if page_count <= BAND_SAMPLE_PAGES:
+        return list(range(page_count))
+    step = (page_count - 1) / (BAND_SAMPLE_PAGES - 1)
+    return sorted({round(i * step) for i in range(BAND_SAMPLE_PAGES)})
+
+
+def _find_bands(pdf: PdfHandle | PdfiumHandle) -> set[str]:
+    sample = _band_sample(pdf.page_count)
+    if len(sample) < 2:
+        return set()
+
+    counts: dict[str, int] = {}
+    for index in sample:
+        keys = {band_key(line) for line in pdf.band_lines(index) if line.strip()}
+        for key in keys:
+            counts[key] = counts.get(key, 0) + 1
+
+    threshold = max(2, BAND_MIN_RATIO * len(sample))
+    return {key for key, n in counts.items() if n >= threshold}
+
+
+def detect_repeated_bands(path: str | os.PathLike, extractor: str | None = None) -> set[str]:
+    """PDF の上下の帯に繰り返し現れる行（ヘッダー・フッター・ページ番号）を検出する"""
+    pdf = open_handle(path, extractor)
+    try:
+        return _find_bands(pdf)
+    finally:
+        pdf.close()
+
+
+# ----------------------------------------------------------
+# プロセスプールによる並列抽出
+# ----------------------------------------------------------
+_worker_pdf: tuple[tuple[str, str], PdfHandle | PdfiumHandle] | None = None  # ワーカープロセスごとに開いたハンドル
+
+
+def _worker_open(path: str, extractor: str) -> PdfHandle | PdfiumHandle:
+    global _worker_pdf
+    if _worker_pdf is None or _worker_pdf[0] != (path, extractor):
+        if _worker_pdf is not None:
+            _worker_pdf[1].close()
+        _worker_pdf = ((path, extractor), open_handle(path, extractor))
+    return _worker_pdf[1]
+
+
+def _extract_chunk(path: str, indices: list[int],
+                   extractor: str) -> list[tuple[int, str | None, str | None, float]]:
+    """
+    ワーカープロセス側：(index, text, エラー内容, 抽出にかかった秒数) のリストを返す。
+    ページ単位で失敗を分離する。時間の記録（perf_trace）は呼び出し側のプロセスで行う
+    """
+    pdf = _worker_open(path, extractor)
+    results = []
+    for index in indices:
+        started = time.perf_counter()
+        try:
+            text = pdf.extract_text(index)
+            results.append((index, text, None, time.perf_counter() - started))
+        except Exception as e:
+            results.append((index, None, repr(e), time.perf_counter() - started))
+    return results
+
+
+def _extract_single(path: str | os.PathLike, index: int, extractor: str) -> str:
+    with perf_trace.stage("extract", page=index + 1):
+        pdf = open_handle(path, extractor)
+        try:
+            return pdf.extract_text(index)
+        finally:
+            pdf.close()
+
+
+def _extract_or_error(path: str, index: int, extractor: str) -> str:
+    """このプロセスで1ページ抽出する（失敗したらエラー表示のテキスト）"""
+    try:
+        return _extract_single(path, index, extractor)
+    except Exception as e:
+        return extraction_error_text(e)
+
+
+class PageWorkQueue:
+    """
+    ページのチャンクをプロセスプールで抽出する作業キュー。複数の文書のページを1つのキューに並べられる。
+    add() で文書を並べ、その順に pages() で (index, text) をページ順に受け取る。
+    先に投入するチャンクは workers × EXTRACT_AHEAD_CHUNKS 個までにして、読み出し（翻訳）が遅くても
+    抽出済みテキストが溜まり続けないようにする（前の文書を読み終える前に次の文書の抽出も始まる）。
+    ワーカーで失敗したページ・チャンクはこのプロセスで1ページずつやり直し、
+    それでも失敗したページはエラー表示のテキストに置き換える。with で使い、終了時にプールを止める。
+    """
+
+    def __init__(self, workers: int = EXTRACT_WORKERS, chunk_pages: int = EXTRACT_CHUNK_PAGES,
+                 extractor: str | None = None) -> None:
+        self.workers = max(workers, 1)
+        self.chunk_pages = chunk_pages
+        self.extractor = resolve_extractor(extractor)
+        # Qt や torch のスレッド、抽出のロック（_PDFIUM_LOCK など）を抱えたまま fork しない
+        self._pool = ProcessPoolExecutor(max_workers=self.workers, mp_context=mp.get_context("spawn"))
+        self._next_key = 0
+        self._queued: deque[tuple[int, str, list[int]]] = deque()                 # 未投入のチャンク
+        self._running: deque[tuple[int, str, list[int], Future | None]] = deque()  # 投入済み（読み出し順）
+        self._hung = False
+
+    def __enter__(self) -> "PageWorkQueue":
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self.close()
+
+    @property
+    def backlog(self) -> int:
+        """まだ読み出していないチャンク数"""
+        return len(self._queued) + len(self._running)
+
+    def add(self, path: str | os.PathLike, indices: Iterable[int]) -> int:
+        """文書のページを作業キューに並べ、pages() に渡すキーを返す"""
+        key = self._next_key
+        self._next_key += 1
+        indices = list(indices)
+        for i in range(0, len(indices), self.chunk_pages):
+            self._queued.append((key, str(path), indices[i:i + self.chunk_pages]))
+        self._fill()
+        return key
+
+    def submit(self, fn: Callable, *args) -> Future:
+        """ページ以外の処理（ヘッダー・フッターの検出など）も同じプールで行う"""
+        return self._pool.submit(fn, *args)
+
+    def _fill(self) -> None:
+        while self._queued and len(self._running) < self.workers * EXTRACT_AHEAD_CHUNKS:
+            key, path, chunk = self._queued.popleft()
+            try:
+                future = self._pool.submit(_extract_chunk, path, chunk, self.extractor)
+            except Exception:
+                future = None  # プールが壊れている場合は逐次抽出に回す
+            self._running.append((key, path, chunk, future))
+
+    def _discard(self, key: int) -> None:
+        """key より前の文書の読み残し（途中で打ち切られた文書）を捨てる"""
+        while self._queued and self._queued[0][0] < key:
+            self._queued.popleft()
+        while self._running and self._running[0][0] < key:
+            future = self._running.popleft()[3]
+            if future is not None:
+                future.cancel()
+
+    def pages(self, key: int) -> Iterator[tuple[int, str]]:
+        """add() が返したキーの文書の (index, text) をページ順に返す（文書は add した順に読む）"""
+        self._discard(key)
+        self._fill()
+        while self._running and self._running[0][0] == key:
+            _, path, chunk, future = self._running.popleft()
+            self._fill()
+            try:
+                if future is None:
+                    raise RuntimeError("worker pool unavailable")
+                results = future.result(timeout=EXTRACT_TIMEOUT)
+            except TimeoutError:
+                # 応答しないワーカーは止める（以降のチャンクはこのプロセスでの逐次抽出に回る）
+                self._hung = True
+                self._terminate()
+                raise RuntimeError(f"PDF の並列抽出が {EXTRACT_TIMEOUT} 秒以上応答しません。") from None
+            except Exception:
+                # ワーカープロセスごと落ちた場合など：このチャンクは逐次抽出に切り替える
+                results = [(index, None, "worker failed", 0.0) for index in chunk]
+            for index, text, error, seconds in results:
+                if error is None:
+                    perf_trace.record("extract", seconds, page=index + 1, process="pool")
+                    yield index, text
+                else:
+                    yield index, _extract_or_error(path, index, self.extractor)
+
+    def _terminate(self) -> None:
+        for process in list((self._pool._processes or {}).values()):
+            process.terminate()
+
+    def close(self) -> None:
+        """未着手のタスクを捨ててプールを止める。応答しないワーカーは待たない"""
+        self._queued.clear()
+        for *_, future in self._running:
+            if future is not None:
+                future.cancel()
+        self._running.clear()
+        self._pool.shutdown(wait=not self._hung, cancel_futures=True)
+
+
+def iter_page_texts_parallel(path: str | os.PathLike, indices: Iterable[int],
+                             workers: int = EXTRACT_WORKERS,
+                             chunk_pages: int = EXTRACT_CHUNK_PAGES,
+                             extractor: str | None = None) -> Iterator[tuple[int, str]]:
+    """
+    1つの文書のページ範囲を PageWorkQueue で並列に抽出し、(index, text) をページ順に逐次返す。
+    ページ数が少なければプロセスを起動せず、このプロセスで逐次抽出する。
+    """
+    indices = list(indices)
+    extractor = resolve_extractor(extractor)
+    if workers <= 1 or len(indices) < PARALLEL_MIN_PAGES:
+        for index in indices:
+            yield index, _extract_or_error(str(path), index, extractor)
+        return
+
+    chunks = -(-len(indices) // chunk_pages)
+    with PageWorkQueue(min(workers, chunks), chunk_pages, extractor) as work:
+        yield from work.pages(work.add(path, indices))
+
+
+class PdfPageSource:
+    """
+    PDF を開いたまま保持し、抽出済みページのテキストを LRU でキャッシュする。
+    prefetch() で指定ページをバックグラウンドで先読みする。
+    PDF のハンドル（pdfplumber / PDFium）はスレッドセーフではないため、アクセスはロックで直列化する。
+    """
+
+    def __init__(self, path: str | os.PathLike, cache_size: int = PAGE_CACHE_SIZE,
+                 extractor: str | None = None) -> None:
+        self.path = Path(path)
+        self.cache_size = cache_size
+        self.extractor = resolve_extractor(extractor)
+        self._pdf = open_handle(self.path, self.extractor)
+        self.page_count = self._pdf.page_count
+
+        self._pdf_lock = threading.Lock()
+        self._cache_lock = threading.Lock()
+        self._cache: OrderedDict[int, str] = OrderedDict()
+        self._prefetcher = ThreadPoolExecutor(max_workers=1, thread_name_prefix="pdf-prefetch")
+        self._queued: set[int] = set()
+        self._closed = False
+        self._bands: set[str] | None = None
+
+    # ----------------------------------------
+    # テキスト取得（0始まりの index）
+    # ----------------------------------------
+    def get_text(self, index: int) -> str:
+        if index < 0 or index >= self.page_count:
+            raise IndexError("ページ番号が範囲外です。")
+
+        cached = self._cache_get(index)
+        if cached is not None:
+            return cached
+
+        with self._pdf_lock:
+            # ロック待ちの間に先読みが終わっていればそれを使う
+            cached = self._cache_get(index)
+            if cached is not None:
+                return cached
+            if self._closed:
+                raise RuntimeError("PDF は既に閉じられています。")
+            with perf_trace.stage("extract", page=index + 1):
+                text = self._pdf.extract_text(index)
+
+        self._cache_put(index, text)
+        return text
+
+    def iter_texts(self, indices: Iterable[int] | None = None,
+                   workers: int = 1) -> Iterator[tuple[int, str]]:
+        """
+        (index, text) をページ順に返す。抽出済みのページはキャッシュを再利用する。
+        workers > 1 の場合、未抽出のページはプロセスプールで並列に抽出する。
+        """
+        if indices is None:
+            indices = range(self.page_count)
+        indices = list(indices)
+
+        if workers <= 1:
+            for index in indices:
+                yield index, self.get_text(index)
+            return
+
+        missing = [index for index in indices if self._cache_get(index) is None]
+        missing_set = set(missing)
+        extracted = iter_page_texts_parallel(self.path, missing, workers=workers, extractor=self.extractor)
+        try:
+            for index in indices:
+                if index in missing_set:
+                    # missing は indices と同じ順序なので、次に届くのがこのページ
+                    _, text = next(extracted)
+                    self._cache_put(index, text)
+                else:
+                    text = self.get_text(index)
+                yield index, text
+        finally:
+            extracted.close()
+
+    def repeated_bands(self) -> set[str]:
+        """ヘッダー・フッターの行（detect_repeated_bands と同じ。初回のみ計算）"""
+        with self._pdf_lock:
+            if self._closed:
+                raise RuntimeError("PDF は既に閉じられています。")
+            if self._bands is None:
+                self._bands = _find_bands(self._pdf)
+            return self._bands
+
+    # ----------------------------------------
+    # 先読み
+    # ----------------------------------------
+    def prefetch(self, indices: Iterable[int]) -> None:
+        for index in indices:
+            if not 0 <= index < self.page_count or self._closed:
+                continue
+            with self._cache_lock:
+                if index in self._cache or index in self._queued:
+                    continue
+                self._queued.add(index)
+            self._prefetcher.submit(self._prefetch_one, index)
+
+    def _prefetch_one(self, index: int) -> None:
+        try:
+            if not self._closed:
+                self.get_text(index)
+        except Exception:
+            # 先読みの失敗は無視する（表示時に改めてエラーを出す）
+            pass
+        finally:
+            with self._cache_lock:
+                self._queued.discard(index)
+
+    # ----------------------------------------
+    # LRU キャッシュ
+    # ----------------------------------------
+    def _cache_get(self, index: int) -> str | None:
+        with self._cache_lock:
+            text = self._cache.get(index)
+            if text is not None:
+                self._cache.move_to_end(index)
+            return text
+
+    def _cache_put(self, index: int, text: str) -> None:
+        with self._cache_lock:
+            self._cache[index] = text
+            self._cache.move_to_end(index)
+            while len(self._cache) > self.cache_size:
+                self._cache.popitem(last=False)
+
+    def close(self) -> None:
+        self._closed = True
+        self._prefetcher.shutdown(wait=True, cancel_futures=True)
+        with self._pdf_lock:
+            self._pdf.close()
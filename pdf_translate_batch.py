@@ -0,0 +1,257 @@
+# ==========================================================
+# PDF 一括翻訳（コマンドライン版・GUI 不要）
+# 例:
+#   python pdf_translate_batch.py docs/*.pdf specs/ -o out --tgt vi en --workers 4
+# テキスト抽出はページ単位の作業キュー（プロセスプール）で並列に行い、翻訳はこのプロセスの1モデルで順に処理する
+# 大きな PDF 1つでもページを分けて並列に抽出し、抽出の済んだページから翻訳を始める
+# ==========================================================
+
+import argparse
+import glob
+import sys
+import time
+from collections.abc import Iterable
+from concurrent.futures import Future
+from pathlib import Path
+
+import perf_trace
+from ja_segment import SegmentedText
+from model_runtime import PRECISIONS, resolve_model_dir
+from pdf_extract import (
+    EMPTY_PAGE_TEXT, EXTRACT_TIMEOUT, EXTRACTORS, PageWorkQueue, detect_repeated_bands, open_handle,
+    page_header, resolve_extractor,
+)
+from translation_cache import TranslationCache
+from translation_checkpoint import ResumableOutput, checkpoint_path
+from translation_dedup import DocumentDedup
+from translation_backends import BACKENDS, load_backend
+from translation_engine import (
+    BATCH_SIZE, DECODING_PROFILES, DEFAULT_PROFILE, MAX_BATCH_TOKENS, MAX_LENGTH, decoding_params,
+)
+from vocab_pruning import VOCAB_MODES
+
+
+# ----------------------------------------------------------
+# 入力ファイルの列挙（ファイル・ディレクトリ・glob パターン）
+# ----------------------------------------------------------
+def collect_pdfs(inputs: list[str]) -> list[Path]:
+    found: dict[Path, None] = {}
+    for item in inputs:
+        path = Path(item)
+        if path.is_dir():
+            candidates = sorted(path.rglob("*.pdf"))
+        elif any(ch in item for ch in "*?["):
+            candidates = sorted(Path(p) for p in glob.glob(item, recursive=True))
+        else:
+            candidates = [path]
+        for p in candidates:
+            if p.is_file() and p.suffix.lower() == ".pdf":
+                found[p.resolve()] = None
+            elif not p.exists():
+                print(f"[警告] 見つかりません: {p}", file=sys.stderr)
+    return list(found)
+
+
+def output_path(out_dir: Path, pdf_path: Path, tgt_lang_code: str) -> Path:
+    # PyQt6 版の既定ファイル名と揃える（対訳ファイルは "vi+en" のように + でつなぐ）
+    return out_dir / f"{pdf_path.stem}_all_pages_{tgt_lang_code}.txt"
+
+
+def output_keys(tgt_langs: list[str], bilingual: bool) -> list[str]:
+    """出力ファイルごとのキー（言語コード、対訳ならそれを + でつないだもの）"""
+    return ["+".join(tgt_langs)] if bilingual else list(tgt_langs)
+
+
+def is_complete(out_dir: Path, pdf_path: Path, tgt_lang_code: str) -> bool:
+    path = output_path(out_dir, pdf_path, tgt_lang_code)
+    return path.exists() and not checkpoint_path(path).exists()
+
+
+# ----------------------------------------------------------
+# 1ファイル分の翻訳（抽出したページのテキストを total ページ分、ページ順に受け取る）
+# 1ページごとに追記し、途中で止まっても次回は未完了ページから再開する
+# join_sentences が True なら折り返された行を文単位に組み直して翻訳する（訳文は1段落1行）
+# translate(lines, tgt_langs) は {言語コード: 訳文} を返す。全翻訳先を1回で訳すので、
+# 抽出・トークン化・エンコードは1ページにつき1回で済む
+# bilingual が True なら言語ごとのファイルの代わりに対訳ファイルを1つ書く
+# fixed_lines はヘッダー・フッターの行（detect_repeated_bands の結果）
+# 戻り値：再開したページ数（新規なら 0）
+# ----------------------------------------------------------
+def translate_document(pdf_path: Path, page_texts: Iterable[str], total: int, tgt_langs: list[str],
+                       out_dir: Path, settings: dict, translate,
+                       join_sentences: bool = True, bilingual: bool = False,
+                       fixed_lines: set[str] = frozenset()) -> int:
+    outputs = {
+        key: ResumableOutput(output_path(out_dir, pdf_path, key), pdf_path,
+                             {"tgt_lang": key, **settings}, total)
+        for key in output_keys(tgt_langs, bilingual)
+    }
+    resumed = min(out.start_page for out in outputs.values())
+    try:
+        for index, src_text in enumerate(page_texts):
+            if index < resumed:
+                continue
+            layout = SegmentedText(src_text, join_sentences, fixed_lines)
+            header = page_header(index + 1, total)
+            # 前回の実行でこのページまで完了済みの出力は飛ばす
+            pending = [key for key, out in outputs.items() if out.start_page <= index]
+            translations = {}
+            if src_text.strip():
+                translations = translate(layout.segments, tgt_langs if bilingual else pending)
+            for key in pending:
+                if not src_text.strip():
+                    translated = EMPTY_PAGE_TEXT
+                elif bilingual:
+                    translated = layout.rebuild_bilingual(translations)
+                else:
+                    translated = layout.rebuild(translations[key])
+                outputs[key].append_page(header + translated + "\n\n")
+    except BaseException:
+        for out in outputs.values():
+            out.close()
+        raise
+
+    for out in outputs.values():
+        out.finish()
+    return resumed
+
+
+def main(argv: list[str] | None = None) -> int:
+    parser = argparse.ArgumentParser(description="PDF を一括で日本語 → 指定言語に翻訳します（GUI 不要）")
+    parser.add_argument("inputs", nargs="+", help="PDF ファイル・ディレクトリ・glob パターン")
+    parser.add_argument("-o", "--output-dir", required=True, help="翻訳結果の出力先ディレクトリ")
+    parser.add_argument("--tgt", nargs="+", default=["vi"], choices=["vi", "en"],
+                        help="翻訳先の言語コード（複数指定可）")
+    parser.add_argument("--workers", type=int, default=2, help="テキスト抽出のプロセス数（ページ単位で分担する）")
+    parser.add_argument("--extractor", choices=EXTRACTORS, default=None,
+                        help="テキスト抽出エンジン（省略時は環境変数 TRANSLATOR_EXTRACTOR、なければ pdfium）")
+    parser.add_argument("--model-dir", default=str(resolve_model_dir()), help="ローカルモデルのパス")
+    parser.add_argument("--backend", choices=list(BACKENDS), default=None,
+                        help="推論バックエンド（省略時は TRANSLATOR_SERVER_URL があれば remote、"
+                             "なければ環境変数 TRANSLATOR_BACKEND、既定 torch）")
+    parser.add_argument("--precision", choices=PRECISIONS, default=None,
+                        help="CPU 推論の精度（省略時は環境変数 TRANSLATOR_PRECISION、既定 fp32）")
+    parser.add_argument("--vocab", choices=VOCAB_MODES, default=None,
+                        help="出力語彙（pruned: ベトナム語・英語のトークンに絞って速くする。"
+                             "省略時は環境変数 TRANSLATOR_VOCAB、既定 full）")
+    parser.add_argument("--replicas", default=None,
+                        help="CPU のモデル複製数（数または auto）。指定すると --backend replicas で並列に訳す")
+    parser.add_argument("--replica-threads", type=int, default=None,
+                        help="複製1つあたりの演算スレッド数（省略時は自動）")
+    parser.add_argument("--batch-size", type=int, default=BATCH_SIZE, help="1回の generate の最大行数")
+    parser.add_argument("--max-batch-tokens", type=int, default=MAX_BATCH_TOKENS,
+                        help="1バッチのトークン予算")
+    parser.add_argument("--profile", choices=list(DECODING_PROFILES), default=DEFAULT_PROFILE,
+                        help="デコード設定（fast: 貪欲法の下書き / balanced / quality: ビーム探索）")
+    parser.add_argument("--skip-existing", action="store_true",
+                        help="翻訳が完了している PDF は飛ばす（途中で止まったものは続きから再開）")
+    parser.add_argument("--no-cache", action="store_true", help="翻訳メモリを使わない")
+    parser.add_argument("--line-mode", action="store_true",
+                        help="文単位に組み直さず、PDF の物理行ごとに翻訳する（行の位置を保つ）")
+    parser.add_argument("--bilingual", action="store_true",
+                        help="--tgt の全言語を1つの対訳ファイル（<名前>_all_pages_vi+en.txt）に書く")
+    args = parser.parse_args(argv)
+    args.tgt = list(dict.fromkeys(args.tgt))  # 重複を除く（順序は保つ）
+    extractor = resolve_extractor(args.extractor)
+
+    out_dir = Path(args.output_dir)
+    out_dir.mkdir(parents=True, exist_ok=True)
+
+    pdfs = collect_pdfs(args.inputs)
+    if args.skip_existing:
+        pdfs = [p for p in pdfs
+                if not all(is_complete(out_dir, p, key)
+                           for key in output_keys(args.tgt, args.bilingual))]
+    if not pdfs:
+        print("翻訳対象の PDF がありません。", file=sys.stderr)
+        return 1
+
+    if args.replicas is not None:
+        backend = load_backend(args.model_dir, "replicas", args.precision,
+                               replicas=args.replicas if args.replicas == "auto" else int(args.replicas),
+                               threads=args.replica_threads, vocab=args.vocab)
+    else:
+        backend = load_backend(args.model_dir, args.backend, args.precision, vocab=args.vocab)
+    # 翻訳サーバー（--backend remote / TRANSLATOR_SERVER_URL）の場合、翻訳メモリはサーバー側にある
+    cache = None
+    if not args.no_cache and not backend.remote:
+        cache = TranslationCache(args.model_dir, variant=backend.cache_variant)
+    decoding = decoding_params(args.profile)
+    settings = {
+        "profile": args.profile,
+        **decoding,
+        "max_length": MAX_LENGTH,
+        "model": backend.fingerprint,
+        "variant": backend.cache_variant,
+        "join_sentences": not args.line_mode,
+        "extractor": extractor,
+    }
+
+    def translate(lines: list[str], langs: list[str]) -> dict[str, list[str]]:
+        return backend.translate_lines_multi(
+            lines, langs,
+            batch_size=args.batch_size,
+            max_batch_tokens=args.max_batch_tokens,
+            cache=cache,
+            **decoding,
+        )
+
+    failures = 0
+    workers = max(args.workers, 1)
+    # 全 PDF のページをチャンクに分けて1つの作業キューに並べる。先行させる抽出は workers × 2 チャンクまでで、
+    # 次の PDF は読み残しのチャンクがそれを下回ったら並べる（ページ数を数えるためだけに全 PDF を先に開かない）
+    window = workers * 2
+    with PageWorkQueue(workers, extractor=extractor) as work:
+        # (PDF, 作業キューのキー, ページ数, ヘッダー・フッター) または (PDF, None, 0, 開けなかった理由)
+        pending: list[tuple[Path, int | None, int, Future | Exception | None]] = []
+        next_index = 0
+        while next_index < len(pdfs) or pending:
+            while next_index < len(pdfs) and (not pending or work.backlog < window):
+                pdf_path = pdfs[next_index]
+                next_index += 1
+                try:
+                    pdf = open_handle(pdf_path, extractor)
+                    total = pdf.page_count
+                    pdf.close()
+                except Exception as e:
+                    pending.append((pdf_path, None, 0, e))
+                    continue
+                bands = None if args.line_mode else work.submit(detect_repeated_bands, pdf_path, extractor)
+                pending.append((pdf_path, work.add(pdf_path, range(total)), total, bands))
+
+            pdf_path, key, total, bands = pending.pop(0)
+            started = time.perf_counter()
+            # 文書内で一度訳した文（毎ページのヘッダー・フッターなど）は訳し直さない
+            dedup = DocumentDedup(translate)
+            try:
+                if isinstance(bands, Exception):
+                    raise bands
+                resumed = translate_document(
+                    pdf_path, (text for _, text in work.pages(key)), total, args.tgt, out_dir, settings,
+                    dedup, join_sentences=not args.line_mode, bilingual=args.bilingual,
+                    fixed_lines=bands.result(timeout=EXTRACT_TIMEOUT) if bands is not None else frozenset(),
+                )
+            except Exception as e:
+                failures += 1
+                print(f"[失敗] {pdf_path}: {e}", file=sys.stderr)
+                continue
+            elapsed = time.perf_counter() - started
+            note = f", ページ {resumed + 1} から再開" if resumed else ""
+            if dedup.saved:
+                note += f", 重複 {dedup.saved} / {dedup.segments} 文を省略"
+            print(f"[完了] {pdf_path} ({total} ページ, {elapsed:.1f} 秒{note})", file=sys.stderr)
+
+    if cache is not None:
+        stats = cache.stats()
+        print(f"翻訳メモリ: ヒット {stats['hits']} 件 / ミス {stats['misses']} 件", file=sys.stderr)
+        cache.close()
+    backend.close()
+    if perf_trace.enabled():
+        # TRANSLATOR_PERF=1 のとき、段階ごとの時間と稼働率（どこがボトルネックか）を表示する
+        print(f"処理時間: {perf_trace.summary_text()}", file=sys.stderr)
+
+    return 1 if failures else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
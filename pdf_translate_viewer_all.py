@@ -1,27 +1,42 @@
-import os
 import sys
+from functools import partial
 from pathlib import Path
 
-import pdfplumber
-import torch
-from transformers import AutoTokenizer, AutoModelForSeq2SeqLM
-
 from PyQt6.QtWidgets import (
     QApplication, QMainWindow, QWidget,
     QVBoxLayout, QHBoxLayout,
     QPushButton, QLabel, QTextEdit,
-    QFileDialog, QMessageBox, QComboBox, QProgressDialog
+    QFileDialog, QMessageBox, QComboBox, QProgressDialog, QCheckBox, QSpinBox
 )
-from PyQt6.QtCore import Qt
+from PyQt6.QtCore import Qt, QTimer, pyqtSignal
+
+import perf_trace
+from model_runtime import resolve_model_dir
+from pdf_extract import EXTRACT_WORKERS, PdfPageSource, page_header
+from translation_cache import TranslationCache
+from translation_backends import TranslationBackend, load_backend_async
+from translation_engine import DEFAULT_PROFILE, MAX_LENGTH, PROFILE_LABELS, decoding_params
+from translation_incremental import PageTranslation
+from translation_worker import DocumentTranslationWorker, TextTranslationWorker, TranslationWorker
 
 # ----------------------------------------------------------
 # ローカルモデル設定
+# 環境変数 TRANSLATOR_MODEL_DIR、なければこのフォルダの models/facebook/m2m100_418M
 # ----------------------------------------------------------
-MODEL_DIR = r".\models\facebook\m2m100_418M"
-SRC_LANG = "ja"  # 入力は日本語
+MODEL_DIR = resolve_model_dir()
+
+# バッチ翻訳設定（CPUのコア数・メモリに合わせて調整）
+TRANSLATE_BATCH_SIZE = 16        # 1回の generate に入れる最大行数
+TRANSLATE_MAX_BATCH_TOKENS = 2048  # 1バッチのトークン予算（最長行 × 行数）
+
+# ページ表示時に先読みする前後ページ（現在ページからの相対位置）
+PREFETCH_OFFSETS = (1, -1, 2)
 
 
 class PdfTextExtractorApp(QMainWindow):
+    # モデル読み込みスレッド → GUI スレッドへの完了通知（backend, 例外）
+    backend_loaded = pyqtSignal(object, object)
+
     def __init__(self) -> None:
         super().__init__()
 
@@ -30,14 +45,20 @@ class PdfTextExtractorApp(QMainWindow):
 
         self.pdf_path: Path | None = None
         self.page_count: int = 0
+        self.page_source: PdfPageSource | None = None  # 開いたままの PDF とページテキストのキャッシュ
 
         # 翻訳モデル関連
-        self.tokenizer = None
-        self.model = None
-        self.device = torch.device("cpu")
+        # 環境変数 TRANSLATOR_BACKEND（torch / onnx）・TRANSLATOR_PRECISION（fp32 / bf16 / int8）で選択
+        # TRANSLATOR_SERVER_URL があれば、モデルは読み込まずに翻訳サーバーへ依頼する
+        self.backend: TranslationBackend | None = None
         self.translation_ready: bool = False
+        self.translation_cache: TranslationCache | None = None
+        self._worker: TranslationWorker | None = None
+        # 現在ページの前回の翻訳（入力欄を直して訳し直すとき、変わった文だけを訳すために使う）
+        self._page_translation: PageTranslation | None = None
 
         self._setup_ui()
+        self.backend_loaded.connect(self._on_backend_loaded)
         self._load_translation_model()
 
     # ----------------------------------------
@@ -60,13 +81,16 @@ class PdfTextExtractorApp(QMainWindow):
         file_layout.addWidget(self.btn_open)
         file_layout.addWidget(self.lbl_file, stretch=1)
 
-        # ---- 中：ページ選択エリア（プルダウン）----
+        # ---- 中：ページ選択エリア（ページ番号の入力）----
+        # 数千ページの PDF でも項目を作らずに済むよう、プルダウンではなく番号入力にする
         page_layout = QHBoxLayout()
         self.lbl_page = QLabel("ページ:")
 
-        self.combo_page = QComboBox()
-        self.combo_page.setEnabled(False)
-        self.combo_page.currentIndexChanged.connect(self.on_page_changed_combo)
+        self.spin_page = QSpinBox()
+        self.spin_page.setRange(1, 1)
+        self.spin_page.setEnabled(False)
+        self.spin_page.setKeyboardTracking(False)  # 数字の入力中（1 → 12 → 123）には読み込まない
+        self.spin_page.valueChanged.connect(self.on_page_changed)
 
         self.lbl_page_total = QLabel("/ 0 ページ")
 
@@ -79,7 +103,7 @@ class PdfTextExtractorApp(QMainWindow):
         self.btn_save_all.clicked.connect(self.save_all_pages_text)
 
         page_layout.addWidget(self.lbl_page)
-        page_layout.addWidget(self.combo_page)
+        page_layout.addWidget(self.spin_page)
         page_layout.addWidget(self.lbl_page_total)
         page_layout.addStretch()
         page_layout.addWidget(self.btn_save_current)
@@ -104,6 +128,27 @@ class PdfTextExtractorApp(QMainWindow):
         # 表示名, データ（言語コード）
         self.combo_lang.addItem("ベトナム語", "vi")
         self.combo_lang.addItem("英語", "en")
+        # 両方の言語を1回の処理で訳す（抽出・エンコードは1回）。訳文は段落ごとに [vi] / [en] を並べる
+        self.combo_lang.addItem("ベトナム語 + 英語（対訳）", "vi+en")
+
+        # デコード設定（速度優先は貪欲法、品質優先はビーム探索）
+        self.lbl_profile = QLabel("品質:")
+        self.combo_profile = QComboBox()
+        for profile, label in PROFILE_LABELS.items():
+            self.combo_profile.addItem(label, profile)
+        self.combo_profile.setCurrentIndex(self.combo_profile.findData(DEFAULT_PROFILE))
+        self.combo_profile.setToolTip(
+            "速度優先: 貪欲法で数倍速く訳します（大きな文書の下書き向け）。\n"
+            "品質優先: ビーム探索で訳します。短い行は自動的に貪欲法になります。"
+        )
+
+        # PDF の折り返しで切れた文をつなぎ直してから翻訳する（オフにすると物理行ごと）
+        self.chk_join_sentences = QCheckBox("折り返しをつないで文単位で翻訳")
+        self.chk_join_sentences.setChecked(True)
+        self.chk_join_sentences.setToolTip(
+            "PDF の行末で切れた文を「。！？」までつなぎ直して翻訳します。\n"
+            "訳文は1段落1行になります。元の行ごとに訳したい場合はオフにしてください。"
+        )
 
         self.btn_translate = QPushButton("入力欄のテキストを翻訳（日本語→選択言語）")
         self.btn_translate.setEnabled(False)  # モデル読み込み後に有効化
@@ -119,6 +164,9 @@ class PdfTextExtractorApp(QMainWindow):
 
         trans_ctrl_layout.addWidget(self.lbl_target_lang)
         trans_ctrl_layout.addWidget(self.combo_lang)
+        trans_ctrl_layout.addWidget(self.lbl_profile)
+        trans_ctrl_layout.addWidget(self.combo_profile)
+        trans_ctrl_layout.addWidget(self.chk_join_sentences)
         trans_ctrl_layout.addStretch()
         trans_ctrl_layout.addWidget(self.btn_translate)
         trans_ctrl_layout.addWidget(self.btn_translate_all)
@@ -142,39 +190,87 @@ class PdfTextExtractorApp(QMainWindow):
         main_layout.addWidget(QLabel("🌏 翻訳結果"))
         main_layout.addWidget(self.text_translated, stretch=1)
 
-    # ----------------------------------------
-    # 翻訳モデルの読み込み（ローカル）
-    # ----------------------------------------
-    def _load_translation_model(self) -> None:
-        os.environ["HF_HUB_OFFLINE"] = "1"
-        os.environ["TRANSFORMERS_OFFLINE"] = "1"
-
-        try:
-            if not Path(MODEL_DIR).exists():
-                raise FileNotFoundError(f"モデルディレクトリが見つかりません: {MODEL_DIR}")
-
-            self.tokenizer = AutoTokenizer.from_pretrained(MODEL_DIR)
-            self.model = AutoModelForSeq2SeqLM.from_pretrained(MODEL_DIR)
+        # ---- ステータスバー：処理時間の内訳（抽出 / トークン化 / 生成 / デコード）----
+        self.lbl_perf = QLabel("")
+        self.chk_perf = QCheckBox("処理時間を計測")
+        self.chk_perf.setChecked(perf_trace.enabled())
+        self.chk_perf.toggled.connect(self._on_perf_toggled)
+        self.statusBar().addPermanentWidget(self.lbl_perf)
+        self.statusBar().addPermanentWidget(self.chk_perf)
 
-            self.tokenizer.src_lang = SRC_LANG
+        self._perf_timer = QTimer(self)
+        self._perf_timer.timeout.connect(self._update_perf_label)
+        self._perf_timer.start(1000)
 
-            self.device = torch.device("cuda" if torch.cuda.is_available() else "cpu")
-            self.model.to(self.device)
-            self.model.eval()
-
-            self.translation_ready = True
+    # ----------------------------------------
+    # 処理時間の計測（perf_trace）
+    # ----------------------------------------
+    def _on_perf_toggled(self, checked: bool) -> None:
+        if checked:
+            perf_trace.reset()
+            perf_trace.enable()
+        else:
+            perf_trace.disable()
+        self._update_perf_label()
+
+    def _update_perf_label(self) -> None:
+        text = perf_trace.summary_text() if perf_trace.enabled() else ""
+        if text != self.lbl_perf.text():
+            self.lbl_perf.setText(text)
 
-            # モデル準備OKなら、PDFなしでも翻訳ボタンを有効にする
-            if hasattr(self, "btn_translate"):
-                self.btn_translate.setEnabled(True)
+    # ----------------------------------------
+    # 翻訳モデルの読み込み（ローカル・バックグラウンド）
+    # ウィンドウを先に表示し、読み込みが終わったら翻訳ボタンを有効にする
+    # ----------------------------------------
+    def _load_translation_model(self) -> None:
+        self.statusBar().showMessage("翻訳モデルを読み込み中です…（PDF の表示はすぐに使えます）")
+        future = load_backend_async(MODEL_DIR)
+        future.add_done_callback(
+            lambda f: self.backend_loaded.emit(
+                f.result() if f.exception() is None else None, f.exception()
+            )
+        )
 
-        except Exception as e:
+    def _on_backend_loaded(self, backend: TranslationBackend | None, error: Exception | None) -> None:
+        if error is not None:
+            self.statusBar().showMessage("翻訳モデルを読み込めませんでした。")
             QMessageBox.warning(
                 self,
                 "翻訳モデルエラー",
-                f"翻訳モデルの読み込みに失敗しました:\n{e}\n翻訳機能は無効化されます。"
+                f"翻訳モデルの読み込みに失敗しました:\n{error}\n翻訳機能は無効化されます。"
             )
             self.translation_ready = False
+            return
+
+        self.backend = backend
+        self.translation_ready = True
+        self._open_translation_cache()
+
+        # モデル準備OKなら、PDFなしでも翻訳ボタンを有効にする
+        self._set_translation_busy(self._worker is not None)
+        if backend.remote:
+            self.statusBar().showMessage(
+                f"翻訳サーバーに接続しました（{backend.url}・{backend.info.get('backend')} / {backend.precision}）"
+            )
+        else:
+            self.statusBar().showMessage(
+                f"翻訳モデル準備完了（{backend.name} / {backend.precision}・{backend.load_seconds:.1f} 秒）"
+            )
+
+    # ----------------------------------------
+    # 翻訳メモリ（キャッシュ）を開く
+    # 失敗しても翻訳自体は続行できるよう、キャッシュなしで動かす
+    # 翻訳サーバーを使う場合はサーバー側の翻訳メモリを使う
+    # ----------------------------------------
+    def _open_translation_cache(self) -> None:
+        if self.backend.remote:
+            self.translation_cache = None
+            return
+        try:
+            self.translation_cache = TranslationCache(MODEL_DIR, variant=self.backend.cache_variant)
+        except Exception as e:
+            print(f"翻訳メモリを開けませんでした（キャッシュなしで続行）: {e}", file=sys.stderr)
+            self.translation_cache = None
 
     # ----------------------------------------
     # PDFを開く
@@ -196,45 +292,46 @@ class PdfTextExtractorApp(QMainWindow):
             return
 
         try:
-            with pdfplumber.open(path) as pdf:
-                page_count = len(pdf.pages)
+            page_source = PdfPageSource(path)
         except Exception as e:
             QMessageBox.critical(self, "エラー", f"PDFを開けませんでした:\n{e}")
             return
 
+        if self.page_source is not None:
+            self.page_source.close()
+        self.page_source = page_source
+        page_count = page_source.page_count
+
         self.pdf_path = path
         self.page_count = page_count
 
         self.lbl_file.setText(f"PDFファイル: {str(path)}")
 
-        # ページ番号をコンボボックスに設定
-        self.combo_page.setEnabled(True)
-        self.combo_page.clear()
-        for i in range(1, page_count + 1):
-            self.combo_page.addItem(str(i))
-        self.combo_page.setCurrentIndex(0)
+        # ページ番号の範囲を設定（1ページ目の読み込みは下でまとめて行う）
+        self.spin_page.blockSignals(True)
+        self.spin_page.setRange(1, max(page_count, 1))
+        self.spin_page.setValue(1)
+        self.spin_page.blockSignals(False)
+        self.spin_page.setEnabled(True)
 
         self.lbl_page_total.setText(f"/ {page_count} ページ")
 
         self.btn_save_current.setEnabled(True)
         self.btn_save_all.setEnabled(True)
 
-        # 全ページ翻訳ボタンは、モデルがロードできていれば有効化
-        self.btn_translate_all.setEnabled(self.translation_ready)
+        # 全ページ翻訳ボタンは、モデルがロードできていれば有効化（翻訳中は無効のまま）
+        self.btn_translate_all.setEnabled(self.translation_ready and self._worker is None)
 
         # 1ページ目を表示
         self.load_page_text(1)
 
     # ----------------------------------------
-    # ページ選択（コンボボックス）の変更時
+    # ページ番号の変更時
     # ----------------------------------------
-    def on_page_changed_combo(self, index: int) -> None:
-        """ComboBox の index は 0 始まり → ページ番号は index+1"""
+    def on_page_changed(self, page_number: int) -> None:
+        """page_number は 1 始まり"""
         if self.pdf_path is None:
             return
-        if index < 0:
-            return
-        page_number = index + 1
         self.load_page_text(page_number)
 
     # ----------------------------------------
@@ -242,28 +339,26 @@ class PdfTextExtractorApp(QMainWindow):
     # ----------------------------------------
     def load_page_text(self, page_number: int) -> None:
         """1始まりの page_number で指定"""
-        if self.pdf_path is None:
+        if self.pdf_path is None or self.page_source is None:
             return
 
+        index = page_number - 1  # pdfplumber は 0 始まり
         try:
-            with pdfplumber.open(self.pdf_path) as pdf:
-                index = page_number - 1  # pdfplumber は 0 始まり
-                if index < 0 or index >= len(pdf.pages):
-                    raise IndexError("ページ番号が範囲外です。")
-
-                page = pdf.pages[index]
-                text = page.extract_text() or ""
-
+            text = self.page_source.get_text(index)
         except Exception as e:
             QMessageBox.critical(self, "エラー", f"ページの読み込みに失敗しました:\n{e}")
             return
 
+        # 前後のページをバックグラウンドで先読みしておく
+        self.page_source.prefetch(index + offset for offset in PREFETCH_OFFSETS)
+
         if not text.strip():
             text = "[このページからテキストを抽出できませんでした。画像のみのページの可能性があります。]"
 
         self.text_edit.setPlainText(text)
-        # ページを切り替えたら翻訳結果はいったんクリア
+        # ページを切り替えたら翻訳結果（と差分翻訳用の前回の結果）はいったんクリア
         self.text_translated.clear()
+        self._page_translation = None
         self.btn_save_translated.setEnabled(False)
 
     # ----------------------------------------
@@ -276,7 +371,7 @@ class PdfTextExtractorApp(QMainWindow):
             return
 
         # 現在のページ番号（1始まり）
-        current_page = self.combo_page.currentIndex() + 1 if self.combo_page.count() > 0 else 1
+        current_page = self.spin_page.value()
 
         default_name = "page_text.txt"
         if self.pdf_path:
@@ -303,7 +398,7 @@ class PdfTextExtractorApp(QMainWindow):
     # 全ページのテキストをまとめて保存（日本語）
     # ----------------------------------------
     def save_all_pages_text(self) -> None:
-        if self.pdf_path is None:
+        if self.pdf_path is None or self.page_source is None:
             QMessageBox.warning(self, "エラー", "PDFが選択されていません。")
             return
 
@@ -320,80 +415,131 @@ class PdfTextExtractorApp(QMainWindow):
         if not save_path:
             return
 
+        total = self.page_source.page_count
+        progress = QProgressDialog("全ページのテキストを抽出中です…", "キャンセル", 0, total, self)
+        progress.setWindowTitle("抽出中")
+        progress.setWindowModality(Qt.WindowModality.WindowModal)
+        progress.setMinimumDuration(0)
+
+        # 1ページずつ一時ファイルに書き出す（全ページ分のテキストをメモリに溜めない）
+        # 完了したら保存先に置き換え、キャンセル・エラー時は一時ファイルを消す
+        part_path = Path(save_path + ".part")
         try:
-            all_text_parts: list[str] = []
-            with pdfplumber.open(self.pdf_path) as pdf:
-                total = len(pdf.pages)
-                for i, page in enumerate(pdf.pages, start=1):
-                    text = page.extract_text() or ""
-                    header = f"===== ページ {i} / {total} =====\n"
-                    all_text_parts.append(header + text + "\n\n")
+            with open(part_path, "w", encoding="utf-8") as f:
+                # 表示済み・先読み済みのページはキャッシュを再利用し、残りはプロセスプールで並列抽出
+                for done, (index, text) in enumerate(
+                        self.page_source.iter_texts(workers=EXTRACT_WORKERS), start=1):
+                    f.write(page_header(index + 1, total) + text + "\n\n")
 
-            result_text = "".join(all_text_parts)
-            Path(save_path).write_text(result_text, encoding="utf-8")
+                    progress.setValue(done)
+                    QApplication.processEvents()
+                    if progress.wasCanceled():
+                        break
+            if progress.wasCanceled():
+                part_path.unlink(missing_ok=True)
+                QMessageBox.information(self, "中断", "保存をキャンセルしました。")
+                return
+            part_path.replace(save_path)
 
         except Exception as e:
+            part_path.unlink(missing_ok=True)
             QMessageBox.critical(self, "エラー", f"全ページ保存中にエラーが発生しました:\n{e}")
             return
+        finally:
+            progress.close()
 
         QMessageBox.information(self, "完了", "全ページの日本語テキストを保存しました。")
 
     # ----------------------------------------
-    # 実際の翻訳処理（日本語 → tgt_lang_code）
-    # 1行ごとに翻訳して、改行位置を揃える
-    # progress_dialog が渡された場合は行ごとに進捗更新
+    # 実際の翻訳処理（日本語 → tgt_lang_codes の各言語）
+    # 行単位で翻訳して改行位置を揃える（内部ではトークン長ごとにバッチ化）
+    # ワーカースレッドから呼ばれる。progress_callback には処理済み（行 × 言語）数の増分が渡される
+    # profile は翻訳開始時に選ばれていたもの（途中でコンボを変えても混ざらない）
     # ----------------------------------------
-    def _translate_text(self, text: str, tgt_lang_code: str,
-                        progress_dialog: QProgressDialog | None = None) -> str:
-        if not self.translation_ready or self.tokenizer is None or self.model is None:
+    def _translate_lines(self, lines: list[str], tgt_lang_codes: list[str],
+                         progress_callback=None, cancel_event=None,
+                         profile: str = DEFAULT_PROFILE) -> dict[str, list[str]]:
+        if not self.translation_ready or self.backend is None:
             raise RuntimeError("翻訳モデルが初期化されていません。")
 
-        lines = text.splitlines()
-        forced_bos_token_id = self.tokenizer.get_lang_id(tgt_lang_code)
-        translated_lines: list[str] = []
+        return self.backend.translate_lines_multi(
+            lines, tgt_lang_codes,
+            batch_size=TRANSLATE_BATCH_SIZE,
+            max_batch_tokens=TRANSLATE_MAX_BATCH_TOKENS,
+            progress_callback=progress_callback,
+            cancel_event=cancel_event,
+            cache=self.translation_cache,
+            **decoding_params(profile),
+        )
 
-        current_value = progress_dialog.value() if progress_dialog is not None else 0
+    def _translate_fn(self):
+        """現在選ばれているプロファイルで訳す関数（ワーカーに渡す）"""
+        return partial(self._translate_lines, profile=self.combo_profile.currentData())
 
-        for line in lines:
-            # 完全な空行はそのまま
-            if not line.strip():
-                translated_lines.append("")
-                if progress_dialog is not None:
-                    current_value += 1
-                    progress_dialog.setValue(current_value)
-                    QApplication.processEvents()
-                    if progress_dialog.wasCanceled():
-                        raise RuntimeError("ユーザーがキャンセルしました。")
-                continue
-
-            encoded = self.tokenizer(
-                line,
-                return_tensors="pt",
-                padding=True,
-                truncation=True,
-                max_length=512,
-            )
-            encoded = {k: v.to(self.device) for k, v in encoded.items()}
-
-            with torch.no_grad():
-                generated = self.model.generate(
-                    **encoded,
-                    forced_bos_token_id=forced_bos_token_id,
-                    max_length=512,
-                    num_beams=4,
-                )
+    # ----------------------------------------
+    # 再開用チェックポイントに記録するデコード設定
+    # （設定やモデルが変わった場合は最初から翻訳し直す）
+    # ----------------------------------------
+    def _decoding_settings(self) -> dict:
+        profile = self.combo_profile.currentData()
+        return {
+            "profile": profile,
+            **decoding_params(profile),
+            "max_length": MAX_LENGTH,
+            "model": self.backend.fingerprint,
+            "variant": self.backend.cache_variant,
+            "join_sentences": self.chk_join_sentences.isChecked(),
+        }
 
-            out = self.tokenizer.batch_decode(generated, skip_special_tokens=True)
-            translated_lines.append(out[0])
+    # ----------------------------------------
+    # ワーカーの起動（プログレスダイアログと接続）
+    # ----------------------------------------
+    def _start_worker(self, worker: TranslationWorker, label: str) -> None:
+        progress = QProgressDialog(label, "キャンセル", 0, 0, self)
+        progress.setWindowTitle("翻訳中")
+        progress.setWindowModality(Qt.WindowModality.WindowModal)
+        progress.setMinimumDuration(0)
+        progress.setAutoReset(False)
+        progress.setAutoClose(False)
+
+        def on_progress(done: int, total: int) -> None:
+            progress.setMaximum(max(total, 1))
+            progress.setValue(done)
 
-            if progress_dialog is not None:
-                current_value += 1
-                progress_dialog.setValue(current_value)
-                QApplication.processEvents()
-                if progress_dialog.wasCanceled():
-                    raise RuntimeError("ユーザーがキャンセルしました。")
+        def on_cancel_requested() -> None:
+            progress.setLabelText("キャンセルしています…")
+            worker.cancel()
 
-        return "\n".join(translated_lines)
+        def on_finished() -> None:
+            progress.close()
+            self._worker = None
+            self._set_translation_busy(False)
+            worker.deleteLater()
+
+        worker.progress.connect(on_progress)
+        progress.canceled.connect(on_cancel_requested)
+        worker.cancelled.connect(
+            lambda: QMessageBox.information(self, "中断", "翻訳をキャンセルしました。")
+        )
+        worker.failed.connect(
+            lambda message: QMessageBox.critical(
+                self, "翻訳エラー", f"翻訳中にエラーが発生しました:\n{message}"
+            )
+        )
+        worker.finished.connect(on_finished)
+
+        self._worker = worker
+        self._set_translation_busy(True)
+        progress.show()
+        worker.start()
+
+    def _set_translation_busy(self, busy: bool) -> None:
+        """ワーカー実行中は翻訳系ボタンを無効化する（モデルは同時に1ジョブのみ）"""
+        self.btn_open.setEnabled(not busy)  # 翻訳中は開いている PDF を差し替えない
+        self.btn_translate.setEnabled(not busy and self.translation_ready)
+        self.btn_translate_all.setEnabled(
+            not busy and self.translation_ready and self.pdf_path is not None
+        )
 
     # ----------------------------------------
     # 現在のテキスト（入力欄の中身）を翻訳（プログレスバー付き）
@@ -402,56 +548,55 @@ class PdfTextExtractorApp(QMainWindow):
         if not self.translation_ready:
             QMessageBox.warning(self, "翻訳エラー", "翻訳モデルが読み込まれていません。")
             return
+        if self._worker is not None:
+            return
 
         src_text = self.text_edit.toPlainText()
         if not src_text.strip():
             QMessageBox.information(self, "情報", "翻訳するテキストがありません。")
             return
 
-        tgt_lang_code = self.combo_lang.currentData()  # "vi" or "en"
-
-        lines = src_text.splitlines()
-        total_steps = len(lines) if lines else 1
+        tgt_lang_code = self.combo_lang.currentData()  # "vi" / "en" / "vi+en"
 
-        progress = QProgressDialog("テキストを翻訳中です…", "キャンセル", 0, total_steps, self)
-        progress.setWindowTitle("翻訳中")
-        progress.setWindowModality(Qt.WindowModality.WindowModal)
-        progress.setMinimumDuration(0)
+        # 同じページ・同じ設定の前回の結果があれば、変わった文だけを訳して差し込む
+        worker = TextTranslationWorker(
+            self._translate_fn(), src_text, tgt_lang_code, self,
+            join_sentences=self.chk_join_sentences.isChecked(),
+            previous=self._page_translation,
+            settings=self._decoding_settings(),
+        )
 
-        try:
-            translated = self._translate_text(src_text, tgt_lang_code, progress_dialog=progress)
-        except RuntimeError as e:
-            if "キャンセル" in str(e):
-                QMessageBox.information(self, "中断", "翻訳をキャンセルしました。")
-            else:
-                QMessageBox.critical(self, "翻訳エラー", f"翻訳中にエラーが発生しました:\n{e}")
-            return
-        except Exception as e:
-            QMessageBox.critical(self, "翻訳エラー", f"翻訳中にエラーが発生しました:\n{e}")
-            return
-        finally:
-            progress.close()
+        def on_succeeded(translated: str) -> None:
+            self.text_translated.setPlainText(translated)
+            self.btn_save_translated.setEnabled(True)
+            self._page_translation = worker.result
+            if worker.result.reused:
+                changed = len(worker.result.segments) - worker.result.reused
+                self.statusBar().showMessage(
+                    f"変更のあった {changed} 文だけを訳し直しました（{worker.result.reused} 文は前回の訳を再利用）。"
+                )
 
-        self.text_translated.setPlainText(translated)
-        self.btn_save_translated.setEnabled(True)
+        worker.succeeded.connect(on_succeeded)
+        self._start_worker(worker, "テキストを翻訳中です…")
 
     # ----------------------------------------
     # 全ページを翻訳して保存（プログレスバー付き）
     # ----------------------------------------
     def translate_and_save_all_pages(self) -> None:
-        if self.pdf_path is None:
+        if self.pdf_path is None or self.page_source is None:
             QMessageBox.warning(self, "エラー", "PDFが選択されていません。")
             return
         if not self.translation_ready:
             QMessageBox.warning(self, "翻訳エラー", "翻訳モデルが読み込まれていません。")
             return
+        if self._worker is not None:
+            return
 
         tgt_lang_code = self.combo_lang.currentData()
-        tgt_lang_label = "vi" if tgt_lang_code == "vi" else "en"
 
         default_name = "all_pages_translated.txt"
         if self.pdf_path:
-            default_name = f"{self.pdf_path.stem}_all_pages_{tgt_lang_label}.txt"
+            default_name = f"{self.pdf_path.stem}_all_pages_{tgt_lang_code}.txt"
 
         save_path, _ = QFileDialog.getSaveFileName(
             self,
@@ -462,56 +607,32 @@ class PdfTextExtractorApp(QMainWindow):
         if not save_path:
             return
 
-        # ページ数をステップ数とする
-        try:
-            with pdfplumber.open(self.pdf_path) as pdf:
-                total_pages = len(pdf.pages)
-        except Exception as e:
-            QMessageBox.critical(self, "エラー", f"PDFオープンに失敗しました:\n{e}")
-            return
-
-        progress = QProgressDialog("全ページを翻訳中です…", "キャンセル", 0, total_pages, self)
-        progress.setWindowTitle("翻訳中")
-        progress.setWindowModality(Qt.WindowModality.WindowModal)
-        progress.setMinimumDuration(0)
-
-        try:
-            all_text_parts: list[str] = []
-            with pdfplumber.open(self.pdf_path) as pdf:
-                total = len(pdf.pages)
-                for i, page in enumerate(pdf.pages, start=1):
-                    if progress.wasCanceled():
-                        raise RuntimeError("ユーザーがキャンセルしました。")
-
-                    src_text = page.extract_text() or ""
-                    header = f"===== ページ {i} / {total} =====\n"
-
-                    if src_text.strip():
-                        translated = self._translate_text(src_text, tgt_lang_code)
-                    else:
-                        translated = "[このページには翻訳対象のテキストがありません。]"
-
-                    all_text_parts.append(header + translated + "\n\n")
-
-                    progress.setValue(i)
-                    QApplication.processEvents()
-
-            result_text = "".join(all_text_parts)
-            Path(save_path).write_text(result_text, encoding="utf-8")
-
-        except RuntimeError as e:
-            if "キャンセル" in str(e):
-                QMessageBox.information(self, "中断", "翻訳をキャンセルしました。")
-            else:
-                QMessageBox.critical(self, "翻訳エラー", f"全ページ翻訳中にエラーが発生しました:\n{e}")
-            return
-        except Exception as e:
-            QMessageBox.critical(self, "翻訳エラー", f"全ページ翻訳中にエラーが発生しました:\n{e}")
-            return
-        finally:
-            progress.close()
+        # 抽出エンジンが変わると原文も変わりうるので、再開の条件に含める
+        worker = DocumentTranslationWorker(
+            self._translate_fn(), self.page_source, Path(save_path), tgt_lang_code,
+            {**self._decoding_settings(), "extractor": self.page_source.extractor}, self,
+            join_sentences=self.chk_join_sentences.isChecked(),
+        )
 
-        QMessageBox.information(self, "完了", "全ページの翻訳結果を保存しました。")
+        def on_succeeded(_path: str) -> None:
+            message = "全ページの翻訳結果を保存しました。"
+            if worker.resumed_from:
+                message += f"\n（前回の続き: ページ {worker.resumed_from} から再開）"
+            if worker.dedup.saved:
+                message += (f"\n文書内の重複: 延べ {worker.dedup.segments} 文のうち "
+                            f"{worker.dedup.saved} 文は訳し直さずに再利用")
+            if self.translation_cache is not None:
+                stats = self.translation_cache.stats()
+                message += f"\n翻訳メモリ（起動後の累計）: ヒット {stats['hits']} 件 / ミス {stats['misses']} 件"
+            QMessageBox.information(self, "完了", message)
+
+        worker.succeeded.connect(on_succeeded)
+        worker.cancelled.connect(
+            lambda: self.statusBar().showMessage(
+                "翻訳済みのページは保存済みです。同じ保存先で再実行すると続きから再開します。"
+            )
+        )
+        self._start_worker(worker, "全ページを翻訳中です…")
 
     # ----------------------------------------
     # 翻訳結果を保存（現在ページ）
@@ -522,13 +643,12 @@ class PdfTextExtractorApp(QMainWindow):
             QMessageBox.information(self, "情報", "保存する翻訳テキストがありません。")
             return
 
-        current_page = self.combo_page.currentIndex() + 1 if self.combo_page.count() > 0 else 1
+        current_page = self.spin_page.value()
         tgt_lang_code = self.combo_lang.currentData()
-        tgt_lang_label = "vi" if tgt_lang_code == "vi" else "en"
 
         default_name = "page_translated.txt"
         if self.pdf_path:
-            default_name = f"{self.pdf_path.stem}_page{current_page}_{tgt_lang_label}.txt"
+            default_name = f"{self.pdf_path.stem}_page{current_page}_{tgt_lang_code}.txt"
 
         save_path, _ = QFileDialog.getSaveFileName(
             self,
@@ -547,6 +667,19 @@ class PdfTextExtractorApp(QMainWindow):
 
         QMessageBox.information(self, "完了", "翻訳結果を保存しました。")
 
+    # ----------------------------------------
+    # 終了時：実行中の翻訳を止めてから閉じる
+    # ----------------------------------------
+    def closeEvent(self, event) -> None:
+        if self._worker is not None:
+            self._worker.cancel()
+            self._worker.wait()
+        if self.page_source is not None:
+            self.page_source.close()
+        if self.backend is not None:
+            self.backend.close()
+        super().closeEvent(event)
+
 
 def main() -> None:
     app = QApplication(sys.argv)
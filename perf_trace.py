@@ -0,0 +1,257 @@
+# ==========================================================
+# 処理段階ごとの時間計測（抽出 / トークン化 / 生成 / デコード）
+# 無効時は stage() が共有のダミーを返すだけなので、ほぼ負荷はかからない。
+# 有効にするには環境変数 TRANSLATOR_PERF=1、
+# JSON Lines のトレースも書き出すなら TRANSLATOR_PERF_TRACE=<ファイル> を設定する
+# （アプリからは enable() / disable() でも切り替えられる）
+# ==========================================================
+
+import bisect
+import json
+import os
+import threading
+import time
+from collections.abc import Callable
+
+STAGE_LABELS = {
+    "extract": "抽出",
+    "tokenize": "トークン化",
+    "encode": "エンコード",
+    "generate": "生成",
+    "decode": "デコード",
+}
+
+# ヒストグラムの区切り（ミリ秒）
+BUCKETS_MS = (0.1, 0.5, 1, 2, 5, 10, 20, 50, 100, 200, 500, 1000, 2000, 5000, 10000, 30000)
+
+
+class StageStats:
+    """1段階分の回数・合計時間・ヒストグラム・生成トークン数"""
+
+    __slots__ = ("count", "total", "max", "buckets", "tokens")
+
+    def __init__(self) -> None:
+        self.count = 0
+        self.total = 0.0  # 秒
+        self.max = 0.0
+        self.buckets = [0] * (len(BUCKETS_MS) + 1)
+        self.tokens = 0
+
+    def add(self, seconds: float, tokens: int = 0) -> None:
+        self.count += 1
+        self.total += seconds
+        self.max = max(self.max, seconds)
+        self.buckets[bisect.bisect_left(BUCKETS_MS, seconds * 1000)] += 1
+        self.tokens += tokens
+
+    def quantile_ms(self, q: float) -> float:
+        """ヒストグラムから求めた分位点（その区間の上限値。ただし最大値を超えない）"""
+        max_ms = round(self.max * 1000, 2)
+        if not self.count:
+            return 0.0
+        target = q * self.count
+        seen = 0
+        for i, n in enumerate(self.buckets):
+            seen += n
+            if seen >= target:
+                return min(BUCKETS_MS[i], max_ms) if i < len(BUCKETS_MS) else max_ms
+        return max_ms
+
+    def as_dict(self) -> dict:
+        result = {
+            "count": self.count,
+            "total_ms": round(self.total * 1000, 2),
+            "mean_ms": round(self.total * 1000 / self.count, 2) if self.count else 0.0,
+            "p50_ms": self.quantile_ms(0.5),
+            "p95_ms": self.quantile_ms(0.95),
+            "max_ms": round(self.max * 1000, 2),
+            "histogram_ms": dict(zip([*map(str, BUCKETS_MS), "inf"], self.buckets)),
+        }
+        if self.tokens:
+            result["tokens"] = self.tokens
+            result["tokens_per_sec"] = round(self.tokens / self.total, 1) if self.total else 0.0
+        return result
+
+
+class _Span:
+    __slots__ = ("name", "attrs", "started")
+
+    def __init__(self, name: str, attrs: dict) -> None:
+        self.name = name
+        self.attrs = attrs
+        self.started = 0.0
+
+    def set(self, **attrs) -> None:
+        """計測中に分かった値（生成トークン数など）を追加する"""
+        self.attrs.update(attrs)
+
+    def __enter__(self) -> "_Span":
+        self.started = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc) -> None:
+        record(self.name, time.perf_counter() - self.started, **self.attrs)
+
+
+class _NullSpan:
+    """無効時に返すダミー（何もしない）"""
+
+    __slots__ = ()
+
+    def set(self, **attrs) -> None:
+        pass
+
+    def __enter__(self) -> "_NullSpan":
+        return self
+
+    def __exit__(self, *exc) -> None:
+        pass
+
+
+_NULL_SPAN = _NullSpan()
+
+_enabled = False
+_lock = threading.Lock()
+_stats: dict[str, StageStats] = {}
+_trace_file = None
+_hooks: list[Callable[[dict], None]] = []
+# パイプライン（translation_pipeline.py）の実行時間と、段ごとの処理時間・待ち時間の合計（秒）
+_pipeline = {"runs": 0, "wall": 0.0, "busy": {}, "starved": 0.0, "blocked": 0.0}
+
+
+def enable(trace_path: str | os.PathLike | None = None) -> None:
+    """計測を有効にする。trace_path を指定すると1イベント1行の JSON を追記する"""
+    global _enabled, _trace_file
+    with _lock:
+        if trace_path is not None and _trace_file is None:
+            _trace_file = open(trace_path, "a", encoding="utf-8", buffering=1)
+        _enabled = True
+
+
+def disable() -> None:
+    global _enabled, _trace_file
+    with _lock:
+        _enabled = False
+        if _trace_file is not None:
+            _trace_file.close()
+            _trace_file = None
+
+
+def enabled() -> bool:
+    return _enabled
+
+
+def stage(name: str, **attrs):
+    """with perf_trace.stage("generate", batch=8) as span: ... の形で使う"""
+    return _Span(name, attrs) if _enabled else _NULL_SPAN
+
+
+def record(name: str, seconds: float, **attrs) -> None:
+    """外部で測った時間を記録する（プロセスプールでの抽出など）"""
+    if not _enabled:
+        return
+    event = {
+        "t": round(time.time(), 6),
+        "stage": name,
+        "ms": round(seconds * 1000, 3),
+        "thread": threading.current_thread().name,
+        **attrs,
+    }
+    with _lock:
+        _stats.setdefault(name, StageStats()).add(seconds, attrs.get("tokens", 0))
+        if _trace_file is not None:
+            _trace_file.write(json.dumps(event, ensure_ascii=False) + "\n")
+        hooks = list(_hooks)
+    for hook in hooks:
+        hook(event)
+
+
+def add_hook(hook: Callable[[dict], None]) -> None:
+    """イベントごとに呼ばれる関数を登録する（外部のプロファイラとの連携用）"""
+    with _lock:
+        _hooks.append(hook)
+
+
+def remove_hook(hook: Callable[[dict], None]) -> None:
+    with _lock:
+        if hook in _hooks:
+            _hooks.remove(hook)
+
+
+def record_pipeline(wall: float, busy: dict[str, float], starved: float, blocked: float) -> None:
+    """パイプライン1回分（wall 秒）の各段の処理時間を記録する（稼働率の計算用）"""
+    if not _enabled:
+        return
+    with _lock:
+        _pipeline["runs"] += 1
+        _pipeline["wall"] += wall
+        for name, seconds in busy.items():
+            _pipeline["busy"][name] = _pipeline["busy"].get(name, 0.0) + seconds
+        _pipeline["starved"] += starved
+        _pipeline["blocked"] += blocked
+        if _trace_file is not None:
+            _trace_file.write(json.dumps({
+                "t": round(time.time(), 6),
+                "stage": "pipeline",
+                "ms": round(wall * 1000, 3),
+                "busy_ms": {name: round(s * 1000, 3) for name, s in busy.items()},
+                "starved_ms": round(starved * 1000, 3),
+                "blocked_ms": round(blocked * 1000, 3),
+            }, ensure_ascii=False) + "\n")
+
+
+def pipeline_snapshot() -> dict:
+    """
+    パイプラインの各段の稼働率（処理時間 / 実行時間）。一番高い段がボトルネック。
+    starved は生成が前段（トークン化）を待った割合、blocked は後段（デコード）の空きを待った割合
+    """
+    with _lock:
+        wall = _pipeline["wall"]
+        if not _pipeline["runs"] or not wall:
+            return {}
+        utilisation = {name: round(s / wall, 3) for name, s in _pipeline["busy"].items()}
+        return {
+            "runs": _pipeline["runs"],
+            "wall_ms": round(wall * 1000, 2),
+            "utilisation": utilisation,
+            "bottleneck": max(utilisation, key=utilisation.get),
+            "starved": round(_pipeline["starved"] / wall, 3),
+            "blocked": round(_pipeline["blocked"] / wall, 3),
+        }
+
+
+def snapshot() -> dict[str, dict]:
+    """段階ごとの集計（STAGE_LABELS の順、その他は後ろ）"""
+    with _lock:
+        names = [n for n in STAGE_LABELS if n in _stats] + [n for n in _stats if n not in STAGE_LABELS]
+        return {name: _stats[name].as_dict() for name in names}
+
+
+def reset() -> None:
+    with _lock:
+        _stats.clear()
+        _pipeline.update(runs=0, wall=0.0, busy={}, starved=0.0, blocked=0.0)
+
+
+def summary_text(stats: dict[str, dict] | None = None, pipeline: dict | None = None) -> str:
+    """ステータスバー向けの1行要約"""
+    if stats is None:
+        stats = snapshot()
+    if pipeline is None:
+        pipeline = pipeline_snapshot()
+    parts = [
+        f"{STAGE_LABELS.get(name, name)} {s['count']}回 平均{s['mean_ms']:.0f}ms"
+        for name, s in stats.items()
+    ]
+    generate = stats.get("generate")
+    if generate and generate.get("tokens_per_sec"):
+        parts.append(f"{generate['tokens_per_sec']:.0f} tok/s")
+    if pipeline:
+        parts.append("稼働率 " + " / ".join(
+            f"{STAGE_LABELS.get(name, name)}{ratio:.0%}" for name, ratio in pipeline["utilisation"].items()
+        ))
+    return " ｜ ".join(parts)
+
+
+if os.environ.get("TRANSLATOR_PERF", "0") != "0" or os.environ.get("TRANSLATOR_PERF_TRACE"):
+    enable(os.environ.get("TRANSLATOR_PERF_TRACE") or None)
@@ -0,0 +1,58 @@
+# tools/bench_backends.py
+# 推論バックエンド（torch / onnx）の速度を比較する
+#   python tools/bench_backends.py
+#   python tools/bench_backends.py --backends torch onnx --precision int8 --beams 1 4
+# 生成トークン数 / 秒と、torch の訳との一致率を表示する
+import argparse
+import sys
+import time
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parents[1]
+sys.path.insert(0, str(ROOT))
+
+from model_runtime import resolve_model_dir  # noqa: E402
+from translation_backends import BACKENDS, load_backend  # noqa: E402
+
+DEFAULT_SAMPLES = Path(__file__).resolve().parent / "samples_ja.txt"
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="推論バックエンドの速度比較")
+    parser.add_argument("--model-dir", default=str(resolve_model_dir()))
+    parser.add_argument("--samples", default=str(DEFAULT_SAMPLES), help="1行1文の日本語サンプル")
+    parser.add_argument("--backends", nargs="+", default=list(BACKENDS), choices=list(BACKENDS))
+    parser.add_argument("--precision", default=None, help="fp32 / bf16 / int8（省略時は環境変数）")
+    parser.add_argument("--beams", nargs="+", type=int, default=[1, 4], help="比較するビーム数")
+    parser.add_argument("--tgt", default="vi", choices=["vi", "en"])
+    parser.add_argument("--repeat", type=int, default=3, help="計測の繰り返し回数（最速値を採用）")
+    args = parser.parse_args()
+
+    lines = [line for line in Path(args.samples).read_text(encoding="utf-8").splitlines() if line.strip()]
+
+    print(f"サンプル {len(lines)} 文 / 翻訳先 {args.tgt}")
+    print(f"{'backend':<14}{'beams':>6}{'sec':>9}{'tokens/s':>11}{'match':>8}")
+    reference: dict[int, list[str]] = {}
+    for name in args.backends:
+        backend = load_backend(args.model_dir, name, args.precision)
+        label = f"{backend.name}-{backend.precision}"
+        for beams in args.beams:
+            # ウォームアップ（セッション初期化・メモリ確保を計測から除外）
+            backend.translate_lines(lines[:2], args.tgt, num_beams=beams)
+
+            best = float("inf")
+            outputs: list[str] = []
+            for _ in range(args.repeat):
+                started = time.perf_counter()
+                outputs = backend.translate_lines(lines, args.tgt, num_beams=beams)
+                best = min(best, time.perf_counter() - started)
+
+            tokens = sum(len(backend.tokenizer.tokenize(o)) for o in outputs)
+            reference.setdefault(beams, outputs)
+            match = sum(o == r for o, r in zip(outputs, reference[beams])) / len(lines)
+            print(f"{label:<14}{beams:>6}{best:>9.2f}{tokens / best:>11.1f}{match:>8.1%}")
+        del backend
+
+
+if __name__ == "__main__":
+    main()
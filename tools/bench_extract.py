@@ -0,0 +1,59 @@
+# tools/bench_extract.py
+# テキスト抽出エンジン（pdfium / pdfplumber）の速度を比較する
+#   python tools/bench_extract.py docs/*.pdf
+#   python tools/bench_extract.py catalog.pdf --pages 200 --extractors pdfium pdfplumber
+# ページ / 秒と、pdfplumber の結果との一致率（ページ単位・空白の違いは無視）を表示する
+import argparse
+import sys
+import time
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parents[1]
+sys.path.insert(0, str(ROOT))
+
+from pdf_extract import EXTRACTORS, PdfiumHandle, open_handle  # noqa: E402
+
+
+def extract(path: Path, extractor: str, pages: int) -> tuple[list[str], float, int]:
+    """(ページごとのテキスト（空白を正規化）, 秒数, pdfplumber でやり直したページ数)"""
+    started = time.perf_counter()
+    pdf = open_handle(path, extractor)
+    try:
+        texts = [" ".join(pdf.extract_text(i).split()) for i in range(min(pdf.page_count, pages))]
+        fallback = pdf.fallback_pages if isinstance(pdf, PdfiumHandle) else 0
+    finally:
+        pdf.close()
+    return texts, time.perf_counter() - started, fallback
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="テキスト抽出エンジンの速度比較")
+    parser.add_argument("pdfs", nargs="+", help="計測する PDF")
+    parser.add_argument("--extractors", nargs="+", default=list(EXTRACTORS), choices=list(EXTRACTORS))
+    parser.add_argument("--pages", type=int, default=100, help="1ファイルあたり先頭から何ページ計測するか")
+    args = parser.parse_args()
+
+    print(f"{'file':<28}{'extractor':<12}{'pages':>7}{'sec':>9}{'pages/s':>10}{'fallback':>10}{'match':>8}")
+    totals: dict[str, list[float]] = {name: [0, 0.0] for name in args.extractors}
+    for path in map(Path, args.pdfs):
+        results = {name: extract(path, name, args.pages) for name in args.extractors}
+        # 一致率の基準は pdfplumber（比較対象に含めていなければ別に抽出する）
+        if "pdfplumber" in results:
+            reference = results["pdfplumber"][0]
+        else:
+            reference = extract(path, "pdfplumber", args.pages)[0]
+        for name, (texts, elapsed, fallback) in results.items():
+            count = len(texts)
+            match = sum(a == b for a, b in zip(texts, reference)) / max(count, 1)
+            totals[name][0] += count
+            totals[name][1] += elapsed
+            print(f"{path.name[:27]:<28}{name:<12}{count:>7}{elapsed:>9.2f}{count / elapsed:>10.1f}"
+                  f"{fallback:>10}{match:>8.1%}")
+
+    for name, (pages, seconds) in totals.items():
+        if seconds:
+            print(f"合計 {name}: {pages:.0f} ページ / {seconds:.2f} 秒（{pages / seconds:.1f} ページ/秒）")
+
+
+if __name__ == "__main__":
+    main()
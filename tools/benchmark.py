@@ -0,0 +1,347 @@
+# tools/benchmark.py
+# オフラインで再現できる翻訳のベンチマーク
+#   python tools/benchmark.py                        # 実モデルがあればそれ、なければ小さなランダムモデル
+#   python tools/benchmark.py --tiny -o bench.json   # CI 向け（ランダム初期化の小さな M2M100）
+#   python tools/benchmark.py --batch-sizes 8 16 --beams 1 4 --threads 1 4 --precisions fp32 int8 -o bench.csv
+#   python tools/benchmark.py --profiles fast balanced quality   # デコード設定のプロファイルで比べる
+# 同梱のコーパス（bench_corpus_ja.txt、ページは ===== 区切り）を PyQt6 版・Streamlit 版と同じ経路
+# （文単位への組み直し → translate_lines → 段落の組み立て直し）で翻訳し、
+# ページごとのレイテンシ（p50 / p95 / p99）、文／秒、トークン／秒、ピーク RSS を記録する
+import argparse
+import csv
+import hashlib
+import itertools
+import json
+import os
+import platform
+import subprocess
+import sys
+import threading
+import time
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parents[1]
+sys.path.insert(0, str(ROOT))
+
+from ja_segment import SegmentedText  # noqa: E402
+from model_runtime import PRECISIONS, resolve_model_dir  # noqa: E402
+from translation_backends import BACKENDS, load_backend  # noqa: E402
+from translation_cache import model_fingerprint  # noqa: E402
+from translation_engine import (  # noqa: E402
+    BATCH_SIZE, DECODING_PROFILES, MAX_LENGTH, NUM_BEAMS, decoding_params,
+)
+
+DEFAULT_CORPUS = Path(__file__).resolve().parent / "bench_corpus_ja.txt"
+PAGE_SEPARATOR = "====="
+
+# CI 用の小さなランダムモデル（初回に作成して .cache に保存する）
+TINY_MODEL_DIR = ROOT / ".cache" / "bench_tiny_m2m100"
+TINY_SEED = 0
+TINY_CONFIG = {
+    "d_model": 32,
+    "encoder_layers": 2,
+    "decoder_layers": 2,
+    "encoder_attention_heads": 2,
+    "decoder_attention_heads": 2,
+    "encoder_ffn_dim": 64,
+    "decoder_ffn_dim": 64,
+    "max_position_embeddings": 1024,
+}
+
+
+# ----------------------------------------------------------
+# コーパスとモデル
+# ----------------------------------------------------------
+def load_corpus(path: Path) -> list[str]:
+    """ページ（===== 区切り）のリストを返す"""
+    pages: list[list[str]] = [[]]
+    for line in path.read_text(encoding="utf-8").splitlines():
+        if line.strip() == PAGE_SEPARATOR:
+            pages.append([])
+        else:
+            pages[-1].append(line)
+    return ["\n".join(page) for page in pages if any(line.strip() for line in page)]
+
+
+def build_tiny_model(out_dir: Path, corpus_pages: list[str]) -> Path:
+    """コーパスから SentencePiece を学習し、ランダム初期化の M2M100 と合わせて保存する（ネット接続不要）"""
+    if (out_dir / "config.json").exists():
+        return out_dir
+
+    import sentencepiece as spm
+    import torch
+    from transformers import M2M100Config, M2M100ForConditionalGeneration, M2M100Tokenizer
+
+    out_dir.mkdir(parents=True, exist_ok=True)
+    lines = [line for page in corpus_pages for line in page.splitlines() if line.strip()]
+    spm_prefix = out_dir / "sentencepiece.bpe"
+    spm.SentencePieceTrainer.train(
+        sentence_iterator=iter(lines),
+        model_prefix=str(spm_prefix),
+        model_type="bpe",
+        vocab_size=1000,
+        hard_vocab_limit=False,
+        character_coverage=1.0,
+        bos_id=0, pad_id=1, eos_id=2, unk_id=3, pad_piece="<pad>",
+        num_threads=1,
+        minloglevel=2,
+    )
+    processor = spm.SentencePieceProcessor(model_file=f"{spm_prefix}.model")
+    vocab = {processor.id_to_piece(i): i for i in range(processor.get_piece_size())}
+    vocab_path = out_dir / "vocab.json"
+    vocab_path.write_text(json.dumps(vocab, ensure_ascii=False), encoding="utf-8")
+
+    tokenizer = M2M100Tokenizer(str(vocab_path), f"{spm_prefix}.model", src_lang="ja")
+    tokenizer.save_pretrained(out_dir)
+
+    config = M2M100Config(
+        # 言語トークン・予備トークン（madeup words）は SentencePiece の語彙の後ろに並ぶ
+        vocab_size=max(tokenizer.lang_token_to_id.values()) + 1 + tokenizer.num_madeup_words,
+        pad_token_id=tokenizer.pad_token_id,
+        bos_token_id=0,
+        eos_token_id=2,
+        decoder_start_token_id=2,
+        **TINY_CONFIG,
+    )
+    torch.manual_seed(TINY_SEED)
+    M2M100ForConditionalGeneration(config).save_pretrained(out_dir)
+    return out_dir
+
+
+def choose_model_dir(args, corpus_pages: list[str]) -> tuple[Path, str]:
+    """(モデルディレクトリ, 種別) を返す。実モデルがなければ小さなランダムモデルを使う"""
+    if not args.tiny:
+        model_dir = resolve_model_dir(args.model_dir)
+        if (model_dir / "config.json").exists():
+            return model_dir, "real"
+        if args.model_dir is not None:
+            raise SystemExit(f"モデルが見つかりません: {model_dir}")
+        print(f"{model_dir} にモデルがないため、小さなランダムモデルで計測します。", file=sys.stderr)
+    return build_tiny_model(TINY_MODEL_DIR, corpus_pages), "tiny"
+
+
+# ----------------------------------------------------------
+# 計測の補助
+# ----------------------------------------------------------
+def current_rss_mb() -> float | None:
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE") / 2 ** 20
+    except (OSError, ValueError, AttributeError):
+        return None
+
+
+def process_peak_rss_mb() -> float | None:
+    """プロセス開始からの最大 RSS（/proc が使えない環境向け）"""
+    try:
+        import resource
+    except ImportError:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak / 2 ** 20 if sys.platform == "darwin" else peak / 1024
+
+
+class PeakRssSampler:
+    """with ブロックの間、RSS の最大値を別スレッドで記録する"""
+
+    def __init__(self, interval: float = 0.005) -> None:
+        self.interval = interval
+        self.peak_mb: float | None = None
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, daemon=True)
+
+    def _sample(self) -> None:
+        rss = current_rss_mb()
+        if rss is not None:
+            self.peak_mb = rss if self.peak_mb is None else max(self.peak_mb, rss)
+
+    def _run(self) -> None:
+        while not self._stop.wait(self.interval):
+            self._sample()
+
+    def __enter__(self) -> "PeakRssSampler":
+        self._sample()
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self._stop.set()
+        self._thread.join()
+        self._sample()
+        if self.peak_mb is None:
+            self.peak_mb = process_peak_rss_mb()
+
+
+def percentile(values: list[float], q: float) -> float:
+    """線形補間のパーセンタイル（q は 0〜100）"""
+    ordered = sorted(values)
+    if not ordered:
+        return 0.0
+    pos = (len(ordered) - 1) * q / 100
+    lower = int(pos)
+    upper = min(lower + 1, len(ordered) - 1)
+    return ordered[lower] + (ordered[upper] - ordered[lower]) * (pos - lower)
+
+
+def environment_info(model_dir: Path, model_kind: str, corpus_path: Path) -> dict:
+    import torch
+    import transformers
+
+    try:
+        commit = subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], cwd=ROOT,
+            capture_output=True, text=True, check=True,
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        commit = ""
+    return {
+        "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S%z"),
+        "commit": commit,
+        "model": model_kind,
+        "model_dir": str(model_dir),
+        "model_fingerprint": model_fingerprint(model_dir),
+        "corpus_sha256": hashlib.sha256(corpus_path.read_bytes()).hexdigest(),
+        "python": platform.python_version(),
+        "torch": torch.__version__,
+        "transformers": transformers.__version__,
+        "platform": platform.platform(),
+        "cpu_count": os.cpu_count(),
+    }
+
+
+# ----------------------------------------------------------
+# 1設定分の計測
+# ----------------------------------------------------------
+def run_case(backend, pages: list[SegmentedText], tgt_lang_code: str, *,
+             batch_size: int, max_length: int, repeat: int, **decoding) -> dict:
+    """decoding は num_beams やプロファイルの設定（translate_lines にそのまま渡す）"""
+    def translate(layout: SegmentedText) -> tuple[str, list[str]]:
+        outputs = backend.translate_lines(
+            layout.segments, tgt_lang_code,
+            batch_size=batch_size, max_length=max_length, **decoding,
+        )
+        return layout.rebuild(outputs), outputs
+
+    # ウォームアップ（初回のメモリ確保などを計測から除外）
+    translate(pages[0])
+
+    latencies: list[float] = []
+    segments = 0
+    input_tokens = 0
+    output_tokens = 0
+    with PeakRssSampler() as rss:
+        for _ in range(repeat):
+            for layout in pages:
+                page_started = time.perf_counter()
+                _, outputs = translate(layout)
+                latencies.append(time.perf_counter() - page_started)
+
+                segments += len(layout.segments)
+                input_tokens += sum(len(ids) for ids in backend.tokenizer(layout.segments)["input_ids"])
+                output_tokens += sum(len(backend.tokenizer.tokenize(o)) for o in outputs)
+    elapsed = sum(latencies)  # トークン数の集計時間は含めない
+
+    return {
+        "pages": len(latencies),
+        "segments": segments,
+        "seconds": round(elapsed, 4),
+        "latency_p50_ms": round(percentile(latencies, 50) * 1000, 2),
+        "latency_p95_ms": round(percentile(latencies, 95) * 1000, 2),
+        "latency_p99_ms": round(percentile(latencies, 99) * 1000, 2),
+        "segments_per_sec": round(segments / elapsed, 2),
+        "input_tokens_per_sec": round(input_tokens / elapsed, 1),
+        "output_tokens_per_sec": round(output_tokens / elapsed, 1),
+        "peak_rss_mb": round(rss.peak_mb, 1) if rss.peak_mb is not None else None,
+    }
+
+
+def write_results(path: Path, meta: dict, results: list[dict]) -> None:
+    if path.suffix.lower() == ".csv":
+        # 1行1設定。コミット間で比べやすいよう、環境情報も各行に入れる
+        rows = [{**meta, **result} for result in results]
+        with open(path, "w", newline="", encoding="utf-8") as f:
+            writer = csv.DictWriter(f, fieldnames=list(rows[0]))
+            writer.writeheader()
+            writer.writerows(rows)
+    else:
+        path.write_text(
+            json.dumps({"meta": meta, "results": results}, ensure_ascii=False, indent=2),
+            encoding="utf-8",
+        )
+
+
+def main() -> None:
+    import torch
+
+    local_backends = [name for name, cls in BACKENDS.items() if not cls.remote]
+    parser = argparse.ArgumentParser(description="オフラインの翻訳ベンチマーク（JSON / CSV に保存）")
+    parser.add_argument("--model-dir", default=None,
+                        help="モデルのパス（省略時は models/facebook/m2m100_418M、なければ --tiny と同じ）")
+    parser.add_argument("--tiny", action="store_true", help="小さなランダム初期化モデルで計測する（CI 向け）")
+    parser.add_argument("--corpus", default=str(DEFAULT_CORPUS), help="ページを ===== で区切った日本語テキスト")
+    parser.add_argument("--backend", choices=local_backends, default="torch")
+    parser.add_argument("--tgt", default="vi", choices=["vi", "en"])
+    parser.add_argument("--batch-sizes", nargs="+", type=int, default=[BATCH_SIZE])
+    parser.add_argument("--beams", nargs="+", type=int, default=[1, NUM_BEAMS])
+    parser.add_argument("--profiles", nargs="+", choices=list(DECODING_PROFILES), default=None,
+                        help="--beams の代わりにデコード設定のプロファイルで比べる")
+    parser.add_argument("--max-lengths", nargs="+", type=int, default=[MAX_LENGTH])
+    parser.add_argument("--precisions", nargs="+", choices=PRECISIONS, default=["fp32"])
+    parser.add_argument("--threads", nargs="+", type=int, default=[torch.get_num_threads()],
+                        help="torch の演算スレッド数")
+    parser.add_argument("--repeat", type=int, default=1, help="コーパスを何周するか")
+    parser.add_argument("-o", "--output", default=None, help="結果の保存先（.json または .csv）")
+    args = parser.parse_args()
+
+    corpus_path = Path(args.corpus)
+    corpus_pages = load_corpus(corpus_path)
+    pages = [SegmentedText(page) for page in corpus_pages]
+    model_dir, model_kind = choose_model_dir(args, corpus_pages)
+    meta = environment_info(model_dir, model_kind, corpus_path)
+
+    print(f"モデル: {model_dir}（{model_kind}）/ コーパス {len(pages)} ページ・"
+          f"{sum(len(p.segments) for p in pages)} 文 / 翻訳先 {args.tgt}")
+    if args.profiles:
+        decodings = [(name, decoding_params(name)) for name in args.profiles]
+    else:
+        decodings = [(None, {"num_beams": beams}) for beams in args.beams]
+
+    header = (f"{'precision':<10}{'thr':>4}{'batch':>6}{'decoding':>10}{'maxlen':>7}"
+              f"{'p50ms':>9}{'p95ms':>9}{'p99ms':>9}{'seg/s':>8}{'tok/s':>9}{'RSS MB':>9}")
+    print(header)
+
+    results: list[dict] = []
+    for precision in args.precisions:
+        backend = load_backend(model_dir, args.backend, precision)
+        for threads, batch_size, (profile, decoding), max_length in itertools.product(
+                args.threads, args.batch_sizes, decodings, args.max_lengths):
+            torch.set_num_threads(threads)
+            case = {
+                "backend": backend.name,
+                "precision": backend.precision,
+                "threads": threads,
+                "batch_size": batch_size,
+                "profile": profile,
+                "num_beams": decoding["num_beams"],
+                "max_length": max_length,
+            }
+            case.update(run_case(
+                backend, pages, args.tgt,
+                batch_size=batch_size, max_length=max_length, repeat=args.repeat,
+                **decoding,
+            ))
+            results.append(case)
+            rss = f"{case['peak_rss_mb']:.0f}" if case["peak_rss_mb"] is not None else "-"
+            label = profile or f"beams={decoding['num_beams']}"
+            print(f"{case['precision']:<10}{threads:>4}{batch_size:>6}{label:>10}{max_length:>7}"
+                  f"{case['latency_p50_ms']:>9.1f}{case['latency_p95_ms']:>9.1f}{case['latency_p99_ms']:>9.1f}"
+                  f"{case['segments_per_sec']:>8.1f}{case['output_tokens_per_sec']:>9.1f}{rss:>9}")
+        del backend
+
+    if args.output:
+        write_results(Path(args.output), meta, results)
+        print(f"結果を保存しました: {args.output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,136 @@
+# tools/build_vocab.py
+# 出力語彙の絞り込み（TRANSLATOR_VOCAB=pruned）で使う許可リストをコーパスから作り、速度と訳の一致を確かめる
+#   python tools/build_vocab.py
+#   python tools/build_vocab.py --corpus docs_ja.txt --text-en manual_en.txt --profile quality
+# 日本語コーパスを全語彙のモデルで訳し、生成されたトークン・訳文のトークン（と --text-vi / --text-en の文章）を
+# 翻訳先の文字で書けるトークンに加えて <モデル>/optimized/vocab/<言語>.json に保存する。
+# そのあと絞り込んだモデルで訳し直し、全語彙との完全一致率と翻訳時間を表示する
+import argparse
+import sys
+import time
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parents[1]
+sys.path.insert(0, str(ROOT))
+
+from model_runtime import PRECISIONS, load_model, resolve_model_dir  # noqa: E402
+from translation_engine import (  # noqa: E402
+    DECODING_PROFILES, DEFAULT_PROFILE, decoding_params, translate_lines,
+)
+from vocab_pruning import TARGET_LANGS, build_whitelist, save_whitelist  # noqa: E402
+
+DEFAULT_CORPORA = [
+    Path(__file__).resolve().parent / "samples_ja.txt",
+    Path(__file__).resolve().parent / "bench_corpus_ja.txt",
+]
+PAGE_SEPARATOR = "====="
+
+
+def read_lines(paths: list[Path]) -> list[str]:
+    """1行1文（ページ区切りの ===== と空行は除く）。重複は1つにする"""
+    lines: dict[str, None] = {}
+    for path in paths:
+        for line in path.read_text(encoding="utf-8").splitlines():
+            if line.strip() and line.strip() != PAGE_SEPARATOR:
+                lines[line.strip()] = None
+    return list(lines)
+
+
+def record_generated(model, seen: set[int]):
+    """
+    model.generate を包み、生成したトークン番号を seen に集める（元に戻す関数を返す）。
+    ビーム探索は最終的に残らなかった候補とも比べて訳を選ぶため、各ステップで候補になりうる
+    上位（ビーム数 × 2）のトークンも集める
+    """
+    from transformers import LogitsProcessor, LogitsProcessorList
+
+    class CandidateRecorder(LogitsProcessor):
+        def __init__(self, width: int) -> None:
+            self.width = width
+
+        def __call__(self, input_ids, scores):
+            top = scores.topk(min(self.width, scores.shape[-1]), dim=-1).indices
+            seen.update(top.flatten().tolist())
+            return scores
+
+    original = model.generate
+
+    def generate(*args, **kwargs):
+        processors = LogitsProcessorList(kwargs.pop("logits_processor", None) or [])
+        processors.append(CandidateRecorder(2 * kwargs.get("num_beams", 1)))
+        output = original(*args, logits_processor=processors, **kwargs)
+        seen.update(output.flatten().tolist())
+        return output
+
+    model.generate = generate
+    return lambda: setattr(model, "generate", original)
+
+
+def timed_translate(tokenizer, model, device, lines: list[str], tgt: str,
+                    decoding: dict) -> tuple[list[str], float]:
+    translate_lines(tokenizer, model, device, lines[:4], tgt, **decoding)  # ウォームアップ
+    started = time.perf_counter()
+    outputs = translate_lines(tokenizer, model, device, lines, tgt, **decoding)
+    return outputs, time.perf_counter() - started
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="出力語彙の許可リストの作成と確認")
+    parser.add_argument("--model-dir", default=str(resolve_model_dir()))
+    parser.add_argument("--corpus", nargs="+", type=Path, default=DEFAULT_CORPORA,
+                        help="日本語コーパス（1行1文、===== のページ区切り可）")
+    parser.add_argument("--text-vi", nargs="*", type=Path, default=[], help="ベトナム語の文章（トークンを許可リストに加える）")
+    parser.add_argument("--text-en", nargs="*", type=Path, default=[], help="英語の文章（同上）")
+    parser.add_argument("--eval", nargs="*", type=Path, default=None,
+                        help="一致率を確かめる日本語の文（省略時は --corpus）")
+    parser.add_argument("--tgt", nargs="+", default=list(TARGET_LANGS), choices=list(TARGET_LANGS))
+    parser.add_argument("--precision", choices=PRECISIONS, default="fp32")
+    parser.add_argument("--profile", choices=list(DECODING_PROFILES), default=DEFAULT_PROFILE)
+    parser.add_argument("--no-check", action="store_true", help="絞り込んだモデルでの確認を行わない")
+    args = parser.parse_args()
+
+    model_dir = resolve_model_dir(args.model_dir)
+    corpus = read_lines(args.corpus)
+    eval_lines = read_lines(args.eval) if args.eval else corpus
+    decoding = decoding_params(args.profile)
+    texts = {"vi": args.text_vi, "en": args.text_en}
+
+    tokenizer, model, device = load_model(model_dir, args.precision, "full")
+    vocab_size = model.config.vocab_size
+    print(f"モデル: {model_dir}（語彙 {vocab_size}）/ コーパス {len(corpus)} 文 / 確認 {len(eval_lines)} 文")
+
+    full_outputs: dict[str, tuple[list[str], float]] = {}
+    for tgt in args.tgt:
+        seen: set[int] = set()
+        restore = record_generated(model, seen)
+        try:
+            outputs = translate_lines(tokenizer, model, device, corpus, tgt, **decoding)
+        finally:
+            restore()
+        references = outputs + read_lines(texts[tgt])
+        ids = build_whitelist(tokenizer, tgt, references, seen)
+        save_whitelist(model_dir, tgt, ids, corpus_lines=len(corpus))
+        print(f"{tgt}: {len(ids)} トークン（生成 {len(seen)}）を保存しました")
+        if not args.no_check:
+            full_outputs[tgt] = timed_translate(tokenizer, model, device, eval_lines, tgt, decoding)
+    if args.no_check:
+        return
+
+    del model
+    tokenizer, pruned, device = load_model(model_dir, args.precision, "pruned")
+    kept = pruned.get_output_embeddings().out_features
+    print(f"絞り込み後の出力語彙: {kept}（{kept / vocab_size:.1%}）")
+    print(f"{'tgt':<5}{'full 秒':>9}{'pruned 秒':>11}{'速度比':>8}{'一致':>9}")
+    for tgt, (reference, full_seconds) in full_outputs.items():
+        outputs, seconds = timed_translate(tokenizer, pruned, device, eval_lines, tgt, decoding)
+        same = sum(a == b for a, b in zip(outputs, reference))
+        print(f"{tgt:<5}{full_seconds:>9.2f}{seconds:>11.2f}{full_seconds / seconds:>8.2f}"
+              f"{same:>5}/{len(reference)}")
+        for a, b in zip(reference, outputs):
+            if a != b:
+                print(f"  例 full  : {a}\n     pruned: {b}")
+                break
+
+
+if __name__ == "__main__":
+    main()
@@ -1,15 +1,61 @@
 # tools/download_model.py
-from huggingface_hub import snapshot_download
+# モデルをダウンロードし、起動を速くする最適化済みの成果物（<モデル>/optimized/）を作る
+#   python tools/download_model.py                  # ダウンロード + 成果物の作成
+#   python tools/download_model.py --prepare-only   # ダウンロード済みのフォルダから作成（ネットワーク不要）
+#   python tools/download_model.py --verify         # manifest.json のチェックサムを照合
+# 成果物は fp16 / bf16 の safetensors・int8 量子化済みモデル・構築済みトークナイザー（model_artifacts.py を参照）
+import argparse
+import sys
 from pathlib import Path
 
+ROOT = Path(__file__).resolve().parents[1]
+sys.path.insert(0, str(ROOT))
+
+from model_artifacts import ARTIFACTS, DEFAULT_ARTIFACTS, prepare_artifacts, verify_artifacts  # noqa: E402
+
 # 変更可: 保存先
-TARGET_DIR = Path(__file__).resolve().parents[1] / "models" / "facebook" / "m2m100_418M"
+TARGET_DIR = ROOT / "models" / "facebook" / "m2m100_418M"
+REPO_ID = "facebook/m2m100_418M"
 
-if __name__ == "__main__":
-    TARGET_DIR.parent.mkdir(parents=True, exist_ok=True)
+
+def download(target_dir: Path) -> None:
+    from huggingface_hub import snapshot_download
+
+    target_dir.parent.mkdir(parents=True, exist_ok=True)
     snapshot_download(
-        repo_id="facebook/m2m100_418M",
-        local_dir=str(TARGET_DIR),
+        repo_id=REPO_ID,
+        local_dir=str(target_dir),
         local_dir_use_symlinks=False
     )
-    print(f"Downloaded to: {TARGET_DIR}")
\ No newline at end of file
+    print(f"Downloaded to: {target_dir}")
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description="モデルのダウンロードと最適化済み成果物の作成")
+    parser.add_argument("--model-dir", type=Path, default=TARGET_DIR, help="保存先（既存のモデルのフォルダ）")
+    parser.add_argument("--prepare-only", action="store_true", help="ダウンロードせず、既存のフォルダから成果物だけを作る")
+    parser.add_argument("--no-prepare", action="store_true", help="ダウンロードだけ行う")
+    parser.add_argument("--artifacts", nargs="+", choices=list(ARTIFACTS), default=list(DEFAULT_ARTIFACTS),
+                        help="作る成果物（元の重みが .bin のみなら fp32 の safetensors も作る）")
+    parser.add_argument("--verify", action="store_true", help="成果物のチェックサムを照合するだけ")
+    args = parser.parse_args()
+
+    if args.verify:
+        problems = verify_artifacts(args.model_dir)
+        for problem in problems:
+            print(problem, file=sys.stderr)
+        print("問題ありません。" if not problems else f"{len(problems)} 件の問題があります。")
+        return 1 if problems else 0
+
+    if not args.prepare_only:
+        download(args.model_dir)
+    if args.no_prepare:
+        return 0
+    print(f"最適化済みの成果物を作成します: {args.model_dir}")
+    prepare_artifacts(args.model_dir, args.artifacts)
+    print("完了しました。アプリは起動時に manifest.json を見て、環境に合う成果物を読み込みます。")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
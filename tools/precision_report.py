@@ -0,0 +1,102 @@
+# tools/precision_report.py
+# CPU 精度モード（fp32 / bf16 / int8）の速度と訳の一致度を比較する
+#   python tools/precision_report.py
+#   python tools/precision_report.py --modes fp32 int8 --tgt en --json report.json
+# 基準は fp32 の訳。一致率（完全一致）と chrF（文字 n-gram の F スコア）で品質を比べる
+import argparse
+import json
+import sys
+import time
+from collections import Counter
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parents[1]
+sys.path.insert(0, str(ROOT))
+
+from model_runtime import PRECISIONS, cpu_supports_bf16, load_model, resolve_model_dir  # noqa: E402
+from translation_engine import translate_lines  # noqa: E402
+
+DEFAULT_SAMPLES = Path(__file__).resolve().parent / "samples_ja.txt"
+
+
+def chrf(hypothesis: str, reference: str, max_n: int = 6, beta: float = 2.0) -> float:
+    """chrF（空白を除いた文字 n-gram の F-β スコア、0〜100）"""
+    hyp = hypothesis.replace(" ", "")
+    ref = reference.replace(" ", "")
+    scores = []
+    for n in range(1, max_n + 1):
+        hyp_ngrams = Counter(hyp[i:i + n] for i in range(len(hyp) - n + 1))
+        ref_ngrams = Counter(ref[i:i + n] for i in range(len(ref) - n + 1))
+        if not hyp_ngrams or not ref_ngrams:
+            continue
+        overlap = sum((hyp_ngrams & ref_ngrams).values())
+        precision = overlap / sum(hyp_ngrams.values())
+        recall = overlap / sum(ref_ngrams.values())
+        if precision + recall == 0:
+            scores.append(0.0)
+        else:
+            scores.append((1 + beta ** 2) * precision * recall / (beta ** 2 * precision + recall))
+    if not scores:
+        return 100.0 if hyp == ref else 0.0
+    return 100.0 * sum(scores) / len(scores)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="精度モードごとの速度・品質レポート")
+    parser.add_argument("--model-dir", default=str(resolve_model_dir()))
+    parser.add_argument("--samples", default=str(DEFAULT_SAMPLES), help="1行1文の日本語サンプル")
+    parser.add_argument("--modes", nargs="+", default=list(PRECISIONS), choices=PRECISIONS)
+    parser.add_argument("--tgt", default="vi", choices=["vi", "en"])
+    parser.add_argument("--json", default=None, help="結果を JSON で保存するパス")
+    args = parser.parse_args()
+
+    lines = [line for line in Path(args.samples).read_text(encoding="utf-8").splitlines() if line.strip()]
+
+    modes = list(args.modes)
+    if "bf16" in modes and not cpu_supports_bf16():
+        print("この CPU は bf16 非対応のため bf16 は除外します。", file=sys.stderr)
+        modes.remove("bf16")
+    if "fp32" not in modes:
+        modes.insert(0, "fp32")  # 品質比較の基準
+
+    results = []
+    reference: list[str] | None = None
+    for mode in modes:
+        started = time.perf_counter()
+        tokenizer, model, device = load_model(args.model_dir, mode)
+        load_sec = time.perf_counter() - started
+
+        # 1回目はウォームアップ（初回のみのメモリ確保などを除外）
+        translate_lines(tokenizer, model, device, lines[:2], args.tgt)
+        started = time.perf_counter()
+        outputs = translate_lines(tokenizer, model, device, lines, args.tgt)
+        translate_sec = time.perf_counter() - started
+
+        if mode == "fp32":
+            reference = outputs
+        exact = sum(o == r for o, r in zip(outputs, reference)) / len(lines)
+        score = sum(chrf(o, r) for o, r in zip(outputs, reference)) / len(lines)
+
+        results.append({
+            "mode": mode,
+            "load_sec": round(load_sec, 2),
+            "translate_sec": round(translate_sec, 2),
+            "segments_per_sec": round(len(lines) / translate_sec, 2),
+            "exact_match_vs_fp32": round(exact, 3),
+            "chrf_vs_fp32": round(score, 1),
+        })
+        del model
+
+    base = next(r for r in results if r["mode"] == "fp32")["translate_sec"]
+    print(f"サンプル {len(lines)} 文 / 翻訳先 {args.tgt}")
+    print(f"{'mode':<6}{'load(s)':>9}{'translate(s)':>14}{'speedup':>9}{'exact':>8}{'chrF':>8}")
+    for r in results:
+        print(f"{r['mode']:<6}{r['load_sec']:>9.2f}{r['translate_sec']:>14.2f}"
+              f"{base / r['translate_sec']:>8.2f}x{r['exact_match_vs_fp32']:>8.1%}{r['chrf_vs_fp32']:>8.1f}")
+
+    if args.json:
+        Path(args.json).write_text(json.dumps(results, ensure_ascii=False, indent=2), encoding="utf-8")
+
+
+if __name__ == "__main__":
+    main()
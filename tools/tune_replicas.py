@@ -0,0 +1,89 @@
+# tools/tune_replicas.py
+# CPU のデータ並列（TRANSLATOR_BACKEND=replicas）の「複製数 × スレッド数」を、このマシンで実測して決める
+#   python tools/tune_replicas.py                 # 候補を全部試し、一番速い構成を .cache/replica_layout.json に保存
+#   python tools/tune_replicas.py --threads 2 4 8 --no-save
+# 保存した構成は TRANSLATOR_REPLICAS=auto（既定）のときに使われる（コア数・モデル・精度が同じ場合のみ）
+import argparse
+import sys
+import time
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parents[1]
+sys.path.insert(0, str(ROOT))
+sys.path.insert(0, str(Path(__file__).resolve().parent))
+
+from benchmark import DEFAULT_CORPUS, choose_model_dir, load_corpus  # noqa: E402
+from ja_segment import SegmentedText  # noqa: E402
+from model_runtime import PRECISIONS  # noqa: E402
+from translation_backends import ReplicaBackend  # noqa: E402
+from translation_engine import DECODING_PROFILES, DEFAULT_PROFILE, decoding_params  # noqa: E402
+from translation_replicas import available_cores, save_tuned_layout  # noqa: E402
+
+
+def candidate_layouts(cores: int, threads_options: list[int] | None) -> list[tuple[int, int]]:
+    """(複製数, 1複製のスレッド数) の候補。既定は 1, 2, 4, 8… スレッドでコアを埋める構成"""
+    if not threads_options:
+        threads_options = []
+        t = 1
+        while t < cores:
+            threads_options.append(t)
+            t *= 2
+        threads_options.append(cores)
+    return [(max(1, cores // t), t) for t in sorted(set(threads_options)) if t <= cores]
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="複製数とスレッド数の自動調整")
+    parser.add_argument("--model-dir", default=None,
+                        help="モデルのパス（省略時は models/facebook/m2m100_418M、なければ --tiny と同じ）")
+    parser.add_argument("--tiny", action="store_true", help="小さなランダム初期化モデルで試す（動作確認用）")
+    parser.add_argument("--corpus", default=str(DEFAULT_CORPUS), help="ページを ===== で区切った日本語テキスト")
+    parser.add_argument("--precision", choices=PRECISIONS, default="fp32")
+    parser.add_argument("--profile", choices=list(DECODING_PROFILES), default=DEFAULT_PROFILE)
+    parser.add_argument("--tgt", default="vi", choices=["vi", "en"])
+    parser.add_argument("--threads", nargs="+", type=int, default=None,
+                        help="試す「1複製のスレッド数」（省略時は 1, 2, 4, … とコア数）")
+    parser.add_argument("--repeat", type=int, default=2, help="コーパスを何周するか")
+    parser.add_argument("--no-save", action="store_true", help="結果を保存しない")
+    args = parser.parse_args()
+
+    corpus_pages = load_corpus(Path(args.corpus))
+    segments = [s for page in corpus_pages for s in SegmentedText(page).segments]
+    model_dir, model_kind = choose_model_dir(args, corpus_pages)
+    cores = len(available_cores())
+    decoding = decoding_params(args.profile)
+
+    print(f"モデル: {model_dir}（{model_kind}）/ {cores} コア / {len(segments)} 文 × {args.repeat} 周")
+    print(f"{'replicas':>9}{'threads':>8}{'seg/s':>9}{'起動秒':>8}")
+
+    results: list[dict] = []
+    for replicas, threads in candidate_layouts(cores, args.threads):
+        started = time.perf_counter()
+        backend = ReplicaBackend.load(model_dir, args.precision, replicas=replicas, threads=threads)
+        startup = time.perf_counter() - started
+        try:
+            backend.translate_lines(segments[:replicas * 4], args.tgt, **decoding)  # ウォームアップ
+            started = time.perf_counter()
+            for _ in range(args.repeat):
+                backend.translate_lines(segments, args.tgt, **decoding)
+            elapsed = time.perf_counter() - started
+        finally:
+            backend.close()
+        result = {
+            "replicas": replicas,
+            "threads": threads,
+            "segments_per_sec": round(len(segments) * args.repeat / elapsed, 2),
+            "startup_seconds": round(startup, 2),
+        }
+        results.append(result)
+        print(f"{replicas:>9}{threads:>8}{result['segments_per_sec']:>9.1f}{startup:>8.1f}")
+
+    best = max(results, key=lambda r: r["segments_per_sec"])
+    print(f"最速: 複製 {best['replicas']} × {best['threads']} スレッド（{best['segments_per_sec']:.1f} 文/秒）")
+    if not args.no_save:
+        save_tuned_layout(model_dir, args.precision, best["replicas"], best["threads"], results)
+        print("保存しました。TRANSLATOR_BACKEND=replicas で使われます。")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,389 @@
+# ==========================================================
+# 推論バックエンド（翻訳処理の差し替え口）
+#   torch : transformers + PyTorch（既定）
+#   onnx  : ONNX Runtime（エンコーダ／デコーダ（past key/values 付き）を ONNX に変換して実行）
+#   remote: 翻訳サーバー（translation_server.py）に依頼する（モデルは読み込まない）
+# 環境変数 TRANSLATOR_BACKEND で選択する（TRANSLATOR_SERVER_URL があれば remote）
+# ==========================================================
+
+import os
+import sys
+import time
+from concurrent.futures import Future, ThreadPoolExecutor
+from pathlib import Path
+
+from model_runtime import QUANTIZED_DIR_NAME, load_model, load_tokenizer, resolve_precision
+from translation_cache import model_fingerprint
+from translation_engine import (
+    BATCH_SIZE, MAX_LENGTH, NUM_BEAMS, TranslationCancelled, cache_params, translate_lines,
+    translate_lines_multi,
+)
+from vocab_pruning import resolve_vocab
+
+DEFAULT_BACKEND = "torch"
+
+
+class TranslationBackend:
+    """tokenizer / model / device をまとめ、translate_lines を提供する共通インターフェース"""
+
+    name = "base"
+    remote = False  # True ならモデルはこのプロセスにない（翻訳メモリもサーバー側で持つ）
+    vocab = "full"  # 出力語彙（"pruned" なら vocab_pruning で絞り込んだモデル）
+
+    def __init__(self, tokenizer, model, device, precision: str,
+                 model_dir: str | os.PathLike | None = None) -> None:
+        self.tokenizer = tokenizer
+        self.model = model
+        self.device = device
+        self.precision = precision
+        self.model_dir = model_dir
+        self.load_seconds = 0.0  # 読み込みにかかった時間（秒）
+
+    @property
+    def cache_variant(self) -> str:
+        """翻訳メモリのキーに含める識別子（バックエンド・精度・語彙の絞り込みで訳が変わりうるため）"""
+        return self.precision if self.vocab == "full" else f"{self.precision}-{self.vocab}"
+
+    @property
+    def fingerprint(self) -> str:
+        """モデルの指紋（再開用チェックポイントに記録する）"""
+        return model_fingerprint(self.model_dir) if self.model_dir is not None else ""
+
+    def translate_lines(self, lines: list[str], tgt_lang_code: str, **kwargs) -> list[str]:
+        return translate_lines(self.tokenizer, self.model, self.device, lines, tgt_lang_code, **kwargs)
+
+    def translate_lines_multi(self, lines: list[str], tgt_lang_codes: list[str],
+                              **kwargs) -> dict[str, list[str]]:
+        """複数の翻訳先へまとめて訳す（エンコーダの計算は1回）"""
+        return translate_lines_multi(
+            self.tokenizer, self.model, self.device, lines, tgt_lang_codes, **kwargs
+        )
+
+    def close(self) -> None:
+        """ワーカープロセスなどを持つバックエンドの後始末（既定では何もしない）"""
+
+
+class TorchBackend(TranslationBackend):
+    name = "torch"
+
+    @classmethod
+    def load(cls, model_dir: str | os.PathLike, precision: str | None = None,
+             vocab: str | None = None) -> "TorchBackend":
+        precision = resolve_precision(precision)
+        vocab = resolve_vocab(vocab)
+        tokenizer, model, device = load_model(model_dir, precision, vocab)
+        backend = cls(tokenizer, model, device, precision, model_dir)
+        backend.vocab = vocab
+        return backend
+
+
+class OnnxBackend(TranslationBackend):
+    """
+    optimum の ORTModelForSeq2SeqLM を使う。
+    generate は transformers と同じ実装（ビーム探索／貪欲法）なので、同じ設定なら同じ手順で訳が出る。
+    初回のみ ONNX へ変換し、<モデル>/optimized/onnx（int8 なら onnx-int8）に保存して再利用する。
+    """
+
+    name = "onnx"
+
+    @property
+    def cache_variant(self) -> str:
+        return f"onnx-{self.precision}"
+
+    @staticmethod
+    def onnx_dir(model_dir: str | os.PathLike, precision: str) -> Path:
+        suffix = "onnx-int8" if precision == "int8" else "onnx"
+        return Path(model_dir) / QUANTIZED_DIR_NAME / suffix
+
+    @classmethod
+    def load(cls, model_dir: str | os.PathLike, precision: str | None = None,
+             vocab: str | None = None) -> "OnnxBackend":
+        try:
+            import onnxruntime as ort
+            from optimum.onnxruntime import ORTModelForSeq2SeqLM
+        except ImportError as e:
+            raise RuntimeError(
+                "ONNX バックエンドには optimum[onnxruntime] が必要です: pip install \"optimum[onnxruntime]\""
+            ) from e
+        import torch
+
+        os.environ["HF_HUB_OFFLINE"] = "1"
+        os.environ["TRANSFORMERS_OFFLINE"] = "1"
+
+        if not Path(model_dir).exists():
+            raise FileNotFoundError(f"モデルディレクトリが見つかりません: {model_dir}")
+
+        # 語彙の絞り込みは PyTorch のモデルを書き換えるため、ONNX では常に全語彙
+        if resolve_vocab(vocab) != "full":
+            print("onnx バックエンドは語彙の絞り込みに対応していないため、全語彙で訳します。", file=sys.stderr)
+
+        # ONNX Runtime は fp32 / int8 のみ扱う（bf16 指定時は fp32）
+        precision = "int8" if (precision or os.environ.get("TRANSLATOR_PRECISION")) == "int8" else "fp32"
+        onnx_dir = cls.onnx_dir(model_dir, precision)
+        if not any(onnx_dir.glob("*.onnx")):
+            cls.export(model_dir, precision)
+
+        session_options = ort.SessionOptions()
+        session_options.graph_optimization_level = ort.GraphOptimizationLevel.ORT_ENABLE_ALL
+
+        tokenizer = load_tokenizer(model_dir)
+        model = ORTModelForSeq2SeqLM.from_pretrained(
+            onnx_dir,
+            use_cache=True,
+            session_options=session_options,
+            provider="CPUExecutionProvider",
+        )
+        return cls(tokenizer, model, torch.device("cpu"), precision, model_dir)
+
+    @classmethod
+    def export(cls, model_dir: str | os.PathLike, precision: str) -> Path:
+        """エンコーダ・デコーダ（past key/values 付き）を ONNX に書き出す。int8 なら動的量子化も行う"""
+        from optimum.onnxruntime import ORTModelForSeq2SeqLM
+
+        print("ONNX モデルへの変換を行います（初回のみ・数分かかります）…", file=sys.stderr)
+        fp32_dir = cls.onnx_dir(model_dir, "fp32")
+        if not any(fp32_dir.glob("*.onnx")):
+            model = ORTModelForSeq2SeqLM.from_pretrained(model_dir, export=True, use_cache=True)
+            model.save_pretrained(fp32_dir)
+        if precision != "int8":
+            return fp32_dir
+
+        from optimum.onnxruntime import ORTQuantizer
+        from optimum.onnxruntime.configuration import AutoQuantizationConfig
+
+        int8_dir = cls.onnx_dir(model_dir, "int8")
+        qconfig = AutoQuantizationConfig.avx2(is_static=False, per_channel=False)
+        for onnx_file in sorted(fp32_dir.glob("*.onnx")):
+            quantizer = ORTQuantizer.from_pretrained(fp32_dir, file_name=onnx_file.name)
+            quantizer.quantize(save_dir=int8_dir, quantization_config=qconfig)
+        # 量子化後のファイル名（*_quantized.onnx）を ORTModel が読める元の名前に戻す
+        for quantized in int8_dir.glob("*_quantized.onnx"):
+            quantized.replace(quantized.with_name(quantized.name.replace("_quantized", "")))
+        for extra in fp32_dir.glob("*.json"):
+            target = int8_dir / extra.name
+            if not target.exists():
+                target.write_bytes(extra.read_bytes())
+        return int8_dir
+
+
+class RemoteBackend(TranslationBackend):
+    """
+    翻訳サーバー（translation_server.py）に翻訳を依頼する薄いクライアント。
+    batch_size 行ずつ送るので、その単位で進捗を通知し、キャンセルも受け付ける。
+    翻訳メモリ・バッチ化はサーバー側で行うため、cache / max_batch_tokens は使わない。
+    """
+
+    name = "remote"
+    remote = True
+
+    def __init__(self, url: str, info: dict) -> None:
+        super().__init__(None, None, None, info.get("precision", ""))
+        self.url = url
+        self.info = info  # サーバーの /health の応答
+
+    @property
+    def cache_variant(self) -> str:
+        return self.info.get("cache_variant", "")
+
+    @property
+    def fingerprint(self) -> str:
+        return self.info.get("model", "")
+
+    @classmethod
+    def load(cls, model_dir: str | os.PathLike | None = None,
+             precision: str | None = None, vocab: str | None = None) -> "RemoteBackend":
+        # 精度・語彙はサーバー側の設定に従う
+        url = os.environ.get("TRANSLATOR_SERVER_URL")
+        if not url:
+            raise RuntimeError("環境変数 TRANSLATOR_SERVER_URL に翻訳サーバーの URL を設定してください。")
+        return cls.connect(url)
+
+    @classmethod
+    def connect(cls, url: str) -> "RemoteBackend":
+        from translation_server import server_request
+
+        try:
+            info = server_request(url, "GET", "/health", timeout=10)
+        except OSError as e:
+            raise RuntimeError(f"翻訳サーバーに接続できません（{url}）: {e}") from e
+        return cls(url, info)
+
+    def status(self) -> dict:
+        """サーバーの現在の処理状況（/health）"""
+        from translation_server import server_request
+
+        self.info = server_request(self.url, "GET", "/health", timeout=10)
+        return self.info
+
+    def translate_lines(self, lines: list[str], tgt_lang_code: str, *,
+                        batch_size: int = BATCH_SIZE,
+                        num_beams: int = NUM_BEAMS,
+                        max_length: int = MAX_LENGTH,
+                        max_new_tokens: int | None = None,
+                        progress_callback=None,
+                        cancel_event=None,
+                        cache=None,
+                        max_batch_tokens: int | None = None,
+                        **decoding) -> list[str]:
+        """decoding は length_penalty / early_stopping / length_ratio / greedy_max_tokens"""
+        from translation_server import server_request
+
+        results: list[str] = []
+        for start in range(0, len(lines), batch_size):
+            if cancel_event is not None and cancel_event.is_set():
+                raise TranslationCancelled()
+            chunk = list(lines[start:start + batch_size])
+            reply = server_request(self.url, "POST", "/translate", {
+                "lines": chunk,
+                "tgt_lang": tgt_lang_code,
+                "num_beams": num_beams,
+                "max_length": max_length,
+                "max_new_tokens": max_new_tokens,
+                **decoding,
+            })
+            results.extend(reply["translations"])
+            if progress_callback is not None:
+                progress_callback(len(chunk))
+        return results
+
+    def translate_lines_multi(self, lines: list[str], tgt_lang_codes: list[str],
+                              **kwargs) -> dict[str, list[str]]:
+        # サーバー側では翻訳先ごとに処理する（エンコーダの共有はサーバー内のバッチ化に任せる）
+        return {tgt: self.translate_lines(lines, tgt, **kwargs) for tgt in dict.fromkeys(tgt_lang_codes)}
+
+
+class ReplicaBackend(TranslationBackend):
+    """
+    CPU のデータ並列（translation_replicas.ReplicaPool）。モデルの複製をコアごとに分けたワーカーで動かす。
+    訳は torch と同じなので、翻訳メモリは torch と共有する（キャッシュの確認・保存はこのプロセスで行う）。
+    複製数は環境変数 TRANSLATOR_REPLICAS（"auto" または数）、1複製のスレッド数は TRANSLATOR_REPLICA_THREADS。
+    """
+
+    name = "replicas"
+
+    def __init__(self, tokenizer, model, device, precision: str,
+                 model_dir: str | os.PathLike, pool) -> None:
+        super().__init__(tokenizer, model, device, precision, model_dir)
+        self.pool = pool
+
+    @classmethod
+    def load(cls, model_dir: str | os.PathLike, precision: str | None = None,
+             replicas: int | str | None = None, threads: int | None = None,
+             vocab: str | None = None) -> "ReplicaBackend":
+        import torch
+
+        from translation_replicas import ReplicaPool, auto_layout, plan_layout
+
+        precision = resolve_precision(precision)
+        vocab = resolve_vocab(vocab)
+        if precision == "fp16":
+            raise RuntimeError("replicas は CPU 専用です（GPU では torch バックエンドを使ってください）。")
+        if replicas is None:
+            replicas = os.environ.get("TRANSLATOR_REPLICAS", "auto")
+        if threads is None and os.environ.get("TRANSLATOR_REPLICA_THREADS"):
+            threads = int(os.environ["TRANSLATOR_REPLICA_THREADS"])
+        if replicas == "auto":
+            replicas, tuned_threads = auto_layout(model_dir, precision)
+            threads = threads or tuned_threads
+
+        # fp32 / bf16 はこのプロセスで読み込んだ重みを共有メモリで渡す。int8 は各ワーカーで読み込む
+        if precision == "int8":
+            tokenizer, model = load_tokenizer(model_dir), None
+        else:
+            tokenizer, model, _ = load_model(model_dir, precision, vocab)
+        layout = plan_layout(int(replicas), threads)
+        if len(layout) < int(replicas):
+            print(f"コア数が足りないため、複製を {len(layout)} 個（{len(layout[0])} スレッドずつ）にしました。",
+                  file=sys.stderr)
+        pool = ReplicaPool(model_dir, precision, layout, tokenizer, model,
+                           vocab=vocab)
+        backend = cls(tokenizer, model, torch.device("cpu"), precision, model_dir, pool)
+        backend.vocab = vocab
+        return backend
+
+    def translate_lines(self, lines: list[str], tgt_lang_code: str, **kwargs) -> list[str]:
+        return self.translate_lines_multi(lines, [tgt_lang_code], **kwargs)[tgt_lang_code]
+
+    def translate_lines_multi(self, lines: list[str], tgt_lang_codes: list[str], *,
+                              cache=None, progress_callback=None, **kwargs) -> dict[str, list[str]]:
+        tgt_lang_codes = list(dict.fromkeys(tgt_lang_codes))
+        if cache is None:
+            return self.pool.translate_lines_multi(
+                lines, tgt_lang_codes, progress_callback=progress_callback, **kwargs
+            )
+
+        # 翻訳メモリにない行（いずれかの翻訳先で）だけをワーカーに送る
+        key_params = cache_params(**kwargs)
+        results = {tgt: [""] * len(lines) for tgt in tgt_lang_codes}
+        nonblank = [i for i, line in enumerate(lines) if line.strip()]
+        missing: set[int] = set()
+        for tgt in tgt_lang_codes:
+            hits = cache.get_many([lines[i] for i in nonblank], tgt, key_params)
+            for j, i in enumerate(nonblank):
+                if j in hits:
+                    results[tgt][i] = hits[j]
+                else:
+                    missing.add(i)
+        todo = sorted(missing)
+        if progress_callback is not None and len(lines) > len(todo):
+            progress_callback((len(lines) - len(todo)) * len(tgt_lang_codes))
+        if not todo:
+            return results
+
+        outputs = self.pool.translate_lines_multi(
+            [lines[i] for i in todo], tgt_lang_codes, progress_callback=progress_callback, **kwargs
+        )
+        for tgt in tgt_lang_codes:
+            for i, out in zip(todo, outputs[tgt]):
+                results[tgt][i] = out
+            cache.put_many([lines[i] for i in todo], outputs[tgt], tgt, key_params)
+        return results
+
+    def close(self) -> None:
+        self.pool.close()
+
+
+BACKENDS: dict[str, type[TranslationBackend]] = {
+    TorchBackend.name: TorchBackend,
+    OnnxBackend.name: OnnxBackend,
+    RemoteBackend.name: RemoteBackend,
+    ReplicaBackend.name: ReplicaBackend,
+}
+
+
+def load_backend(model_dir: str | os.PathLike, name: str | None = None,
+                 precision: str | None = None, **options) -> TranslationBackend:
+    """
+    起動時にバックエンドを選んで読み込む。
+    name 省略時は、環境変数 TRANSLATOR_SERVER_URL があれば翻訳サーバー（remote）、
+    なければ環境変数 TRANSLATOR_BACKEND（既定 torch）。
+    options はバックエンド固有の設定（replicas の replicas / threads）と語彙の絞り込み（vocab）。
+    """
+    if name is None:
+        if os.environ.get("TRANSLATOR_SERVER_URL"):
+            name = RemoteBackend.name
+        else:
+            name = os.environ.get("TRANSLATOR_BACKEND", DEFAULT_BACKEND)
+    name = name.lower()
+    if name not in BACKENDS:
+        raise ValueError(f"不明なバックエンドです: {name}（{', '.join(BACKENDS)} のいずれか）")
+    return BACKENDS[name].load(model_dir, precision, **options)
+
+
+# ----------------------------------------------------------
+# バックグラウンド読み込み
+# 画面を先に表示し、読み込み完了（Future の完了）で翻訳ボタンを有効にする
+# ----------------------------------------------------------
+_loader = ThreadPoolExecutor(max_workers=1, thread_name_prefix="model-loader")
+
+
+def load_backend_async(model_dir: str | os.PathLike, name: str | None = None,
+                       precision: str | None = None) -> "Future[TranslationBackend]":
+    """load_backend を別スレッドで実行し、その Future を返す"""
+    def load() -> TranslationBackend:
+        started = time.perf_counter()
+        backend = load_backend(model_dir, name, precision)
+        backend.load_seconds = time.perf_counter() - started
+        return backend
+
+    return _loader.submit(load)
@@ -0,0 +1,228 @@
+# ==========================================================
+# 翻訳メモリ（永続キャッシュ）
+# SQLite に「正規化した原文 + 翻訳先 + モデル指紋 + デコード設定」をキーとして保存
+# Streamlit 版・PyQt6 版の両方から共有する（別のモデルのフォルダとも同じファイルを共有できる）
+# ==========================================================
+
+import argparse
+import hashlib
+import json
+import os
+import re
+import sqlite3
+import threading
+import time
+import unicodedata
+from pathlib import Path
+
+# ----------------------------------------------------------
+# 既定設定
+# ----------------------------------------------------------
+DEFAULT_CACHE_PATH = Path(__file__).resolve().parent / ".cache" / "translation_memory.sqlite3"
+DEFAULT_MAX_ENTRIES = 200_000
+
+# モデル指紋の計算に使うファイル（重み・設定・トークナイザー）
+_FINGERPRINT_PATTERNS = (
+    "config.json", "generation_config.json",
+    "*.safetensors", "*.bin", "*.pt",
+    "sentencepiece*.model", "vocab.json", "tokenizer_config.json",
+)
+
+_WS_RE = re.compile(r"\s+")
+
+
+def normalize_segment(text: str) -> str:
+    """キャッシュキー用の正規化（NFKC・前後空白除去・連続空白の圧縮）"""
+    return _WS_RE.sub(" ", unicodedata.normalize("NFKC", text)).strip()
+
+
+def model_fingerprint(model_dir: str | os.PathLike) -> str:
+    """モデルディレクトリの指紋（ファイル名・サイズ・更新時刻から計算）"""
+    root = Path(model_dir)
+    h = hashlib.sha1()
+    files: set[Path] = set()
+    for pattern in _FINGERPRINT_PATTERNS:
+        files.update(p for p in root.glob(pattern) if p.is_file())
+    for p in sorted(files):
+        st = p.stat()
+        h.update(f"{p.name}\0{st.st_size}\0{st.st_mtime_ns}\n".encode("utf-8"))
+    return h.hexdigest()
+
+
+class TranslationCache:
+    """
+    サイズ上限付き LRU の翻訳キャッシュ。
+    各エントリにモデルのフォルダと指紋を記録し、開いた時点で同じフォルダの古い指紋のエントリだけを破棄する
+    （他のモデルのエントリは残す。上限を超えた分は全モデルを通して古い順に消す）。
+    """
+
+    def __init__(self, model_dir: str | os.PathLike,
+                 db_path: str | os.PathLike | None = None,
+                 max_entries: int = DEFAULT_MAX_ENTRIES,
+                 variant: str = "") -> None:
+        if db_path is None:
+            db_path = os.environ.get("TRANSLATOR_CACHE_PATH", DEFAULT_CACHE_PATH)
+        self.db_path = Path(db_path)
+        self.max_entries = max_entries
+        self.model = str(Path(model_dir).resolve())
+        self.fingerprint = model_fingerprint(model_dir)
+        # 同じ重みでも精度モード（fp32 / bf16 / int8）で訳が変わりうるため、キーに含める
+        self.variant = variant
+
+        self.hits = 0
+        self.misses = 0
+
+        self.db_path.parent.mkdir(parents=True, exist_ok=True)
+        # Streamlit の複数セッション・Qt のワーカースレッドから呼ばれるためロックで保護
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(str(self.db_path), check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS entries ("
+            " key TEXT PRIMARY KEY,"
+            " translation TEXT NOT NULL,"
+            " last_used REAL NOT NULL,"
+            " model TEXT,"
+            " fingerprint TEXT)"
+        )
+        # 以前の形式（モデルの列がない）のファイルには列を足す。既存のエントリは LRU で消えるのに任せる
+        columns = {row[1] for row in self._conn.execute("PRAGMA table_info(entries)")}
+        for column in ("model", "fingerprint"):
+            if column not in columns:
+                self._conn.execute(f"ALTER TABLE entries ADD COLUMN {column} TEXT")
+        self._conn.execute("CREATE INDEX IF NOT EXISTS idx_entries_last_used ON entries(last_used)")
+        self._conn.execute("CREATE INDEX IF NOT EXISTS idx_entries_model ON entries(model, fingerprint)")
+        self._conn.commit()
+
+        self.evict_stale()
+
+    # ----------------------------------------
+    # キー生成
+    # ----------------------------------------
+    def make_key(self, segment: str, tgt_lang_code: str, params: dict) -> str:
+        payload = "\0".join([
+            normalize_segment(segment),
+            tgt_lang_code,
+            self.fingerprint,
+            self.variant,
+            json.dumps(params, sort_keys=True),
+        ])
+        return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+    # ----------------------------------------
+    # 参照・登録
+    # ----------------------------------------
+    def get_many(self, segments: list[str], tgt_lang_code: str, params: dict) -> dict[int, str]:
+        """ヒットした segments のインデックス → 翻訳 を返す"""
+        if not segments:
+            return {}
+        keys = [self.make_key(s, tgt_lang_code, params) for s in segments]
+        found: dict[str, str] = {}
+        with self._lock:
+            unique = list(dict.fromkeys(keys))
+            # SQLite のパラメータ数上限を避けるため分割して問い合わせる
+            for start in range(0, len(unique), 500):
+                chunk = unique[start:start + 500]
+                placeholders = ",".join("?" * len(chunk))
+                rows = self._conn.execute(
+                    f"SELECT key, translation FROM entries WHERE key IN ({placeholders})", chunk
+                ).fetchall()
+                found.update(rows)
+            if found:
+                now = time.time()
+                self._conn.executemany(
+                    "UPDATE entries SET last_used = ? WHERE key = ?",
+                    [(now, k) for k in found],
+                )
+                self._conn.commit()
+
+        result = {i: found[k] for i, k in enumerate(keys) if k in found}
+        self.hits += len(result)
+        self.misses += len(segments) - len(result)
+        return result
+
+    def put_many(self, segments: list[str], translations: list[str],
+                 tgt_lang_code: str, params: dict) -> None:
+        if not segments:
+            return
+        now = time.time()
+        rows = [
+            (self.make_key(s, tgt_lang_code, params), t, now, self.model, self.fingerprint)
+            for s, t in zip(segments, translations)
+        ]
+        with self._lock:
+            self._conn.executemany(
+                "INSERT OR REPLACE INTO entries (key, translation, last_used, model, fingerprint)"
+                " VALUES (?, ?, ?, ?, ?)",
+                rows,
+            )
+            self._evict_locked()
+            self._conn.commit()
+
+    def _evict_locked(self) -> None:
+        """上限を超えた分を、最後に使われた時刻が古い順に削除（LRU）"""
+        count = self._conn.execute("SELECT COUNT(*) FROM entries").fetchone()[0]
+        excess = count - self.max_entries
+        if excess > 0:
+            self._conn.execute(
+                "DELETE FROM entries WHERE key IN ("
+                " SELECT key FROM entries ORDER BY last_used ASC LIMIT ?)",
+                (excess,),
+            )
+
+    # ----------------------------------------
+    # 管理
+    # ----------------------------------------
+    def evict_stale(self) -> int:
+        """このモデルのフォルダのエントリのうち、指紋が今と違う（モデルを差し替える前の）ものを破棄する"""
+        with self._lock:
+            deleted = self._conn.execute(
+                "DELETE FROM entries WHERE model = ? AND fingerprint != ?",
+                (self.model, self.fingerprint),
+            ).rowcount
+            self._conn.commit()
+        return deleted
+
+    def invalidate(self, all_models: bool = False) -> None:
+        """このモデルのフォルダのエントリを破棄する（all_models なら全エントリ）"""
+        with self._lock:
+            if all_models:
+                self._conn.execute("DELETE FROM entries")
+            else:
+                self._conn.execute("DELETE FROM entries WHERE model = ?", (self.model,))
+            self._conn.commit()
+
+    def stats(self) -> dict:
+        with self._lock:
+            entries = self._conn.execute("SELECT COUNT(*) FROM entries").fetchone()[0]
+        return {
+            "entries": entries,
+            "max_entries": self.max_entries,
+            "hits": self.hits,
+            "misses": self.misses,
+        }
+
+    def close(self) -> None:
+        with self._lock:
+            self._conn.close()
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="翻訳メモリ（キャッシュ）の管理")
+    parser.add_argument("model_dir", help="モデルディレクトリ（指紋の計算に使用）")
+    parser.add_argument("--db", default=None, help="キャッシュファイルのパス")
+    parser.add_argument("--clear", action="store_true", help="このモデルのキャッシュを削除する")
+    parser.add_argument("--all", action="store_true", help="--clear で全モデルのキャッシュを削除する")
+    args = parser.parse_args()
+
+    cache = TranslationCache(args.model_dir, db_path=args.db)
+    if args.clear:
+        cache.invalidate(all_models=args.all)
+        print("キャッシュを削除しました。")
+    print(json.dumps(cache.stats(), ensure_ascii=False, indent=2))
+    cache.close()
+
+
+if __name__ == "__main__":
+    main()
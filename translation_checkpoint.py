@@ -0,0 +1,104 @@
+# ==========================================================
+# 全ページ翻訳の逐次書き出しと再開（チェックポイント）
+# 翻訳済みページを1ページずつ出力ファイルに追記し、
+# 「<出力ファイル>.progress.json」に完了ページ数・原本のハッシュ・デコード設定を記録する
+# ==========================================================
+
+import hashlib
+import json
+import os
+from pathlib import Path
+
+CHECKPOINT_SUFFIX = ".progress.json"
+
+
+def file_sha256(path: str | os.PathLike) -> str:
+    h = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(1024 * 1024), b""):
+            h.update(block)
+    return h.hexdigest()
+
+
+def checkpoint_path(output_path: str | os.PathLike) -> Path:
+    output_path = Path(output_path)
+    return output_path.with_name(output_path.name + CHECKPOINT_SUFFIX)
+
+
+class ResumableOutput:
+    """
+    ページ順に追記していく出力ファイル。
+    同じ原本・同じ設定で開き直すと、最初の未完了ページから再開できる。
+    """
+
+    def __init__(self, output_path: str | os.PathLike, source_path: str | os.PathLike,
+                 settings: dict, total_pages: int) -> None:
+        self.output_path = Path(output_path)
+        self.checkpoint_path = checkpoint_path(self.output_path)
+        self.state = {
+            "source_sha256": file_sha256(source_path),
+            "settings": settings,
+            "total_pages": total_pages,
+            "completed_pages": 0,
+            "bytes_written": 0,
+        }
+
+        previous = self._read_checkpoint()
+        if (previous is not None
+                and all(previous.get(k) == self.state[k]
+                        for k in ("source_sha256", "settings", "total_pages"))
+                and self.output_path.exists()
+                and self.output_path.stat().st_size >= previous.get("bytes_written", 0)):
+            self.state["completed_pages"] = previous["completed_pages"]
+            self.state["bytes_written"] = previous["bytes_written"]
+
+        self.output_path.parent.mkdir(parents=True, exist_ok=True)
+        # 書きかけのページがあれば最後の完了ページの位置で切り詰める
+        mode = "r+b" if self.output_path.exists() and self.state["bytes_written"] else "wb"
+        self._file = open(self.output_path, mode)
+        self._file.seek(self.state["bytes_written"])
+        self._file.truncate()
+        self._write_checkpoint()
+
+    @property
+    def start_page(self) -> int:
+        """次に翻訳すべきページ（0始まり）"""
+        return self.state["completed_pages"]
+
+    @property
+    def resumed(self) -> bool:
+        return self.state["completed_pages"] > 0
+
+    def append_page(self, text: str) -> None:
+        """1ページ分を追記し、ディスクに反映してからチェックポイントを進める"""
+        data = text.encode("utf-8")
+        self._file.write(data)
+        self._file.flush()
+        os.fsync(self._file.fileno())
+        self.state["completed_pages"] += 1
+        self.state["bytes_written"] += len(data)
+        self._write_checkpoint()
+
+    def finish(self) -> None:
+        """全ページ完了：チェックポイントを削除する"""
+        self._file.close()
+        self.checkpoint_path.unlink(missing_ok=True)
+
+    def close(self) -> None:
+        """中断：チェックポイントを残して閉じる（次回ここから再開）"""
+        if not self._file.closed:
+            self._file.close()
+
+    # ----------------------------------------
+    # チェックポイントの読み書き
+    # ----------------------------------------
+    def _read_checkpoint(self) -> dict | None:
+        try:
+            return json.loads(self.checkpoint_path.read_text(encoding="utf-8"))
+        except (OSError, ValueError):
+            return None
+
+    def _write_checkpoint(self) -> None:
+        tmp = self.checkpoint_path.with_name(self.checkpoint_path.name + ".tmp")
+        tmp.write_text(json.dumps(self.state, ensure_ascii=False, indent=2), encoding="utf-8")
+        os.replace(tmp, self.checkpoint_path)
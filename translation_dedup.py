@@ -0,0 +1,59 @@
+# ==========================================================
+# 文書内の重複除去（全ページ翻訳用）
+# 設計図・仕様書ではヘッダー・フッター・表題欄・表の見出しが毎ページ繰り返される。
+# 1つの文書の中で一度訳した文は覚えておき、2回目以降はモデル（と翻訳メモリ）に渡さない
+# ==========================================================
+
+from collections.abc import Callable
+
+# translate(lines, tgt_lang_codes, progress_callback=..., cancel_event=...) -> {言語コード: 訳文のリスト}
+TranslateMultiFn = Callable[..., dict[str, list[str]]]
+
+
+class DocumentDedup:
+    """
+    translate を包み、同じ文書の中で同じ文を2回訳さないようにする。
+    ページをまたいだ重複だけでなく、1回の呼び出しの中の重複もまとめる。
+    segments は訳した文の延べ数、translated は実際に translate に渡した文の数。
+    """
+
+    def __init__(self, translate: TranslateMultiFn) -> None:
+        self.translate = translate
+        self._memo: dict[str, dict[str, str]] = {}  # 原文 → {言語コード: 訳文}
+        self.segments = 0
+        self.translated = 0
+
+    @property
+    def saved(self) -> int:
+        """重複としてまとめた（翻訳を省いた）文の数"""
+        return self.segments - self.translated
+
+    def __call__(self, lines: list[str], tgt_lang_codes: list[str],
+                 progress_callback: Callable[[int], None] | None = None,
+                 **kwargs) -> dict[str, list[str]]:
+        """progress_callback には translate と同じく「行 × 翻訳先」の増分が渡される"""
+        langs = list(dict.fromkeys(tgt_lang_codes))
+        nonblank = [line for line in lines if line.strip()]
+        missing = list(dict.fromkeys(
+            line for line in nonblank
+            if not all(lang in self._memo.get(line, ()) for lang in langs)
+        ))
+
+        self.segments += len(nonblank)
+        self.translated += len(missing)
+        if progress_callback is not None and len(lines) > len(missing):
+            progress_callback((len(lines) - len(missing)) * len(langs))
+
+        if missing:
+            if progress_callback is not None:
+                kwargs["progress_callback"] = progress_callback
+            outputs = self.translate(missing, langs, **kwargs)
+            for i, line in enumerate(missing):
+                memo = self._memo.setdefault(line, {})
+                for lang in langs:
+                    memo[lang] = outputs[lang][i]
+
+        return {
+            lang: [self._memo[line][lang] if line.strip() else "" for line in lines]
+            for lang in langs
+        }
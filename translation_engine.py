@@ -0,0 +1,363 @@
+# ==========================================================
+# 翻訳エンジン（M2M100 バッチ翻訳）
+# PyQt6 / Streamlit のどちらからも使えるよう、GUI には依存しない
+# torch / transformers は翻訳の実行時に import する（アプリの起動を速くするため）
+# ==========================================================
+
+import threading
+from collections.abc import Callable, Sequence
+from typing import TYPE_CHECKING
+
+import perf_trace
+from translation_pipeline import StagePipeline, pipeline_enabled
+from vocab_pruning import model_token_id, restore_token_ids
+
+if TYPE_CHECKING:
+    from translation_cache import TranslationCache
+
+# ----------------------------------------------------------
+# バッチ設定（既定値）
+# ----------------------------------------------------------
+BATCH_SIZE = 16            # 1回の generate に入れる最大行数
+MAX_BATCH_TOKENS = 2048    # 1バッチの「最長行トークン数 × 行数」の上限
+MAX_LENGTH = 512
+NUM_BEAMS = 4
+
+# ----------------------------------------------------------
+# デコード設定のプロファイル
+# length_ratio: 出力長の上限を「入力トークン数 × length_ratio + LENGTH_MARGIN」にする
+#               （max_length / max_new_tokens はその上からの頭打ち）
+# greedy_max_tokens: 入力がこのトークン数以下の短い行（表のセル・見出しなど）は
+#                    ビーム探索をせず貪欲法で訳す
+# ----------------------------------------------------------
+LENGTH_MARGIN = 10
+DECODING_PROFILES = {
+    "fast": {"num_beams": 1, "length_ratio": 2.0},
+    "balanced": {"num_beams": 2, "early_stopping": True, "length_ratio": 2.5,
+                 "greedy_max_tokens": 8},
+    "quality": {"num_beams": 4, "early_stopping": True, "length_penalty": 1.2,
+                "length_ratio": 3.0, "greedy_max_tokens": 4},
+}
+PROFILE_LABELS = {
+    "fast": "速度優先（下書き）",
+    "balanced": "標準",
+    "quality": "品質優先",
+}
+DEFAULT_PROFILE = "quality"
+
+
+class TranslationCancelled(RuntimeError):
+    """ユーザー操作による翻訳の中断"""
+
+    def __init__(self, message: str = "ユーザーがキャンセルしました。") -> None:
+        super().__init__(message)
+
+
+def _cancel_stopping_criteria(cancel_event: threading.Event):
+    """cancel_event がセットされたら generate をステップ単位で打ち切る StoppingCriteria を作る"""
+    import torch
+    from transformers import StoppingCriteria, StoppingCriteriaList
+
+    class CancelCriteria(StoppingCriteria):
+        def __call__(self, input_ids, scores, **kwargs):
+            return torch.full(
+                (input_ids.shape[0],), cancel_event.is_set(),
+                dtype=torch.bool, device=input_ids.device,
+            )
+
+    return StoppingCriteriaList([CancelCriteria()])
+
+
+def _length_cap_processor(caps: Sequence[int], num_beams: int, eos_token_id: int):
+    """
+    行ごとの出力長の上限（新しく生成するトークン数）の最後の位置で EOS を強制する LogitsProcessor を作る。
+    上限をバッチ内の最長の行に合わせると、同じ行でも一緒に訳す行によって訳が変わってしまうため
+    """
+    import torch
+    from transformers import LogitsProcessor, LogitsProcessorList
+
+    limits = torch.tensor(list(caps)).repeat_interleave(num_beams)  # generate はビームを行ごとに並べる
+
+    class LengthCapProcessor(LogitsProcessor):
+        def __call__(self, input_ids, scores):
+            # input_ids の先頭はデコーダ開始トークンなので、次に出すのは input_ids.shape[1] 個目の新しいトークン
+            last = limits.to(scores.device) <= input_ids.shape[1]
+            if last.any():
+                scores = scores.clone()
+                scores[last] = -float("inf")
+                scores[last, eos_token_id] = 0.0  # ForcedEOSTokenLogitsProcessor と同じ
+            return scores
+
+    return LogitsProcessorList([LengthCapProcessor()])
+
+
+def plan_batches(lengths: Sequence[int], batch_size: int, max_batch_tokens: int,
+                 num_beams: int, greedy_max_tokens: int = 0) -> list[tuple[list[int], int]]:
+    """
+    (行インデックスのバッチ, そのバッチのビーム数) のリストを作る。
+    短い行は貪欲法、それ以外は num_beams でビーム探索（それぞれ別のバッチにする）。
+    """
+    short = (
+        {j for j, n in enumerate(lengths) if n <= greedy_max_tokens}
+        if num_beams > 1 else set()
+    )
+    plan: list[tuple[list[int], int]] = []
+    for members, beams in (
+        (sorted(short), 1),
+        ([j for j in range(len(lengths)) if j not in short], num_beams),
+    ):
+        for batch in _make_batches([lengths[j] for j in members], batch_size, max_batch_tokens):
+            plan.append(([members[k] for k in batch], beams))
+    return plan
+
+
+def decoding_params(profile: str) -> dict:
+    """プロファイル名から translate_lines に渡すデコード設定を作る"""
+    if profile not in DECODING_PROFILES:
+        raise ValueError(
+            f"不明なプロファイルです: {profile}（{', '.join(DECODING_PROFILES)} のいずれか）"
+        )
+    return dict(DECODING_PROFILES[profile])
+
+
+def _make_batches(lengths: Sequence[int], batch_size: int,
+                  max_batch_tokens: int) -> list[list[int]]:
+    """トークン長でソートした行インデックスを、パディング込みのトークン予算内でまとめる"""
+    order = sorted(range(len(lengths)), key=lambda i: lengths[i])
+
+    batches: list[list[int]] = []
+    current: list[int] = []
+    current_max = 0
+    for idx in order:
+        length = max(lengths[idx], 1)
+        new_max = max(current_max, length)
+        if current and (len(current) >= batch_size
+                        or new_max * (len(current) + 1) > max_batch_tokens):
+            batches.append(current)
+            current = []
+            new_max = length
+        current.append(idx)
+        current_max = new_max
+    if current:
+        batches.append(current)
+    return batches
+
+
+def cache_params(*, num_beams: int = NUM_BEAMS, max_length: int = MAX_LENGTH,
+                 max_new_tokens: int | None = None, length_penalty: float = 1.0,
+                 early_stopping: bool = False, length_ratio: float | None = None,
+                 greedy_max_tokens: int = 0, **_other) -> dict:
+    """翻訳メモリのキーに含めるデコード設定（translate_lines と同じ引数を受け取り、関係ないものは無視）"""
+    params = {"num_beams": num_beams, "max_length": max_length}
+    if max_new_tokens is not None:
+        params["max_new_tokens"] = max_new_tokens
+    # 既定値のままの設定はキーに含めない（以前のキャッシュをそのまま使えるように）
+    if num_beams > 1 and length_penalty != 1.0:
+        params["length_penalty"] = length_penalty
+    if num_beams > 1 and early_stopping:
+        params["early_stopping"] = True
+    if length_ratio is not None:
+        params["length_ratio"] = length_ratio
+    if num_beams > 1 and greedy_max_tokens > 0:
+        params["greedy_max_tokens"] = greedy_max_tokens
+    return params
+
+
+def translate_lines(tokenizer, model, device, lines: Sequence[str], tgt_lang_code: str,
+                    **kwargs) -> list[str]:
+    """
+    行のリストを翻訳し、同じ順序・同じ行数で返す。
+    空行は空文字のまま残す。
+    非空行はトークン長で並べ替えてバッチ化し、パディングの無駄を減らす。
+    progress_callback には「処理済み行数の増分」が渡される（例外を投げれば中断）。
+    cache が渡された場合、翻訳メモリにある行はモデルを通さない。
+    cancel_event がセットされると generate の途中でも打ち切り、TranslationCancelled を送出する。
+    max_new_tokens を指定した場合は、出力長の上限を max_length ではなくこちらで決める。
+    length_ratio を指定した場合は、行ごとに入力長に比例した出力長で打ち切る
+    （上の上限を超えることはない。一緒にバッチにした行には左右されない）。greedy_max_tokens 以下の短い行は num_beams=1 で訳す。
+    """
+    return translate_lines_multi(
+        tokenizer, model, device, lines, [tgt_lang_code], **kwargs
+    )[tgt_lang_code]
+
+
+def translate_lines_multi(tokenizer, model, device, lines: Sequence[str],
+                          tgt_lang_codes: Sequence[str],
+                          *,
+                          batch_size: int = BATCH_SIZE,
+                          max_batch_tokens: int = MAX_BATCH_TOKENS,
+                          num_beams: int = NUM_BEAMS,
+                          max_length: int = MAX_LENGTH,
+                          max_new_tokens: int | None = None,
+                          length_penalty: float = 1.0,
+                          early_stopping: bool = False,
+                          length_ratio: float | None = None,
+                          greedy_max_tokens: int = 0,
+                          progress_callback: Callable[[int], None] | None = None,
+                          cache: "TranslationCache | None" = None,
+                          cancel_event: threading.Event | None = None) -> dict[str, list[str]]:
+    """
+    複数の翻訳先へまとめて訳し、{言語コード: 訳文のリスト} を返す（設定は translate_lines と同じ）。
+    トークン化とエンコーダの計算は1行につき1回だけで、エンコーダ出力を使い回して
+    翻訳先ごとに forced_bos_token_id を変えてデコードする。
+    progress_callback には「処理済みの 行 × 翻訳先 の数」の増分が渡される。
+    """
+    tgt_lang_codes = list(dict.fromkeys(tgt_lang_codes))
+    results = {tgt: [""] * len(lines) for tgt in tgt_lang_codes}
+
+    nonblank = [i for i, line in enumerate(lines) if line.strip()]
+    done_count = (len(lines) - len(nonblank)) * len(tgt_lang_codes)
+
+    key_params = cache_params(
+        num_beams=num_beams, max_length=max_length, max_new_tokens=max_new_tokens,
+        length_penalty=length_penalty, early_stopping=early_stopping,
+        length_ratio=length_ratio, greedy_max_tokens=greedy_max_tokens,
+    )
+    length_kwargs = (
+        {"max_new_tokens": max_new_tokens} if max_new_tokens is not None else {"max_length": max_length}
+    )
+
+    # 翻訳先ごとに、翻訳メモリになくモデルを通す行（lines のインデックス）
+    pending: dict[str, set[int]] = {}
+    for tgt in tgt_lang_codes:
+        pending[tgt] = set(nonblank)
+        if cache is not None and nonblank:
+            hits = cache.get_many([lines[i] for i in nonblank], tgt, key_params)
+            for j, translation in hits.items():
+                results[tgt][nonblank[j]] = translation
+                pending[tgt].discard(nonblank[j])
+            done_count += len(hits)
+
+    if progress_callback is not None and done_count:
+        progress_callback(done_count)
+    targets = sorted(set().union(*pending.values()))
+    if not targets:
+        return results
+
+    # 同じ文が何度も出てくる場合（表の見出しなど）はモデルに1回だけ渡し、訳を全ての位置に配る
+    occurrences: dict[str, list[int]] = {}
+    for i in targets:
+        occurrences.setdefault(lines[i], []).append(i)
+    texts = list(occurrences)
+    with perf_trace.stage("tokenize", lines=len(texts)):
+        lengths = [
+            len(ids) for ids in tokenizer(texts, truncation=True, max_length=max_length)["input_ids"]
+        ]
+    import torch
+
+    stopping_criteria = (
+        _cancel_stopping_criteria(cancel_event) if cancel_event is not None else None
+    )
+    # 翻訳先が1つなら generate にエンコードも任せる（従来と同じ経路）
+    share_encoder = len(tgt_lang_codes) > 1
+    plan = plan_batches(lengths, batch_size, max_batch_tokens, num_beams, greedy_max_tokens)
+    # トークナイザーは前段（トークン化）と後段（デコード）のスレッドで共有するため、同時には使わない
+    tokenizer_lock = threading.Lock()
+
+    def tokenize(item: tuple[list[int], int]) -> dict:
+        batch, _ = item
+        with tokenizer_lock, perf_trace.stage("tokenize", lines=len(batch)):
+            encoded = tokenizer(
+                [texts[j] for j in batch],
+                return_tensors="pt",
+                padding=True,
+                truncation=True,
+                max_length=max_length,
+            )
+        return {k: v.to(device) for k, v in encoded.items()}
+
+    def detokenize(generated) -> list[str]:
+        with tokenizer_lock, perf_trace.stage("decode", lines=len(generated)):
+            return tokenizer.batch_decode(generated, skip_special_tokens=True)
+
+    def deliver(finished: list[tuple]) -> None:
+        """デコードの済んだバッチの訳を配り、翻訳メモリに保存して進捗を通知する（呼び出し元のスレッドで）"""
+        for (tgt, row_texts), decoded in finished:
+            done = 0
+            for text, out in zip(row_texts, decoded):
+                for i in occurrences[text]:
+                    results[tgt][i] = out
+                done += len(occurrences[text])
+            if cache is not None:
+                cache.put_many(row_texts, decoded, tgt, key_params)
+            if progress_callback is not None:
+                progress_callback(done)
+
+    # トークン化は先読み、デコードは後追いで、generate と重ねて動かす（translation_pipeline.py）
+    threaded = pipeline_enabled() and len(plan) * len(tgt_lang_codes) > 1
+    with StagePipeline(tokenize, detokenize, threaded=threaded) as pipeline:
+        for (batch, beams), encoded in pipeline.batches(plan):
+            if cancel_event is not None and cancel_event.is_set():
+                raise TranslationCancelled()
+
+            encoder_hidden = None
+            if share_encoder:
+                with perf_trace.stage("encode", batch=len(batch)):
+                    with torch.no_grad():
+                        encoder_hidden = model.get_encoder()(**encoded).last_hidden_state
+
+            generate_kwargs = dict(length_kwargs)
+            row_caps = None
+            if length_ratio is not None:
+                cap = max_new_tokens if max_new_tokens is not None else max_length
+                row_caps = [min(cap, int(lengths[j] * length_ratio) + LENGTH_MARGIN) for j in batch]
+            if beams > 1:
+                generate_kwargs["length_penalty"] = length_penalty
+                generate_kwargs["early_stopping"] = early_stopping
+
+            for tgt in tgt_lang_codes:
+                rows = [k for k, j in enumerate(batch) if occurrences[texts[j]][0] in pending[tgt]]
+                if not rows:
+                    continue
+                if encoder_hidden is None:
+                    model_inputs = encoded
+                else:
+                    from transformers.modeling_outputs import BaseModelOutput
+
+                    # generate はエンコーダ出力をビーム数分に複製して書き換えるので、毎回包み直す
+                    index = torch.tensor(rows, device=encoder_hidden.device)
+                    model_inputs = {
+                        "attention_mask": encoded["attention_mask"][index],
+                        "encoder_outputs": BaseModelOutput(last_hidden_state=encoder_hidden[index]),
+                    }
+                row_kwargs = dict(generate_kwargs)
+                if row_caps is not None:
+                    # generate 全体の上限は最長の行に合わせ、各行は自分の上限で EOS にする
+                    caps = [row_caps[k] for k in rows]
+                    row_kwargs["max_new_tokens"] = max(caps)
+                    row_kwargs.pop("max_length", None)
+                    row_kwargs["logits_processor"] = _length_cap_processor(
+                        caps, beams, model.config.eos_token_id
+                    )
+
+                with perf_trace.stage("generate", batch=len(rows), beams=beams, tgt=tgt) as span:
+                    with torch.no_grad():
+                        generated = model.generate(
+                            **model_inputs,
+                            forced_bos_token_id=model_token_id(model, tokenizer.get_lang_id(tgt)),
+                            num_beams=beams,
+                            **row_kwargs,
+                            stopping_criteria=stopping_criteria,
+                        )
+                    # 語彙を絞り込んだモデルの番号を元の語彙の番号に戻す
+                    generated = restore_token_ids(model, generated)
+                    if perf_trace.enabled():
+                        # 先頭（デコーダ開始トークン）とパディングを除いた生成トークン数
+                        span.set(tokens=int((generated[:, 1:] != tokenizer.pad_token_id).sum()))
+                # 中断された generate の出力は途中までなので使わない（キャッシュにも入れない）
+                if cancel_event is not None and cancel_event.is_set():
+                    raise TranslationCancelled()
+
+                pipeline.submit((tgt, [texts[batch[k]] for k in rows]), generated)
+                deliver(pipeline.completed())
+        deliver(pipeline.close())
+
+    return results
+
+
+def translate_text(tokenizer, model, device, text: str, tgt_lang_code: str,
+                   **kwargs) -> str:
+    """改行位置を保ったままテキスト全体を翻訳する"""
+    return "\n".join(
+        translate_lines(tokenizer, model, device, text.splitlines(), tgt_lang_code, **kwargs)
+    )
@@ -0,0 +1,58 @@
+# ==========================================================
+# 編集したテキストの差分翻訳（PyQt6 版の「翻訳」ボタン用）
+# 入力欄で OCR の誤りや誤字を直してから訳し直すとき、前回の原文（翻訳単位）と訳文を覚えておき、
+# difflib で突き合わせて、変わった文・挿入された文だけをモデルに渡す。残りは前回の訳をそのまま使う
+# ==========================================================
+
+import difflib
+from collections.abc import Callable
+
+# translate(lines, progress_callback) -> {言語コード: 訳文のリスト}
+TranslateLinesFn = Callable[..., dict[str, list[str]]]
+
+
+class PageTranslation:
+    """
+    1ページ分の翻訳結果。segments は翻訳単位の原文、translations は翻訳先ごとの訳文（segments と同じ順序）。
+    settings（翻訳先・デコード設定・モデルなど）が同じ次回の翻訳でだけ再利用する。
+    """
+
+    def __init__(self, settings: dict, segments: list[str],
+                 translations: dict[str, list[str]], reused: int = 0) -> None:
+        self.settings = settings
+        self.segments = segments
+        self.translations = translations
+        self.reused = reused  # 前回の訳を使い回した翻訳単位の数
+
+    def reusable(self, segments: list[str], settings: dict) -> dict[int, int]:
+        """segments の位置 → 訳を使い回せる前回の位置（変わっていない文だけ）"""
+        if settings != self.settings:
+            return {}
+        matcher = difflib.SequenceMatcher(None, self.segments, segments, autojunk=False)
+        return {
+            j + k: i + k
+            for i, j, size in matcher.get_matching_blocks()
+            for k in range(size)
+        }
+
+
+def translate_changed(translate: TranslateLinesFn, segments: list[str], tgt_lang_codes: list[str],
+                      settings: dict, previous: PageTranslation | None = None,
+                      progress_callback: Callable[[int], None] | None = None) -> PageTranslation:
+    """
+    previous と比べて変わった翻訳単位だけを translate に渡し、残りは previous の訳で埋める。
+    progress_callback には translate と同じく「行 × 翻訳先」の増分が渡される（訳し直した分だけ）。
+    """
+    reuse = previous.reusable(segments, settings) if previous is not None else {}
+    changed = [j for j in range(len(segments)) if j not in reuse]
+
+    outputs = translate([segments[j] for j in changed], progress_callback) if changed else {}
+    translations: dict[str, list[str]] = {}
+    for lang in tgt_lang_codes:
+        result = [""] * len(segments)
+        for j, i in reuse.items():
+            result[j] = previous.translations[lang][i]
+        for k, j in enumerate(changed):
+            result[j] = outputs[lang][k]
+        translations[lang] = result
+    return PageTranslation(settings, list(segments), translations, reused=len(reuse))
@@ -0,0 +1,193 @@
+# ==========================================================
+# トークン化 / 生成 / デコードを重ねて動かすパイプライン（translate_lines_multi 用）
+# トークナイザー（sentencepiece）とデコードは Python 側の処理で、その間モデルは止まっている。
+# 次のバッチのトークン化は前段のスレッドで先に済ませ、生成の終わったバッチのデコードは後段のスレッドで行い、
+# 呼び出し元のスレッドは generate を続けて呼ぶだけにする（torch の演算中は GIL が外れるため重なる）。
+# 段の間のキューは長さを制限し、先の段だけが進みすぎないようにする。
+# 環境変数 TRANSLATOR_PIPELINE=0 で従来どおり1つのスレッドで順番に処理する
+# ==========================================================
+
+import os
+import queue
+import threading
+import time
+from collections.abc import Callable, Iterable, Iterator
+
+import perf_trace
+
+PIPELINE_DEPTH = 2  # 段の間に溜めておくバッチ数
+_POLL_SECONDS = 0.1  # 中断を確認する間隔（キューの待ち）
+_END = object()
+
+
+def pipeline_enabled() -> bool:
+    return os.environ.get("TRANSLATOR_PIPELINE", "1") != "0"
+
+
+class StagePipeline:
+    """
+    3段のパイプライン。prepare（前段）は items を先読みして別スレッドで処理し、
+    呼び出し元は batches() から受け取ったものでモデルを動かして submit() で後段に渡す。
+    finish（後段）の結果は completed() / close() で呼び出し元のスレッドに返す
+    （翻訳メモリへの保存や進捗の通知は呼び出し元で行う）。
+    threaded=False なら同じ手順を1つのスレッドで順番に行う。with で使い、例外時もスレッドを止める。
+    """
+
+    def __init__(self, prepare: Callable, finish: Callable, *, depth: int = PIPELINE_DEPTH,
+                 threaded: bool = True) -> None:
+        self.prepare = prepare
+        self.finish = finish
+        self.threaded = threaded
+        self.busy = {"tokenize": 0.0, "generate": 0.0, "decode": 0.0}  # 各段が処理していた秒数
+        self.starved = 0.0  # 生成の段が前段を待っていた秒数
+        self.blocked = 0.0  # 生成の段が後段の空きを待っていた秒数
+        self._stop = threading.Event()
+        self._ready: queue.Queue = queue.Queue(maxsize=depth)  # 前段 → 生成
+        self._todo: queue.Queue = queue.Queue(maxsize=depth)   # 生成 → 後段
+        self._done: queue.Queue = queue.Queue()                # 後段 → 呼び出し元
+        self._threads: list[threading.Thread] = []
+        self._consumer: threading.Thread | None = None
+        self._started = time.perf_counter()
+        self._wall = 0.0
+
+    def __enter__(self) -> "StagePipeline":
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self._stop.set()
+        if self._consumer is not None and self._consumer.is_alive():
+            self._offer(self._todo, _END, force=True)
+        for thread in self._threads:
+            thread.join(timeout=5)
+        if not self._wall:
+            self._wall = time.perf_counter() - self._started
+            perf_trace.record_pipeline(self._wall, dict(self.busy), self.starved, self.blocked)
+
+    # ----------------------------------------
+    # キューの受け渡し（中断されたら諦める）
+    # ----------------------------------------
+    def _offer(self, q: queue.Queue, item, force: bool = False) -> bool:
+        while force or not self._stop.is_set():
+            try:
+                q.put(item, timeout=_POLL_SECONDS)
+                return True
+            except queue.Full:
+                if force:
+                    try:
+                        q.get_nowait()  # 中断時は残りを捨てて終了の合図を入れる
+                    except queue.Empty:
+                        pass
+        return False
+
+    # ----------------------------------------
+    # 前段（先読み）
+    # ----------------------------------------
+    def _produce(self, items: Iterable) -> None:
+        try:
+            for item in items:
+                if self._stop.is_set():
+                    return
+                started = time.perf_counter()
+                prepared = self.prepare(item)
+                self.busy["tokenize"] += time.perf_counter() - started
+                if not self._offer(self._ready, (item, prepared, None)):
+                    return
+        except BaseException as e:
+            self._offer(self._ready, (None, None, e))
+            return
+        self._offer(self._ready, _END)
+
+    def batches(self, items: Iterable) -> Iterator[tuple]:
+        """(item, prepare(item)) を順に返す。受け取ってから次を求めるまでを生成の段の処理時間とみなす"""
+        if not self.threaded:
+            for item in items:
+                started = time.perf_counter()
+                prepared = self.prepare(item)
+                self.busy["tokenize"] += time.perf_counter() - started
+                resumed = time.perf_counter()
+                blocked = self.blocked
+                yield item, prepared
+                self.busy["generate"] += time.perf_counter() - resumed - (self.blocked - blocked)
+            return
+
+        producer = threading.Thread(target=self._produce, args=(items,),
+                                    name="translate-prepare", daemon=True)
+        self._threads.append(producer)
+        producer.start()
+        while True:
+            waited = time.perf_counter()
+            entry = self._ready.get()
+            self.starved += time.perf_counter() - waited
+            if entry is _END:
+                return
+            item, prepared, error = entry
+            if error is not None:
+                raise error
+            resumed = time.perf_counter()
+            blocked = self.blocked
+            yield item, prepared
+            self.busy["generate"] += time.perf_counter() - resumed - (self.blocked - blocked)
+
+    # ----------------------------------------
+    # 後段
+    # ----------------------------------------
+    def _consume(self) -> None:
+        failed = False
+        while True:
+            entry = self._todo.get()
+            if entry is _END:
+                return
+            if failed:
+                continue  # 失敗した後は捨てるだけ（呼び出し元が例外を受け取って止める）
+            key, value = entry
+            started = time.perf_counter()
+            try:
+                self._done.put((key, self.finish(value), None))
+            except BaseException as e:
+                failed = True
+                self._done.put((key, None, e))
+            self.busy["decode"] += time.perf_counter() - started
+
+    def submit(self, key, value) -> None:
+        """生成の結果を後段に渡す（後段が詰まっていれば空くまで待つ）"""
+        if not self.threaded:
+            started = time.perf_counter()
+            self._done.put((key, self.finish(value), None))
+            finished = time.perf_counter() - started
+            self.busy["decode"] += finished
+            self.blocked += finished  # 生成の段の処理時間からは除く
+            return
+        if self._consumer is None:
+            self._consumer = threading.Thread(target=self._consume, name="translate-finish", daemon=True)
+            self._threads.append(self._consumer)
+            self._consumer.start()
+        waited = time.perf_counter()
+        self._offer(self._todo, (key, value))
+        self.blocked += time.perf_counter() - waited
+
+    def completed(self) -> list[tuple]:
+        """後段が済ませた (key, 結果) を取り出す（待たない）。後段の例外はここで送出する"""
+        results = []
+        while True:
+            try:
+                key, result, error = self._done.get_nowait()
+            except queue.Empty:
+                return results
+            if error is not None:
+                raise error
+            results.append((key, result))
+
+    def close(self) -> list[tuple]:
+        """後段の残りを待ち、(key, 結果) を返す"""
+        if self._consumer is not None:
+            self._offer(self._todo, _END)
+            self._consumer.join()
+        results = self.completed()
+        self._wall = time.perf_counter() - self._started
+        perf_trace.record_pipeline(self._wall, dict(self.busy), self.starved, self.blocked)
+        return results
+
+    def utilisation(self) -> dict[str, float]:
+        """各段の稼働率（処理していた時間 / 全体の時間）"""
+        wall = self._wall or (time.perf_counter() - self._started)
+        return {stage: (seconds / wall if wall else 0.0) for stage, seconds in self.busy.items()}
@@ -0,0 +1,276 @@
+# ==========================================================
+# CPU のデータ並列翻訳（複数のモデル複製をワーカープロセスで動かす）
+# 1つの generate は演算スレッドを増やしても数スレッドで頭打ちになるため、
+# コア数の多いマシンでは「少ないスレッドのモデル × 複数プロセス」に分けたほうが速い。
+# 各ワーカーはコアの一部に固定し（Linux の sched_setaffinity）、演算スレッド数もそれに合わせる。
+# fp32 / bf16 の重みは共有メモリに置き、全ワーカーで同じものを読む（プロセス数分のコピーは作らない）
+# ==========================================================
+
+import json
+import os
+import queue
+import threading
+import time
+from collections.abc import Callable, Sequence
+from pathlib import Path
+
+from translation_cache import model_fingerprint
+
+# 1ワーカーあたりの演算スレッド数の既定（自動調整の結果がない場合）
+DEFAULT_THREADS_PER_REPLICA = 4
+# 自動調整の結果の保存先（tools/tune_replicas.py が書き出す）
+LAYOUT_PATH = Path(__file__).resolve().parent / ".cache" / "replica_layout.json"
+STARTUP_TIMEOUT = 600  # ワーカーの起動（モデルの受け渡し）を待つ秒数
+
+
+def available_cores() -> list[int]:
+    """このプロセスが使える CPU コアの番号"""
+    if hasattr(os, "sched_getaffinity"):
+        return sorted(os.sched_getaffinity(0))
+    return list(range(os.cpu_count() or 1))
+
+
+def plan_layout(replicas: int, threads: int | None = None,
+                cores: Sequence[int] | None = None) -> list[list[int]]:
+    """
+    コアを replicas 個の重ならない連続した区間に分ける。threads 指定時は1区間あたりその数で、
+    replicas × threads がコア数を超える場合は、複製どうしが同じコアを取り合わないよう複製数を減らす。
+    threads を省略した場合は全コアを均等に分ける（割り切れない分は先頭の区間に1つずつ足す）
+    """
+    cores = list(cores) if cores is not None else available_cores()
+    if threads:
+        per = min(threads, len(cores))
+        replicas = max(1, min(replicas, len(cores) // per))
+        return [cores[i * per:(i + 1) * per] for i in range(replicas)]
+    replicas = max(1, min(replicas, len(cores)))
+    per, extra = divmod(len(cores), replicas)
+    bounds = [i * per + min(i, extra) for i in range(replicas + 1)]
+    return [cores[bounds[i]:bounds[i + 1]] for i in range(replicas)]
+
+
+def load_tuned_layout(model_dir: str | os.PathLike, precision: str,
+                      path: str | os.PathLike = LAYOUT_PATH) -> tuple[int, int] | None:
+    """同じマシン・同じモデル・同じ精度で自動調整した結果 (replicas, threads) があれば返す"""
+    try:
+        info = json.loads(Path(path).read_text(encoding="utf-8"))
+    except (OSError, ValueError):
+        return None
+    if (info.get("cores") != len(available_cores())
+            or info.get("model") != model_fingerprint(model_dir)
+            or info.get("precision") != precision):
+        return None
+    return info["replicas"], info["threads"]
+
+
+def save_tuned_layout(model_dir: str | os.PathLike, precision: str, replicas: int, threads: int,
+                      results: list[dict], path: str | os.PathLike = LAYOUT_PATH) -> None:
+    path = Path(path)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    path.write_text(json.dumps({
+        "cores": len(available_cores()),
+        "model": model_fingerprint(model_dir),
+        "precision": precision,
+        "replicas": replicas,
+        "threads": threads,
+        "results": results,
+    }, ensure_ascii=False, indent=2), encoding="utf-8")
+
+
+def auto_layout(model_dir: str | os.PathLike, precision: str) -> tuple[int, int]:
+    """自動調整の結果、なければ「4スレッドずつ」の経験則で (replicas, threads) を決める"""
+    tuned = load_tuned_layout(model_dir, precision)
+    if tuned is not None:
+        return tuned
+    cores = len(available_cores())
+    threads = min(DEFAULT_THREADS_PER_REPLICA, cores)
+    return max(1, cores // threads), threads
+
+
+# ----------------------------------------------------------
+# ワーカープロセス
+# jobs から (job_id, lines, tgt_lang_codes, kwargs) を受け取り、
+# results に ("done" | "cancelled" | "error", job_id, 内容) を返す
+# ----------------------------------------------------------
+def _replica_main(index: int, tokenizer, model, model_dir: str, precision: str, vocab: str,
+                  cores: list[int], jobs, results, cancel_event) -> None:
+    import torch
+
+    from model_runtime import load_model
+    from translation_engine import TranslationCancelled, translate_lines_multi
+
+    if cores and hasattr(os, "sched_setaffinity"):
+        os.sched_setaffinity(0, cores)
+    torch.set_num_interop_threads(1)
+
+    # 共有メモリに置けない重み（int8 の量子化済み Linear）は各ワーカーで読み込む
+    if model is None:
+        tokenizer, model, device = load_model(model_dir, precision, vocab)
+    else:
+        device = torch.device("cpu")
+    torch.set_num_threads(max(len(cores), 1))  # 割り当てたコア数に合わせる（TRANSLATOR_THREADS より優先）
+    results.put(("ready", index, None))
+
+    while True:
+        job = jobs.get()
+        if job is None:
+            break
+        job_id, lines, tgt_lang_codes, kwargs = job
+        if cancel_event.is_set():
+            results.put(("cancelled", job_id, None))
+            continue
+        try:
+            outputs = translate_lines_multi(
+                tokenizer, model, device, lines, tgt_lang_codes,
+                cancel_event=cancel_event, **kwargs,
+            )
+        except TranslationCancelled:
+            results.put(("cancelled", job_id, None))
+        except Exception as e:
+            results.put(("error", job_id, f"{type(e).__name__}: {e}"))
+        else:
+            results.put(("done", job_id, outputs))
+
+
+class ReplicaPool:
+    """
+    モデルの複製を layout の区間ごとのワーカープロセスで動かし、バッチ単位で配って並列に訳す。
+    model を渡すとその重みを共有メモリ経由で全ワーカーが使う（None なら各ワーカーが vocab の語彙で読み込む）。
+    同時に呼べるのは1つの translate だけ（複数スレッドからの呼び出しは順番に処理する）。
+    """
+
+    def __init__(self, model_dir: str | os.PathLike, precision: str, layout: list[list[int]],
+                 tokenizer, model=None, vocab: str = "full") -> None:
+        import torch.multiprocessing as mp
+
+        self.layout = layout
+        self.tokenizer = tokenizer
+        ctx = mp.get_context("spawn")  # Qt や torch のスレッドを抱えたまま fork しない
+        self._jobs = ctx.Queue()
+        self._results = ctx.Queue()
+        self._cancel = ctx.Event()
+        self._lock = threading.Lock()
+        self._next_job = 0
+        self._processes = [
+            ctx.Process(
+                target=_replica_main,
+                args=(i, tokenizer, model, str(model_dir), precision, vocab, cores,
+                      self._jobs, self._results, self._cancel),
+                name=f"translator-replica-{i}",
+                daemon=True,
+            )
+            for i, cores in enumerate(layout)
+        ]
+        for process in self._processes:
+            process.start()
+
+        ready = 0
+        deadline = time.monotonic() + STARTUP_TIMEOUT
+        while ready < len(self._processes):
+            try:
+                kind, _, _ = self._results.get(timeout=1.0)
+            except queue.Empty:
+                if not all(p.is_alive() for p in self._processes) or time.monotonic() > deadline:
+                    self.close()
+                    raise RuntimeError("翻訳ワーカーを起動できませんでした。")
+                continue
+            if kind == "ready":
+                ready += 1
+
+    @property
+    def replicas(self) -> int:
+        return len(self._processes)
+
+    def translate_lines_multi(self, lines: Sequence[str], tgt_lang_codes: Sequence[str], *,
+                              progress_callback: Callable[[int], None] | None = None,
+                              cancel_event: threading.Event | None = None,
+                              **kwargs) -> dict[str, list[str]]:
+        """
+        translate_lines_multi と同じ結果を返す（翻訳メモリは呼び出し側で扱い、ここには渡さない）。
+        1プロセスの場合と同じバッチ分け（plan_batches）をここで行い、1バッチずつワーカーに配るので、
+        訳は torch バックエンドと一致する。トークン数の多いバッチから先に配る
+        （最後に1つのワーカーだけが長いバッチを抱えて残りにくい）。
+        """
+        from translation_engine import (
+            BATCH_SIZE, MAX_BATCH_TOKENS, MAX_LENGTH, NUM_BEAMS, TranslationCancelled, plan_batches,
+        )
+
+        tgt_lang_codes = list(dict.fromkeys(tgt_lang_codes))
+        results = {tgt: [""] * len(lines) for tgt in tgt_lang_codes}
+
+        # 同じ文は1回だけ訳す（translate_lines_multi と同じ）
+        occurrences: dict[str, list[int]] = {}
+        for i, line in enumerate(lines):
+            if line.strip():
+                occurrences.setdefault(line, []).append(i)
+        blank = len(lines) - sum(len(v) for v in occurrences.values())
+        if progress_callback is not None and blank:
+            progress_callback(blank * len(tgt_lang_codes))
+        if not occurrences:
+            return results
+
+        texts = list(occurrences)
+        lengths = [
+            len(ids) for ids in self.tokenizer(
+                texts, truncation=True, max_length=kwargs.get("max_length", MAX_LENGTH)
+            )["input_ids"]
+        ]
+        plan = plan_batches(
+            lengths,
+            kwargs.get("batch_size", BATCH_SIZE),
+            kwargs.get("max_batch_tokens", MAX_BATCH_TOKENS),
+            kwargs.get("num_beams", NUM_BEAMS),
+            kwargs.get("greedy_max_tokens", 0),
+        )
+        plan.sort(key=lambda item: -sum(lengths[j] for j in item[0]) * item[1])
+
+        with self._lock:
+            self._cancel.clear()
+            pending: dict[int, list[str]] = {}
+            for batch, _ in plan:
+                self._next_job += 1
+                shard = [texts[j] for j in batch]
+                pending[self._next_job] = shard
+                self._jobs.put((self._next_job, shard, tgt_lang_codes, kwargs))
+
+            error = None
+            cancelled = False
+            while pending:
+                if cancel_event is not None and cancel_event.is_set():
+                    self._cancel.set()
+                try:
+                    kind, job_id, payload = self._results.get(timeout=0.1)
+                except queue.Empty:
+                    if not all(p.is_alive() for p in self._processes):
+                        raise RuntimeError("翻訳ワーカーが異常終了しました。")
+                    continue
+                if job_id not in pending:
+                    continue  # 前回中断したジョブの残り
+
+                shard = pending.pop(job_id)
+                if kind == "done":
+                    for tgt in tgt_lang_codes:
+                        for text, out in zip(shard, payload[tgt]):
+                            for i in occurrences[text]:
+                                results[tgt][i] = out
+                    if progress_callback is not None and not cancelled and error is None:
+                        progress_callback(sum(len(occurrences[t]) for t in shard) * len(tgt_lang_codes))
+                elif kind == "cancelled":
+                    cancelled = True
+                else:
+                    # 1つ失敗したら残りは止める（結果は使わない）
+                    error = error or payload
+                    self._cancel.set()
+
+        if error is not None:
+            raise RuntimeError(f"翻訳ワーカーでエラーが発生しました: {error}")
+        if cancelled or (cancel_event is not None and cancel_event.is_set()):
+            raise TranslationCancelled()
+        return results
+
+    def close(self) -> None:
+        for _ in self._processes:
+            self._jobs.put(None)
+        for process in self._processes:
+            process.join(timeout=10)
+            if process.is_alive():
+                process.terminate()
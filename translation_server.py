@@ -0,0 +1,412 @@
+# ==========================================================
+# ローカル翻訳サーバー
+# 1つのモデルを全クライアント（Streamlit の各セッション・PyQt6 の各ウィンドウ・一括翻訳）で共有する
+# 届いた依頼を短い時間窓でまとめ（マイクロバッチ）、1回の翻訳で処理して依頼ごとに返す
+# 例:
+#   python translation_server.py                              # http://127.0.0.1:8765
+#   python translation_server.py --unix /tmp/ja_translator.sock
+# クライアント側は環境変数 TRANSLATOR_SERVER_URL を設定する
+#   TRANSLATOR_SERVER_URL=http://127.0.0.1:8765 streamlit run m2m100_418M_streamlit.py
+#   TRANSLATOR_SERVER_URL=unix:///tmp/ja_translator.sock python pdf_translate_viewer_all.py
+# ==========================================================
+
+import argparse
+import http.client
+import json
+import os
+import queue
+import socket
+import socketserver
+import sys
+import threading
+import time
+from concurrent.futures import Future
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+from urllib.parse import urlsplit
+
+import perf_trace
+from translation_engine import BATCH_SIZE, MAX_BATCH_TOKENS, MAX_LENGTH, NUM_BEAMS
+
+DEFAULT_HOST = "127.0.0.1"
+DEFAULT_PORT = 8765
+
+# マイクロバッチの設定
+BATCH_WINDOW_SECONDS = 0.02   # 最初の依頼が届いてから、まとめて待つ時間
+MAX_WINDOW_LINES = 256        # 1回にまとめる最大行数（これに達したら待たずに翻訳する）
+
+# 1リクエストの上限
+MAX_REQUEST_LINES = 1000
+MAX_REQUEST_BYTES = 4 * 1024 * 1024
+MAX_NUM_BEAMS = 8
+
+REQUEST_TIMEOUT = 600  # クライアント側の待ち時間（秒）
+
+
+# ----------------------------------------------------------
+# マイクロバッチ
+# ----------------------------------------------------------
+class MicroBatcher:
+    """
+    複数スレッドからの翻訳依頼を1本の翻訳スレッドに集める。
+    最初の依頼から window 秒の間に届いた依頼を、翻訳先・デコード設定ごとにまとめて1回で翻訳する。
+    依頼をまたいで同じ行があれば1回だけ翻訳する。
+    """
+
+    def __init__(self, backend, cache=None, *,
+                 window: float = BATCH_WINDOW_SECONDS,
+                 max_lines: int = MAX_WINDOW_LINES,
+                 batch_size: int = BATCH_SIZE,
+                 max_batch_tokens: int = MAX_BATCH_TOKENS) -> None:
+        self.backend = backend
+        self.cache = cache
+        self.window = window
+        self.max_lines = max_lines
+        self.batch_size = batch_size
+        self.max_batch_tokens = max_batch_tokens
+
+        # 処理状況（/health で返す）
+        self.requests = 0
+        self.batches = 0
+        self.lines = 0
+
+        self._queue: queue.Queue = queue.Queue()
+        self._thread = threading.Thread(target=self._run, name="micro-batcher", daemon=True)
+        self._thread.start()
+
+    def submit(self, lines: list[str], tgt_lang_code: str, **params) -> "Future[list[str]]":
+        """params は num_beams / max_length / max_new_tokens（translate_lines と同じ）"""
+        future: Future = Future()
+        self._queue.put((list(lines), tgt_lang_code, params, future))
+        return future
+
+    def translate_lines(self, lines: list[str], tgt_lang_code: str, **params) -> list[str]:
+        return self.submit(lines, tgt_lang_code, **params).result()
+
+    def close(self) -> None:
+        self._queue.put(None)
+        self._thread.join()
+
+    def _collect(self, first) -> list:
+        pending = [first]
+        count = len(first[0])
+        deadline = time.monotonic() + self.window
+        while count < self.max_lines:
+            timeout = deadline - time.monotonic()
+            if timeout <= 0:
+                break
+            try:
+                item = self._queue.get(timeout=timeout)
+            except queue.Empty:
+                break
+            if item is None:
+                # 終了要求：手元の依頼を片付けてから止まる
+                self._queue.put(None)
+                break
+            pending.append(item)
+            count += len(item[0])
+        return pending
+
+    def _run(self) -> None:
+        while True:
+            first = self._queue.get()
+            if first is None:
+                return
+
+            groups: dict[tuple, list] = {}
+            for request in self._collect(first):
+                lines, tgt_lang_code, params, future = request
+                if not future.set_running_or_notify_cancel():
+                    continue
+                key = (tgt_lang_code, tuple(sorted(params.items())))
+                groups.setdefault(key, []).append(request)
+
+            for (tgt_lang_code, params), requests in groups.items():
+                self._translate_group(tgt_lang_code, dict(params), requests)
+
+    def _translate_group(self, tgt_lang_code: str, params: dict, requests: list) -> None:
+        unique = list(dict.fromkeys(line for lines, *_ in requests for line in lines))
+        try:
+            translated = self.backend.translate_lines(
+                unique, tgt_lang_code,
+                batch_size=self.batch_size,
+                max_batch_tokens=self.max_batch_tokens,
+                cache=self.cache,
+                **params,
+            )
+        except Exception as e:
+            for *_, future in requests:
+                future.set_exception(e)
+            return
+
+        self.requests += len(requests)
+        self.batches += 1
+        self.lines += len(unique)
+        table = dict(zip(unique, translated))
+        for lines, _, _, future in requests:
+            future.set_result([table[line] for line in lines])
+
+
+# ----------------------------------------------------------
+# リクエストの検証
+# ----------------------------------------------------------
+def _parse_translate_request(request, backend) -> tuple[list[str], str, dict]:
+    if not isinstance(request, dict):
+        raise ValueError("JSON オブジェクトを送ってください。")
+
+    lines = request.get("lines")
+    if not isinstance(lines, list) or not all(isinstance(line, str) for line in lines):
+        raise ValueError("lines は文字列のリストで指定してください。")
+    if len(lines) > MAX_REQUEST_LINES:
+        raise ValueError(f"1回に送れるのは {MAX_REQUEST_LINES} 行までです。")
+
+    tgt_lang_code = request.get("tgt_lang")
+    try:
+        backend.tokenizer.get_lang_id(tgt_lang_code)
+    except (KeyError, TypeError):
+        raise ValueError(f"翻訳先の言語コードが不正です: {tgt_lang_code}") from None
+
+    def int_param(name: str, default, upper: int):
+        value = request.get(name, default)
+        if value is None and default is None:
+            return None
+        if not isinstance(value, int) or isinstance(value, bool) or not 1 <= value <= upper:
+            raise ValueError(f"{name} は 1〜{upper} の整数で指定してください。")
+        return value
+
+    def float_param(name: str, default, lower: float, upper: float):
+        value = request.get(name, default)
+        if value is None and default is None:
+            return None
+        if not isinstance(value, (int, float)) or isinstance(value, bool) or not lower <= value <= upper:
+            raise ValueError(f"{name} は {lower}〜{upper} の数値で指定してください。")
+        return float(value)
+
+    params = {
+        "num_beams": int_param("num_beams", NUM_BEAMS, MAX_NUM_BEAMS),
+        "max_length": int_param("max_length", MAX_LENGTH, MAX_LENGTH),
+    }
+    max_new_tokens = int_param("max_new_tokens", None, MAX_LENGTH)
+    if max_new_tokens is not None:
+        params["max_new_tokens"] = max_new_tokens
+
+    # デコードのプロファイル由来の設定（省略時は translate_lines の既定値）
+    length_penalty = float_param("length_penalty", None, 0.0, 5.0)
+    if length_penalty is not None:
+        params["length_penalty"] = length_penalty
+    if "early_stopping" in request:
+        if not isinstance(request["early_stopping"], bool):
+            raise ValueError("early_stopping は true / false で指定してください。")
+        params["early_stopping"] = request["early_stopping"]
+    length_ratio = float_param("length_ratio", None, 0.5, 10.0)
+    if length_ratio is not None:
+        params["length_ratio"] = length_ratio
+    if request.get("greedy_max_tokens"):
+        params["greedy_max_tokens"] = int_param("greedy_max_tokens", 0, MAX_LENGTH)
+    return lines, tgt_lang_code, params
+
+
+# ----------------------------------------------------------
+# HTTP サーバー
+#   GET  /health    : モデル情報と処理状況
+#   POST /translate : {"lines": [...], "tgt_lang": "vi", "num_beams": 4, ...}
+#                     → {"translations": [...]}
+# ----------------------------------------------------------
+def _make_handler(batcher: MicroBatcher, verbose: bool = False) -> type[BaseHTTPRequestHandler]:
+    backend = batcher.backend
+
+    class Handler(BaseHTTPRequestHandler):
+        server_version = "JATranslator/1.0"
+
+        def do_GET(self) -> None:
+            if self.path != "/health":
+                self._reply(404, {"error": f"見つかりません: {self.path}"})
+                return
+            self._reply(200, {
+                "backend": backend.name,
+                "precision": backend.precision,
+                "cache_variant": backend.cache_variant,
+                "model": backend.fingerprint,
+                "requests": batcher.requests,
+                "batches": batcher.batches,
+                "lines": batcher.lines,
+                "cache": batcher.cache.stats() if batcher.cache is not None else None,
+                "perf": perf_trace.snapshot() if perf_trace.enabled() else None,
+                "pipeline": perf_trace.pipeline_snapshot() if perf_trace.enabled() else None,
+            })
+
+        def do_POST(self) -> None:
+            if self.path != "/translate":
+                self._reply(404, {"error": f"見つかりません: {self.path}"})
+                return
+            try:
+                length = int(self.headers.get("Content-Length") or 0)
+                if length < 0:
+                    raise ValueError
+            except ValueError:
+                self._reply(400, {"error": "Content-Length が正しくありません。"})
+                return
+            if length > MAX_REQUEST_BYTES:
+                self._reply(413, {"error": "リクエストが大きすぎます。"})
+                return
+            try:
+                request = json.loads(self.rfile.read(length) or b"null")
+                lines, tgt_lang_code, params = _parse_translate_request(request, backend)
+            except ValueError as e:
+                self._reply(400, {"error": str(e)})
+                return
+            try:
+                translations = batcher.translate_lines(lines, tgt_lang_code, **params)
+            except Exception as e:
+                self._reply(500, {"error": str(e)})
+                return
+            self._reply(200, {"translations": translations})
+
+        def _reply(self, status: int, payload: dict) -> None:
+            body = json.dumps(payload, ensure_ascii=False).encode("utf-8")
+            self.send_response(status)
+            self.send_header("Content-Type", "application/json; charset=utf-8")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def address_string(self) -> str:
+            # Unix ソケットでは client_address が空になる
+            return self.client_address[0] if self.client_address else "unix"
+
+        def log_message(self, format: str, *args) -> None:
+            if verbose:
+                super().log_message(format, *args)
+
+    return Handler
+
+
+LISTEN_BACKLOG = 128  # 同時接続の待ち行列（Unix ソケットは溢れると接続が即失敗するため大きめに）
+
+
+class _TCPServer(ThreadingHTTPServer):
+    request_queue_size = LISTEN_BACKLOG
+
+
+if hasattr(socketserver, "ThreadingUnixStreamServer"):
+    class _UnixServer(socketserver.ThreadingUnixStreamServer):
+        request_queue_size = LISTEN_BACKLOG
+        daemon_threads = True
+else:
+    _UnixServer = None
+
+
+def create_server(batcher: MicroBatcher, host: str = DEFAULT_HOST, port: int = DEFAULT_PORT,
+                  unix_socket: str | None = None, verbose: bool = False) -> socketserver.BaseServer:
+    handler = _make_handler(batcher, verbose)
+    if unix_socket is None:
+        return _TCPServer((host, port), handler)
+
+    if _UnixServer is None:
+        raise RuntimeError("この OS では Unix ソケットを使えません。--port を使ってください。")
+    Path(unix_socket).unlink(missing_ok=True)  # 前回の残り
+    return _UnixServer(unix_socket, handler)
+
+
+# ----------------------------------------------------------
+# クライアント側（translation_backends.RemoteBackend から使う）
+# URL は http://host:port または unix:///path/to/socket
+# ----------------------------------------------------------
+class _UnixHTTPConnection(http.client.HTTPConnection):
+    def __init__(self, socket_path: str, timeout: float) -> None:
+        super().__init__("localhost", timeout=timeout)
+        self.socket_path = socket_path
+
+    def connect(self) -> None:
+        self.sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        self.sock.settimeout(self.timeout)
+        self.sock.connect(self.socket_path)
+
+
+def server_request(url: str, method: str, path: str, payload: dict | None = None,
+                   timeout: float = REQUEST_TIMEOUT) -> dict:
+    """サーバーに JSON で問い合わせる。サーバー側のエラーは RuntimeError にする"""
+    parts = urlsplit(url)
+    if parts.scheme == "unix":
+        conn = _UnixHTTPConnection(parts.path, timeout)
+    elif parts.scheme == "http":
+        conn = http.client.HTTPConnection(parts.hostname, parts.port or 80, timeout=timeout)
+    else:
+        raise ValueError(f"翻訳サーバーの URL が不正です: {url}（http:// または unix:// で指定）")
+
+    body = None if payload is None else json.dumps(payload, ensure_ascii=False).encode("utf-8")
+    headers = {"Content-Type": "application/json"} if body is not None else {}
+    try:
+        conn.request(method, path, body=body, headers=headers)
+        response = conn.getresponse()
+        data = json.loads(response.read() or b"{}")
+    finally:
+        conn.close()
+
+    if response.status != 200:
+        raise RuntimeError(f"翻訳サーバーでエラーが発生しました: {data.get('error', response.status)}")
+    return data
+
+
+def main(argv: list[str] | None = None) -> int:
+    from model_runtime import PRECISIONS, resolve_model_dir
+    from translation_backends import BACKENDS, DEFAULT_BACKEND, load_backend
+    from translation_cache import TranslationCache
+    from vocab_pruning import VOCAB_MODES
+
+    local_backends = [name for name, cls in BACKENDS.items() if not cls.remote]
+    parser = argparse.ArgumentParser(description="翻訳モデルを1つ読み込み、ローカルの翻訳サーバーとして公開します")
+    parser.add_argument("--host", default=DEFAULT_HOST, help="待ち受けるアドレス（既定: localhost のみ）")
+    parser.add_argument("--port", type=int, default=DEFAULT_PORT, help="待ち受けるポート")
+    parser.add_argument("--unix", metavar="PATH", default=None, help="TCP の代わりに Unix ソケットで待ち受ける")
+    parser.add_argument("--model-dir", default=str(resolve_model_dir()), help="ローカルモデルのパス")
+    parser.add_argument("--backend", choices=local_backends, default=None,
+                        help="推論バックエンド（省略時は環境変数 TRANSLATOR_BACKEND、既定 torch）")
+    parser.add_argument("--precision", choices=PRECISIONS, default=None,
+                        help="CPU 推論の精度（省略時は環境変数 TRANSLATOR_PRECISION、既定 fp32）")
+    parser.add_argument("--vocab", choices=VOCAB_MODES, default=None,
+                        help="出力語彙（pruned: ベトナム語・英語に絞る。省略時は環境変数 TRANSLATOR_VOCAB、既定 full）")
+    parser.add_argument("--batch-size", type=int, default=BATCH_SIZE, help="1回の generate の最大行数")
+    parser.add_argument("--max-batch-tokens", type=int, default=MAX_BATCH_TOKENS,
+                        help="1バッチのトークン予算")
+    parser.add_argument("--window-ms", type=float, default=BATCH_WINDOW_SECONDS * 1000,
+                        help="依頼をまとめて待つ時間（ミリ秒）")
+    parser.add_argument("--no-cache", action="store_true", help="翻訳メモリを使わない")
+    parser.add_argument("--verbose", action="store_true", help="リクエストごとのログを表示する")
+    args = parser.parse_args(argv)
+
+    backend_name = args.backend or os.environ.get("TRANSLATOR_BACKEND") or DEFAULT_BACKEND
+    if backend_name not in local_backends:
+        parser.error(f"サーバーでは {', '.join(local_backends)} のいずれかを指定してください。")
+
+    backend = load_backend(args.model_dir, backend_name, args.precision, vocab=args.vocab)
+    cache = None if args.no_cache else TranslationCache(args.model_dir, variant=backend.cache_variant)
+    batcher = MicroBatcher(
+        backend, cache,
+        window=args.window_ms / 1000,
+        batch_size=args.batch_size,
+        max_batch_tokens=args.max_batch_tokens,
+    )
+    server = create_server(batcher, args.host, args.port, args.unix, args.verbose)
+    url = f"unix://{args.unix}" if args.unix else f"http://{args.host}:{args.port}"
+    print(f"翻訳サーバーを起動しました: {url}（{backend.name} / {backend.precision}）", file=sys.stderr)
+    print(f"クライアント側で TRANSLATOR_SERVER_URL={url} を設定してください。Ctrl+C で終了します。",
+          file=sys.stderr)
+
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+        batcher.close()
+        backend.close()
+        if cache is not None:
+            cache.close()
+        if args.unix:
+            Path(args.unix).unlink(missing_ok=True)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,218 @@
+# ==========================================================
+# 翻訳ワーカー（QThread）
+# model.generate を GUI スレッドの外で実行し、進捗・途中結果・エラーをシグナルで通知する
+# ==========================================================
+
+import queue
+import threading
+from collections.abc import Callable
+from pathlib import Path
+
+from PyQt6.QtCore import QThread, pyqtSignal
+
+from ja_segment import SegmentedText
+from pdf_extract import EMPTY_PAGE_TEXT, EXTRACT_WORKERS, PdfPageSource, page_header
+from translation_checkpoint import ResumableOutput
+from translation_dedup import DocumentDedup
+from translation_engine import TranslationCancelled
+from translation_incremental import PageTranslation, translate_changed
+
+# translate_fn(lines, tgt_lang_codes, progress_callback, cancel_event) -> {言語コード: 訳文のリスト}
+TranslateFn = Callable[..., dict[str, list[str]]]
+
+# モデルは1インスタンスのみ。同時に generate するワーカーは常に1つだけにする
+MODEL_LOCK = threading.Lock()
+
+
+class TranslationWorker(QThread):
+    """ワーカーの共通部分（シグナル・キャンセル・例外処理）"""
+
+    progress = pyqtSignal(int, int)      # 処理済みステップ数, 全ステップ数
+    partial = pyqtSignal(int, str)       # ページ番号（1始まり）, そのページの翻訳結果
+    succeeded = pyqtSignal(str)          # 最終結果（テキスト翻訳は訳文、全ページ翻訳は保存先）
+    failed = pyqtSignal(str)
+    cancelled = pyqtSignal()
+
+    def __init__(self, translate_fn: TranslateFn, tgt_lang_code: str, parent=None,
+                 join_sentences: bool = True) -> None:
+        super().__init__(parent)
+        self.translate_fn = translate_fn
+        self.tgt_lang_code = tgt_lang_code
+        # "vi+en" のように + でつないだ場合は、全言語を1回で訳して対訳にする
+        self.tgt_langs = tgt_lang_code.split("+")
+        # True: 折り返された行を文単位に組み直して翻訳（訳文は1段落1行）、False: 物理行ごと
+        self.join_sentences = join_sentences
+        self.cancel_event = threading.Event()
+
+    def cancel(self) -> None:
+        """generate の途中でも次のデコードステップで停止する"""
+        self.cancel_event.set()
+
+    def run(self) -> None:
+        try:
+            with MODEL_LOCK:
+                result = self.work()
+        except TranslationCancelled:
+            self.cancelled.emit()
+        except Exception as e:
+            self.failed.emit(str(e))
+        else:
+            self.succeeded.emit(result)
+
+    def work(self) -> str:
+        raise NotImplementedError
+
+    def _translate(self, lines: list[str], progress_callback=None) -> dict[str, list[str]]:
+        return self.translate_fn(
+            lines, self.tgt_langs,
+            progress_callback=progress_callback,
+            cancel_event=self.cancel_event,
+        )
+
+    def _translate_text(self, layout: SegmentedText, progress_callback=None) -> str:
+        translations = self._translate(layout.segments, progress_callback)
+        if len(self.tgt_langs) > 1:
+            return layout.rebuild_bilingual(translations)
+        return layout.rebuild(translations[self.tgt_langs[0]])
+
+
+class TextTranslationWorker(TranslationWorker):
+    """
+    入力欄のテキストを翻訳する（進捗は訳し直す翻訳単位＝文または行の数 × 翻訳先の数）。
+    previous（同じページの前回の結果）を渡すと、変わった文だけを訳す。結果は result に残る。
+    """
+
+    def __init__(self, translate_fn: TranslateFn, text: str, tgt_lang_code: str,
+                 parent=None, join_sentences: bool = True,
+                 previous: PageTranslation | None = None, settings: dict | None = None) -> None:
+        super().__init__(translate_fn, tgt_lang_code, parent, join_sentences)
+        self.layout = SegmentedText(text, join_sentences)
+        self.previous = previous
+        self.settings = {"tgt_lang": tgt_lang_code, "join_sentences": join_sentences, **(settings or {})}
+        self.result: PageTranslation | None = None
+
+    def work(self) -> str:
+        segments = self.layout.segments
+        reused = len(self.previous.reusable(segments, self.settings)) if self.previous is not None else 0
+        total = max((len(segments) - reused) * len(self.tgt_langs), 1)
+        done = 0
+
+        def advance(step: int) -> None:
+            nonlocal done
+            done += step
+            self.progress.emit(done, total)
+
+        self.result = translate_changed(
+            self._translate, segments, self.tgt_langs, self.settings, self.previous, advance,
+        )
+        if len(self.tgt_langs) > 1:
+            return self.layout.rebuild_bilingual(self.result.translations)
+        return self.layout.rebuild(self.result.translations[self.tgt_langs[0]])
+
+
+class DocumentTranslationWorker(TranslationWorker):
+    """
+    PDF 全ページを翻訳し、1ページ完了するごとにファイルへ追記する。
+    ページ N の翻訳中に、別スレッドでページ N+1 以降のテキスト抽出を先行させる。
+    同じ原本・同じ設定のチェックポイントが残っていれば、未完了のページから再開する。
+    文書内で一度訳した文（毎ページのヘッダー・フッターなど）は訳し直さない（dedup に件数が残る）。
+    """
+
+    PREFETCH_PAGES = 2
+    PAGE_POLL_SECONDS = 0.5  # 抽出を待つ間、キャンセルと抽出スレッドの生存を確認する間隔
+
+    def __init__(self, translate_fn: TranslateFn, page_source: PdfPageSource, save_path: Path,
+                 tgt_lang_code: str, settings: dict, parent=None,
+                 join_sentences: bool = True) -> None:
+        super().__init__(translate_fn, tgt_lang_code, parent, join_sentences)
+        self.dedup = DocumentDedup(translate_fn)
+        self.translate_fn = self.dedup
+        self.page_source = page_source
+        self.save_path = save_path
+        self.settings = settings
+        self.resumed_from = 0  # 再開した場合の開始ページ（1始まり）、新規なら 0
+
+    # ----------------------------------------
+    # 抽出スレッド：ページテキストをキューへ送る
+    # 抽出済みページはキャッシュを再利用し、残りはプロセスプールで並列抽出
+    # ----------------------------------------
+    def _extract_pages(self, indices: range, out: queue.Queue, stop: threading.Event) -> None:
+        try:
+            for index, text in self.page_source.iter_texts(indices, workers=EXTRACT_WORKERS):
+                if stop.is_set() or self.cancel_event.is_set():
+                    break
+                out.put(("page", (index + 1, text)))
+        except Exception as e:
+            out.put(("error", e))
+        finally:
+            out.put(("end", None))
+
+    def work(self) -> str:
+        total = self.page_source.page_count
+        output = ResumableOutput(
+            self.save_path, self.page_source.path,
+            {"tgt_lang": self.tgt_lang_code, **self.settings}, total,
+        )
+        if output.resumed:
+            self.resumed_from = output.start_page + 1
+        self.progress.emit(output.start_page, total)
+        # ヘッダー・フッターは本文とつながず、毎ページ同じ1文として扱う
+        bands = self.page_source.repeated_bands() if self.join_sentences else set()
+
+        pages: queue.Queue = queue.Queue(maxsize=self.PREFETCH_PAGES)
+        stop = threading.Event()
+        extractor = threading.Thread(
+            target=self._extract_pages,
+            args=(range(output.start_page, total), pages, stop),
+            daemon=True,
+        )
+        extractor.start()
+
+        try:
+            while True:
+                try:
+                    kind, payload = pages.get(timeout=self.PAGE_POLL_SECONDS)
+                except queue.Empty:
+                    if self.cancel_event.is_set():
+                        raise TranslationCancelled()
+                    if not extractor.is_alive() and pages.empty():
+                        raise RuntimeError("ページの抽出が完了を通知せずに止まりました。")
+                    continue
+                if kind == "end":
+                    break
+                if kind == "error":
+                    raise payload
+
+                i, src_text = payload
+                if self.cancel_event.is_set():
+                    raise TranslationCancelled()
+
+                header = page_header(i, total)
+                if src_text.strip():
+                    translated = self._translate_text(
+                        SegmentedText(src_text, self.join_sentences, bands)
+                    )
+                else:
+                    translated = EMPTY_PAGE_TEXT
+
+                output.append_page(header + translated + "\n\n")
+                self.partial.emit(i, translated)
+                self.progress.emit(i, total)
+
+            if self.cancel_event.is_set():
+                raise TranslationCancelled()
+        except BaseException:
+            # 完了済みページとチェックポイントは残す（次回はここから再開）
+            output.close()
+            raise
+        finally:
+            # 抽出スレッドがキュー待ちで止まらないよう、停止を指示して読み捨てる
+            stop.set()
+            while extractor.is_alive():
+                try:
+                    pages.get(timeout=0.1)
+                except queue.Empty:
+                    pass
+
+        output.finish()
+        return str(self.save_path)
@@ -0,0 +1,196 @@
+# ==========================================================
+# 出力語彙の絞り込み（環境変数 TRANSLATOR_VOCAB=pruned、コマンドライン版は --vocab pruned）
+# M2M100 の語彙は約 12.8 万トークンあり、生成の1ステップごとに全語彙への射影（lm_head）と
+# softmax を計算している。翻訳先はベトナム語か英語だけなので、その文字で書けるトークン
+# （とコーパスの訳文に現れたトークン）に出力を限り、lm_head とデコーダの埋め込みをその行だけに切り出す。
+# モデルの中ではトークン番号が詰め直されるので、生成結果は元の番号に戻してからデコードする。
+# 許可リストは翻訳先ごとに <モデル>/optimized/vocab/<言語>.json に保存して再利用する
+# （tools/build_vocab.py でコーパスから作り直せる）
+# ==========================================================
+
+import json
+import os
+import string
+import sys
+from collections.abc import Iterable, Sequence
+from pathlib import Path
+
+from translation_cache import model_fingerprint
+
+VOCAB_MODES = ("full", "pruned")
+DEFAULT_VOCAB = "full"
+TARGET_LANGS = ("vi", "en")  # 絞り込んだモデルで訳せる翻訳先（両方の許可リストの和を使う）
+
+VOCAB_DIR_NAME = "vocab"
+PRUNED_ATTR = "pruned_vocab_ids"  # モデルに付ける「詰め直した番号 → 元の番号」のテンソル
+WORD_MARK = "▁"  # SentencePiece の語頭記号
+
+# 翻訳先ごとに、訳文に現れうる文字（これだけで書けるトークンを許可する）
+_COMMON_CHARS = string.ascii_letters + string.digits + string.punctuation + (
+    "°±×÷µ²³·–—‘’“”…•€£¥©®™→←↑↓≤≥≠≈∅Ø"
+)
+_VIETNAMESE_LETTERS = (
+    "àáảãạăằắẳẵặâầấẩẫậèéẻẽẹêềếểễệìíỉĩịòóỏõọôồốổỗộơờớởỡợùúủũụưừứửữựỳýỷỹỵđ"
+)
+TARGET_CHARS = {
+    "en": _COMMON_CHARS,
+    "vi": _COMMON_CHARS + _VIETNAMESE_LETTERS + _VIETNAMESE_LETTERS.upper(),
+}
+
+
+def resolve_vocab(vocab: str | None = None) -> str:
+    """指定（なければ環境変数 TRANSLATOR_VOCAB）から語彙モードを決める"""
+    vocab = (vocab or os.environ.get("TRANSLATOR_VOCAB") or DEFAULT_VOCAB).lower()
+    if vocab not in VOCAB_MODES:
+        raise ValueError(f"不明な語彙モードです: {vocab}（{', '.join(VOCAB_MODES)} のいずれか）")
+    return vocab
+
+
+# ----------------------------------------------------------
+# 許可リスト（翻訳先ごと）
+# ----------------------------------------------------------
+def whitelist_path(model_dir: str | os.PathLike, tgt_lang_code: str) -> Path:
+    from model_runtime import QUANTIZED_DIR_NAME
+
+    return Path(model_dir) / QUANTIZED_DIR_NAME / VOCAB_DIR_NAME / f"{tgt_lang_code}.json"
+
+
+def build_whitelist(tokenizer, tgt_lang_code: str, corpus: Iterable[str] = (),
+                    token_ids: Iterable[int] = ()) -> list[int]:
+    """
+    tgt_lang_code の訳文に使うトークン番号（昇順）。
+    特殊トークン・翻訳先の言語トークン・翻訳先の文字だけで書けるトークン・corpus（訳文）に現れたトークン、
+    token_ids（全語彙のモデルが実際に生成したトークン。訳文を分割し直しても同じ番号になるとは限らない）
+    """
+    if tgt_lang_code not in TARGET_CHARS:
+        raise ValueError(f"語彙の絞り込みに対応していない翻訳先です: {tgt_lang_code}")
+    allowed = set(TARGET_CHARS[tgt_lang_code])
+    lang_ids = {tokenizer.get_lang_id(code) for code in tokenizer.lang_code_to_id}
+
+    ids = {tokenizer.bos_token_id, tokenizer.pad_token_id, tokenizer.eos_token_id,
+           tokenizer.unk_token_id, tokenizer.get_lang_id(tgt_lang_code)}
+    for piece, token_id in tokenizer.get_vocab().items():
+        if token_id in lang_ids:
+            continue
+        text = piece.replace(WORD_MARK, "")
+        if all(ch in allowed for ch in text):
+            ids.add(token_id)
+    for text in corpus:
+        ids.update(tokenizer(text, add_special_tokens=False)["input_ids"])
+    ids.update(token_ids)
+    return sorted(ids)
+
+
+def save_whitelist(model_dir: str | os.PathLike, tgt_lang_code: str, ids: Sequence[int],
+                   corpus_lines: int = 0) -> None:
+    path = whitelist_path(model_dir, tgt_lang_code)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    path.write_text(json.dumps({
+        "model": model_fingerprint(model_dir),
+        "tgt_lang": tgt_lang_code,
+        "corpus_lines": corpus_lines,
+        "ids": list(ids),
+    }), encoding="utf-8")
+
+
+def load_whitelist(tokenizer, model_dir: str | os.PathLike, tgt_lang_code: str) -> list[int]:
+    """保存済みの許可リスト（同じモデルのもの）を読む。なければ文字だけで作って保存する"""
+    path = whitelist_path(model_dir, tgt_lang_code)
+    try:
+        info = json.loads(path.read_text(encoding="utf-8"))
+        if info.get("model") == model_fingerprint(model_dir):
+            return info["ids"]
+    except (OSError, ValueError, KeyError):
+        pass
+
+    ids = build_whitelist(tokenizer, tgt_lang_code)
+    try:
+        save_whitelist(model_dir, tgt_lang_code, ids)
+    except OSError as e:
+        print(f"語彙の許可リストを保存できませんでした: {e}", file=sys.stderr)
+    return ids
+
+
+# ----------------------------------------------------------
+# モデルの切り出し
+# ----------------------------------------------------------
+def prune_vocab(model, keep_ids: Iterable[int]) -> None:
+    """
+    デコーダの埋め込みと lm_head を keep_ids の行だけにする（model をその場で書き換える）。
+    エンコーダの埋め込み（日本語の入力側）はそのまま。int8 の lm_head は同じ量子化パラメータのまま切り出す。
+    特殊トークン（bos / pad / eos / unk = 0〜3）は詰め直しても同じ番号のままになる。
+    """
+    import torch
+    from torch import nn
+
+    ids = torch.tensor(sorted(set(keep_ids)), dtype=torch.long)
+    special = [model.config.pad_token_id, model.config.eos_token_id, model.config.decoder_start_token_id]
+    if any(i >= len(ids) or int(ids[i]) != i for i in special):
+        raise ValueError("特殊トークンが許可リストの先頭にありません。")
+
+    decoder = model.get_decoder()
+    embed = decoder.embed_tokens
+    weight = embed.weight.detach()[ids].clone()
+    pruned_embed = type(embed)(
+        len(ids), weight.shape[1], padding_idx=embed.padding_idx,
+        embed_scale=getattr(embed, "embed_scale", 1.0),
+    )
+    pruned_embed.weight = nn.Parameter(weight, requires_grad=False)
+    decoder.embed_tokens = pruned_embed
+
+    head = model.get_output_embeddings()
+    if isinstance(head, nn.Linear):
+        pruned_head = nn.Linear(head.in_features, len(ids), bias=False,
+                                device=head.weight.device, dtype=head.weight.dtype)
+        pruned_head.weight = nn.Parameter(head.weight.detach()[ids].clone(), requires_grad=False)
+    else:
+        # 動的量子化済み（int8）の Linear：整数値と scale / zero_point をそのまま使う
+        qweight = head.weight()
+        if qweight.qscheme() in (torch.per_channel_affine, torch.per_channel_symmetric):
+            sliced = torch.quantize_per_channel(
+                qweight.dequantize()[ids], qweight.q_per_channel_scales()[ids],
+                qweight.q_per_channel_zero_points()[ids], 0, qweight.dtype,
+            )
+        else:
+            sliced = torch.quantize_per_tensor(
+                qweight.dequantize()[ids], qweight.q_scale(), qweight.q_zero_point(), qweight.dtype
+            )
+        pruned_head = torch.ao.nn.quantized.dynamic.Linear(head.in_features, len(ids), bias_=False)
+        pruned_head.set_weight_bias(sliced, None)
+    model.set_output_embeddings(pruned_head)
+    model.config.vocab_size = len(ids)  # ビーム探索は候補の番号を config の語彙数で割って求める
+    setattr(model, PRUNED_ATTR, ids.to(weight.device))
+
+
+def apply_vocab(model, tokenizer, model_dir: str | os.PathLike,
+                tgt_lang_codes: Sequence[str] = TARGET_LANGS) -> int:
+    """翻訳先の許可リストの和でモデルを絞り込み、残した語彙数を返す"""
+    keep: set[int] = set()
+    for code in tgt_lang_codes:
+        keep.update(load_whitelist(tokenizer, model_dir, code))
+    prune_vocab(model, keep)
+    return len(keep)
+
+
+# ----------------------------------------------------------
+# 翻訳エンジンから使う番号の変換（絞り込んでいないモデルならそのまま）
+# ----------------------------------------------------------
+def model_token_id(model, token_id: int) -> int:
+    """元の語彙の番号 → モデル内の番号（forced_bos_token_id 用）"""
+    ids = getattr(model, PRUNED_ATTR, None)
+    if ids is None:
+        return token_id
+    import torch
+
+    pos = int(torch.searchsorted(ids, token_id))
+    if pos >= len(ids) or int(ids[pos]) != token_id:
+        raise ValueError(f"語彙を絞り込んだモデルでは使えないトークンです: {token_id}")
+    return pos
+
+
+def restore_token_ids(model, generated):
+    """generate の出力（モデル内の番号）を元の語彙の番号に戻す"""
+    ids = getattr(model, PRUNED_ATTR, None)
+    if ids is None:
+        return generated
+    return ids.to(generated.device)[generated]